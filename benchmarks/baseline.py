@@ -0,0 +1,151 @@
+"""
+Machine-readable benchmark reports and baseline comparison.
+
+A report is a JSON object with the run's settings, the environment it ran in
+and a flat ``metrics`` dict. Each metric is
+``{"value": float, "unit": str, "better": "lower" | "higher"}``. Comparing a
+report with a saved baseline flags every metric that got worse by more than a
+relative tolerance. Metrics missing from either side are skipped, so a
+baseline from an older suite can still be compared.
+"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOWER = "lower"
+HIGHER = "higher"
+
+
+def metric(value, unit, better=LOWER):
+    """A metric entry for a report's ``metrics`` dict."""
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), math.ceil(fraction * len(ordered))))
+    return ordered[rank - 1]
+
+
+def latency_summary(samples):
+    """
+    Summarize latencies.
+
+    Args:
+        samples (list): Latencies in seconds
+
+    Returns:
+        dict: p50, p95, p99, max and mean in milliseconds
+    """
+    ordered = sorted(samples)
+    summary = {
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1] if ordered else 0.0,
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0
+    }
+    return {key: round(value * 1000, 3) for key, value in summary.items()}
+
+
+def environment():
+    """Where the benchmark ran: interpreter, platform, CPUs and git commit."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def make_report(benchmark, settings, results, metrics):
+    """
+    Assemble a report.
+
+    Args:
+        benchmark (str): Benchmark name
+        settings (dict): The options the run used
+        results (dict): Detailed results (not compared)
+        metrics (dict): Compared metrics, built with metric()
+
+    Returns:
+        dict: The report
+    """
+    return {
+        "benchmark": benchmark,
+        "environment": environment(),
+        "settings": settings,
+        "results": results,
+        "metrics": metrics
+    }
+
+
+def write_report(report, path):
+    """Write a report as indented JSON ("-" writes to stdout)."""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path == "-":
+        print(text)
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text + "\n")
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current, baseline, max_regression):
+    """
+    Compare a report's metrics with a baseline's.
+
+    Args:
+        current (dict): The new report
+        baseline (dict): The saved baseline report
+        max_regression (float): Tolerated relative change for the worse (0.2 = 20%)
+
+    Returns:
+        list: (name, baseline value, current value, relative change, regressed) per shared metric;
+            a positive change is an improvement
+    """
+    rows = []
+    for name, entry in sorted(current.get("metrics", {}).items()):
+        old = baseline.get("metrics", {}).get(name)
+        if old is None:
+            continue
+        before, after = old["value"], entry["value"]
+        if before == 0:
+            change = 0.0 if after == 0 else (1.0 if entry["better"] == HIGHER else -1.0)
+        elif entry["better"] == HIGHER:
+            change = (after - before) / before
+        else:
+            change = (before - after) / before
+        rows.append((name, before, after, change, change < -max_regression))
+    return rows
+
+
+def print_comparison(rows):
+    """Print compare() rows as a table; returns True if any metric regressed."""
+    print(f"{'metric':<46}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<46}{before:>12.3f}{after:>12.3f}{change * 100:>+8.1f}%{flag}")
+    return any(row[4] for row in rows)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark the per-webhook setup cost: per-request construction
+(load_dotenv + config.json parse + new IntakeQClient) against the shared
+AppContext created once in create_app.
+
+Usage:
+    python benchmarks/bench_app_context.py --iterations 5000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from dotenv import load_dotenv  # noqa: E402
+from src.api.intakeq_client import IntakeQClient  # noqa: E402
+from src.utils.app_context import AppContext  # noqa: E402
+
+
+def per_request_setup():
+    """The setup process_webhook used to run on every request."""
+    load_dotenv()
+    api_key = os.getenv("INTAKEQ_API_KEY") or "bench-key"
+    with open("config/config.json", "r") as f:
+        config = json.load(f)
+    return IntakeQClient(api_key=api_key, base_url="http://127.0.0.1:9/api/v1", http_config=config.get("http")), config
+
+
+def shared_context_setup(context):
+    """The setup process_webhook runs now."""
+    return context.get_intakeq_client(), context.config
+
+
+def time_it(fn, iterations):
+    """Return mean microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-webhook setup cost benchmark")
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    context = AppContext(settings={"intakeq_api_key": "bench-key", "intakeq_base_url": "http://127.0.0.1:9/api/v1"})
+
+    per_request = time_it(per_request_setup, args.iterations)
+    shared = time_it(lambda: shared_context_setup(context), args.iterations)
+    print(f"per-request setup: {per_request:10.2f} us/webhook")
+    print(f"shared context:    {shared:10.2f} us/webhook")
+    print(f"speedup:           {per_request / shared:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark pooled keep-alive sessions against one-connection-per-request.
+
+Each iteration performs the upstream half of a webhook (search + POST/PATCH
+via IntakeQClient.create_client) against the local stub, whose per-connection
+latency stands in for the TCP+TLS handshake to intakeq.com.
+
+Usage:
+    python benchmarks/bench_connection_pool.py --requests 200 --connect-latency-ms 40
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from src.api.http_session import close_sessions  # noqa: E402
+from src.api.intakeq_client import IntakeQClient  # noqa: E402
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(base_url, requests_count, keep_alive):
+    """Time create_client calls with keep-alive on or off."""
+    close_sessions()
+    http_config = {"default": {"keep_alive": keep_alive}}
+    latencies = []
+    for i in range(requests_count):
+        # Construct a client per webhook, exactly as process_webhook does
+        client = IntakeQClient(api_key="bench-key", base_url=base_url, http_config=http_config)
+        start = time.perf_counter()
+        client.create_client({"FirstName": "Bench", "LastName": str(i), "Email": f"bench{i % 50}@example.com"})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--connect-latency-ms", type=float, default=40.0)
+    parser.add_argument("--request-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    server = start_stub_server(0, args.connect_latency_ms / 1000, args.request_latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+    print(f"{'mode':<12}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'conns':>8}")
+    for label, keep_alive in (("no-pool", False), ("pooled", True)):
+        before = server.state.connections
+        latencies = run(base_url, args.requests, keep_alive)
+        print(
+            f"{label:<12}{percentile(latencies, 50):>10.2f}{percentile(latencies, 99):>10.2f}"
+            f"{statistics.mean(latencies):>10.2f}{server.state.connections - before:>8}"
+        )
+
+    close_sessions()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
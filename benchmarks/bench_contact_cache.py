@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark contact enrichment fetches with and without the contact cache.
+
+Replays a stream of webhook events against the local GoHighLevel stub. Each
+event enriches its contact through GoHighLevelClient.get_contact. A share of
+the events are contact updates: the contact is changed at the stub and the
+cache entry invalidated, as the webhook handler does. Some events are for
+deleted contacts and get a 404. Reports the fetches that reached the stub, the
+304 revalidations, and the per-event latency, with and without the cache.
+
+Usage:
+    python benchmarks/bench_contact_cache.py --events 5000 --contacts 200 --request-latency-ms 20
+    python benchmarks/bench_contact_cache.py --ttl 0.5 --request-latency-ms 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from src.api.gohighlevel_client import GoHighLevelClient  # noqa: E402
+from src.utils.contact_cache import ContactCache  # noqa: E402
+
+
+def make_events(count, contacts, update_rate, missing_rate, seed=7):
+    """Events as (kind, contact_id); contact popularity is skewed like real traffic."""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < missing_rate:
+            events.append(("missing", f"deleted-{rng.randrange(10)}"))
+            continue
+        contact_id = f"contact-{min(int(rng.paretovariate(1.2)) - 1, contacts - 1)}"
+        events.append(("update" if roll < missing_rate + update_rate else "tag", contact_id))
+    return events
+
+
+def run(base_url, stub, events, cache):
+    """Replay the events; returns per-event latencies and the stub's fetch counters."""
+    client = GoHighLevelClient(base_url=base_url, contact_cache=cache)
+    updates = requests.Session()
+    fetches, not_modified = stub.state.contact_fetches, stub.state.not_modified
+    latencies = []
+    for n, (kind, contact_id) in enumerate(events):
+        if kind == "update":
+            updates.put(f"{base_url}/contacts/{contact_id}", json={"city": f"City{n}"})
+            if cache is not None:
+                cache.invalidate(contact_id)
+        start = time.perf_counter()
+        client.get_contact(contact_id)
+        latencies.append(time.perf_counter() - start)
+    return latencies, stub.state.contact_fetches - fetches, stub.state.not_modified - not_modified
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contact enrichment with and without the contact cache")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--contacts", type=int, default=200)
+    parser.add_argument("--update-rate", type=float, default=0.05, help="Share of contact-update events")
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="Share of events for deleted contacts")
+    parser.add_argument("--ttl", type=float, default=300.0, help="Cache TTL (short values exercise revalidation)")
+    parser.add_argument("--request-latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    # Any bearer token is accepted by the stub
+    os.environ.setdefault("GHL_ACCESS_TOKEN", "bench-token")
+    stub = start_stub_server(request_latency=args.request_latency_ms / 1000, contacts=args.contacts)
+    base_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    events = make_events(args.events, args.contacts, args.update_rate, args.missing_rate)
+
+    print(f"{'mode':<10}{'fetches':>9}{'304s':>7}{'p50 ms':>9}{'p99 ms':>9}{'total s':>9}")
+    for mode in ("uncached", "cached"):
+        cache = ContactCache(ttl=args.ttl, negative_ttl=60) if mode == "cached" else None
+        latencies, fetches, not_modified = run(base_url, stub, events, cache)
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"{mode:<10}{fetches:>9}{not_modified:>7}{cuts[49] * 1000:>9.2f}{cuts[98] * 1000:>9.2f}"
+              f"{sum(latencies):>9.2f}")
+        if cache is not None:
+            print(f"cache stats: {cache.stats()}")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
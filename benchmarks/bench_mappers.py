@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark the contact and GLP-1 mappers.
+
+Times map_contact_to_client, extract_glp1_custom_fields,
+map_glp1_fields_to_intakeq_form and MappingPlan.map_contact over the same
+synthetic contacts on every run (each contact is seeded by its number). Each
+function is timed for --rounds passes over the contacts. The best pass is the
+reported cost and the median pass is reported alongside it. The report can be
+saved as a JSON baseline and later runs compared with it.
+
+Usage:
+    python benchmarks/bench_mappers.py --contacts 5000 --output benchmarks/results/mappers.json
+    python benchmarks/bench_mappers.py --baseline benchmarks/results/mappers.json --max-regression 0.2
+"""
+
+import argparse
+import gc
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.baseline import (  # noqa: E402
+    compare, load_report, make_report, metric, print_comparison, write_report
+)
+from benchmarks.fixtures import make_contact  # noqa: E402
+from src.utils.data_mapper import map_contact_to_client  # noqa: E402
+from src.utils.glp1_field_mapping import extract_glp1_custom_fields, map_glp1_fields_to_intakeq_form  # noqa: E402
+from src.utils.mapping_engine import get_mapping_plan  # noqa: E402
+
+
+def time_passes(fn, inputs, rounds):
+    """Call fn on every input, rounds times; returns the microseconds per call of each pass."""
+    passes = []
+    # Like timeit, keep collector pauses out of the measurement
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for item in inputs:
+                fn(item)
+            passes.append((time.perf_counter() - start) / len(inputs) * 1e6)
+    finally:
+        gc.enable()
+    return passes
+
+
+def run(contacts=5000, rounds=5):
+    """
+    Run the micro-benchmarks.
+
+    Args:
+        contacts (int): Synthetic contacts mapped per pass
+        rounds (int): Passes per function
+
+    Returns:
+        dict: The report (see benchmarks/baseline.py)
+    """
+    # map_contact_to_client logs every call; measure the mapping, not the log handlers
+    logging.disable(logging.INFO)
+    # The mapping plan is loaded from config/mappings.json relative to the repository root
+    os.chdir(ROOT)
+    plan = get_mapping_plan()
+    sample = [make_contact(i) for i in range(contacts)]
+    glp1_fields = [extract_glp1_custom_fields(contact, plan) for contact in sample]
+
+    cases = (
+        ("map_contact_to_client", lambda contact: map_contact_to_client(contact, plan), sample),
+        ("extract_glp1_custom_fields", lambda contact: extract_glp1_custom_fields(contact, plan), sample),
+        ("map_glp1_fields_to_intakeq_form", lambda fields: map_glp1_fields_to_intakeq_form(fields, plan), glp1_fields),
+        ("mapping_plan.map_contact", plan.map_contact, sample),
+    )
+    results = {}
+    metrics = {}
+    for name, fn, inputs in cases:
+        fn(inputs[0])
+        passes = time_passes(fn, inputs, rounds)
+        best = min(passes)
+        results[name] = {
+            "best_us": round(best, 3),
+            "median_us": round(statistics.median(passes), 3),
+            "ops_per_second": round(1e6 / best)
+        }
+        metrics[f"{name}.us_per_call"] = metric(best, "us")
+    logging.disable(logging.NOTSET)
+    return make_report("mappers", {"contacts": contacts, "rounds": rounds}, results, metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contact and GLP-1 mapper micro-benchmarks")
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report here ('-' for stdout)")
+    parser.add_argument("--baseline", help="Compare with this saved report; exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Tolerated slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run(args.contacts, args.rounds)
+    print(f"{'function':<34}{'best us':>10}{'median us':>11}{'calls/s':>11}")
+    for name, result in report["results"].items():
+        print(f"{name:<34}{result['best_us']:>10.2f}{result['median_us']:>11.2f}{result['ops_per_second']:>11}")
+    if args.output:
+        write_report(report, args.output)
+    if args.baseline and print_comparison(compare(report, load_report(args.baseline), args.max_regression)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
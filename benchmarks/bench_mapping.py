@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-contact mapping cost of the compiled mapping plan.
+
+Compiles config/mappings.json (cold and from the hash-checked cache), maps
+synthetic contacts through MappingPlan.map_contact (client fields, BMI, GLP-1
+form and tags in one pass) and reports contacts per second. Exits non-zero if
+throughput is below --min-rate.
+
+Usage:
+    python benchmarks/bench_mapping.py --contacts 20000 --min-rate 10000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_contact  # noqa: E402
+from src.utils.mapping_engine import DEFAULT_MAPPINGS_PATH, compile_mapping_file  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mapping engine throughput benchmark")
+    parser.add_argument("--contacts", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--min-rate", type=float, default=10000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    contacts = [make_contact(i) for i in range(args.contacts)]
+
+    mappings_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), DEFAULT_MAPPINGS_PATH)
+    cache_path = os.path.join(tempfile.mkdtemp(), "mappings.compiled.json")
+    start = time.perf_counter()
+    plan = compile_mapping_file(mappings_path, cache_path)
+    compile_us = (time.perf_counter() - start) * 1e6
+    start = time.perf_counter()
+    compile_mapping_file(mappings_path, cache_path)
+    cached_us = (time.perf_counter() - start) * 1e6
+
+    best = 0.0
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        for contact in contacts:
+            plan.map_contact(contact)
+        best = max(best, len(contacts) / (time.perf_counter() - start))
+
+    print(f"plan compile:  {compile_us:10.1f} us (cold)")
+    print(f"plan load:     {cached_us:10.1f} us (from compiled cache)")
+    print(f"map_contact:   {1e6 / best:10.2f} us/contact")
+    print(f"throughput:    {best:10.0f} contacts/sec (target {args.min_rate:.0f})")
+    if best < args.min_rate:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
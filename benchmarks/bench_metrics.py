@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cost of recording metrics.
+
+Times counter increments, histogram observations and in-flight gauge blocks
+from several threads at once. A counter guarded by a lock is timed the same
+way for comparison. Each run then checks that the scraped totals are exact,
+so no update was lost to a race, and renders the registry once.
+
+Usage:
+    python benchmarks/bench_metrics.py --threads 8 --operations 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.metrics import Counter, Gauge, Histogram, Registry  # noqa: E402
+
+
+class LockedCounter:
+    """A counter guarded by a lock."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self):
+        with self._lock:
+            self.value += 1
+
+
+def run_threads(threads, target):
+    """Run target in threads at once; returns the wall time."""
+    barrier = threading.Barrier(threads + 1)
+
+    def run():
+        barrier.wait()
+        target()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of recording metrics")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=200000, help="Operations per thread")
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = Counter("bench_total", "Benchmark counter", ("kind",), registry=registry).labels("a")
+    histogram = Histogram("bench_seconds", "Benchmark histogram", registry=registry).labels()
+    gauge = Gauge("bench_in_flight", "Benchmark gauge", registry=registry).labels()
+    locked = LockedCounter()
+    values = [random.expovariate(20) for _ in range(1024)]
+    operations = args.operations
+    expected = args.threads * operations
+
+    def count():
+        for _ in range(operations):
+            counter.inc()
+
+    def observe():
+        for n in range(operations):
+            histogram.observe(values[n & 1023])
+
+    def track():
+        for _ in range(operations):
+            with gauge:
+                pass
+
+    def count_locked():
+        for _ in range(operations):
+            locked.inc()
+
+    def loop():
+        for _ in range(operations):
+            pass
+
+    baseline = run_threads(args.threads, loop)
+    print(f"{args.threads} threads x {operations} operations (loop overhead subtracted)")
+    print(f"{'operation':<22}{'ns/op':>8}{'exact':>8}")
+    for name, target, check in (
+        ("counter.inc", count, lambda: counter._values.totals()[0] == expected),
+        ("histogram.observe", observe, lambda: sum(histogram._values.totals()[:-1]) == expected),
+        ("with gauge", track, lambda: gauge._values.totals()[0] == 0),
+        ("locked counter.inc", count_locked, lambda: locked.value == expected),
+    ):
+        elapsed = run_threads(args.threads, target) - baseline
+        print(f"{name:<22}{elapsed / expected * 1e9:>8.0f}{'yes' if check() else 'NO':>8}")
+
+    start = time.perf_counter()
+    registry.render()
+    print(f"render: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark payload normalization: the per-payload dict building that
+process_webhook used to do against payload_normalizer's ContactRecord.
+
+Reports parse cost per payload and, via tracemalloc, the bytes allocated per
+normalized contact, for both GoHighLevel's webhook format and the direct form
+format.
+
+Usage:
+    python benchmarks/bench_normalizer.py --payloads 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_direct_payload, make_webhook_payload  # noqa: E402
+from src.utils.payload_normalizer import normalize_payload  # noqa: E402
+
+
+def legacy_normalize(data):
+    """The contact dict process_webhook used to build from a payload."""
+    if "payload" in data:
+        payload = data["payload"]
+        contact = {
+            "id": payload.get("contactId"),
+            "firstName": payload.get("firstName"),
+            "lastName": payload.get("lastName"),
+            "email": payload.get("email"),
+            "phone": payload.get("phone"),
+            "city": payload.get("city"),
+            "state": payload.get("state"),
+            "country": payload.get("country", "USA"),
+            "postalCode": payload.get("postalCode"),
+            "customFields": []
+        }
+        if "customFields" in payload:
+            for field in payload["customFields"]:
+                field_key = field.get("key", "")
+                field_value = field.get("field_value")
+                if field_key == "Height Feet":
+                    contact["Height Feet"] = field_value
+                elif field_key == "Height Inches":
+                    contact["Height Inches"] = field_value
+                elif field_key == "BMI":
+                    contact["BMI"] = field_value
+                elif field_key == "Current Weight?":
+                    contact["Current Weight?"] = field_value
+                elif field_key == "Target Weight":
+                    contact["Target Weight"] = field_value
+                contact["customFields"].append({
+                    "key": field_key,
+                    "field_value": str(field_value) if field_value is not None else ""
+                })
+    else:
+        contact = {
+            "id": data.get("contact_id"),
+            "firstName": data.get("first_name"),
+            "lastName": data.get("last_name"),
+            "email": data.get("email"),
+            "phone": data.get("phone"),
+            "city": data.get("city"),
+            "state": data.get("state"),
+            "country": data.get("country"),
+            "postalCode": data.get("postal_code"),
+            "customFields": []
+        }
+        for key, value in data.items():
+            if key not in ["contact_id", "first_name", "last_name", "email", "phone", "tags", "city", "state", "country", "postal_code"]:
+                contact["customFields"].append({
+                    "key": key,
+                    "field_value": str(value) if value is not None else ""
+                })
+    return contact
+
+
+def time_per_payload(fn, payloads, rounds):
+    """Best-of-rounds microseconds per payload."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best / len(payloads) * 1e6
+
+
+def allocations_per_payload(fn, payloads):
+    """Peak bytes allocated per payload while normalizing (results are kept alive)."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    results = [fn(payload) for payload in payloads]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return (peak - before) / len(payloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload normalizer benchmark")
+    parser.add_argument("--payloads", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    formats = (
+        ("webhook", [make_webhook_payload(i) for i in range(args.payloads)]),
+        ("direct", [make_direct_payload(i) for i in range(args.payloads)])
+    )
+    print(f"{'format':<9}{'parser':<10}{'us/payload':>12}{'bytes/payload':>15}")
+    for label, payloads in formats:
+        for name, fn in (("legacy", legacy_normalize), ("record", normalize_payload)):
+            cost = time_per_payload(fn, payloads, args.rounds)
+            allocated = allocations_per_payload(fn, payloads)
+            print(f"{label:<9}{name:<10}{cost:>12.2f}{allocated:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Exercise the GoHighLevel OAuth token manager against the local stub.
+
+Several worker processes, each running several threads, call the stub's
+contact listing for one location with OAuth tokens that expire every few
+seconds. All of them share one token store, as gunicorn workers do. Reports
+request throughput and latency, how many refreshes reached the token
+endpoint, and whether any request failed or spent an already-rotated refresh
+token (invalid_grant). With single-flight refresh there is one refresh per
+token lifetime, whatever the number of processes and threads.
+
+Usage:
+    python benchmarks/bench_oauth.py --processes 4 --threads 8 --duration 10 --token-ttl 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from src.api.gohighlevel_client import GoHighLevelClient  # noqa: E402
+from src.api.oauth import TokenManager, TokenStore  # noqa: E402
+
+LOCATION_ID = "loc-bench"
+
+
+def make_manager(base_url, store_path, args):
+    return TokenManager(
+        "bench-client", "bench-secret", TokenStore(store_path), base_url=base_url,
+        refresh_margin=args.refresh_margin, min_validity=args.min_validity,
+        check_interval=args.check_interval, lease_timeout=5
+    )
+
+
+def worker(base_url, store_path, args, results):
+    """One worker process: threads listing contacts until the deadline."""
+    manager = make_manager(base_url, store_path, args)
+    client = GoHighLevelClient(base_url=base_url, token_manager=manager)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def run():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            result = client.list_contacts(LOCATION_ID, limit=1)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if "error" in result:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=run) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.stop()
+    stats = manager.stats()
+    results.put((latencies, errors[0], stats["refreshes"], stats["lease_waits"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GoHighLevel OAuth token manager under concurrency")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="Threads per process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--token-ttl", type=int, default=4, help="Access token lifetime (seconds)")
+    parser.add_argument("--refresh-margin", type=float, default=2.0)
+    parser.add_argument("--min-validity", type=float, default=1.0)
+    parser.add_argument("--check-interval", type=float, default=0.5)
+    parser.add_argument("--request-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    stub = start_stub_server(request_latency=args.request_latency_ms / 1000, contacts=10, token_ttl=args.token_ttl)
+    base_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    context = multiprocessing.get_context("fork")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = os.path.join(directory, "tokens.sqlite3")
+        # The one-time authorization, as done by /oauth/callback
+        make_manager(base_url, store_path, args).exchange_code(f"code-{LOCATION_ID}")
+
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(base_url, store_path, args, results))
+            for _ in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for outcome in outcomes for latency in outcome[0])
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"Processes x threads:      {args.processes} x {args.threads}")
+    print(f"Requests:                 {len(latencies)} ({len(latencies) / elapsed:.1f}/s)")
+    print(f"Latency p50/p99:          {cuts[49] * 1000:.1f} / {cuts[98] * 1000:.1f} ms")
+    print(f"Failed requests:          {sum(outcome[1] for outcome in outcomes)}")
+    print(f"Token lifetimes elapsed:  {args.duration / args.token_ttl:.1f}")
+    print(f"Refreshes at the stub:    {stub.state.token_refreshes} "
+          f"(counted by workers: {sum(outcome[2] for outcome in outcomes)})")
+    print(f"Spent refresh tokens:     {stub.state.invalid_grants}")
+    print(f"Waits on another process: {sum(outcome[3] for outcome in outcomes)}")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
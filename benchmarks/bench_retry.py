@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Exercise the retry engine against the fault-injecting IntakeQ stub.
+
+Runs the same create_client workload with retries disabled and enabled and
+reports how many syncs succeeded, how many upstream requests were made and
+how often the per-host retry budget refused a retry.
+
+Usage:
+    python benchmarks/bench_retry.py --requests 300 --error-rate 0.1 --throttle-rate 0.05
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from src.api import retry  # noqa: E402
+from src.api.intakeq_client import IntakeQClient  # noqa: E402
+
+
+def run(server, requests_count, retry_config):
+    """Sync requests_count contacts and count successes."""
+    # Fresh budgets so each run starts from the same state
+    retry._budgets.clear()
+    client = IntakeQClient(api_key="bench-key", base_url=server.base_url, retry_config=retry_config)
+    before_requests, before_faults = server.state.requests, server.state.faults
+
+    succeeded = 0
+    start = time.perf_counter()
+    for i in range(requests_count):
+        result = client.create_client({"FirstName": "Retry", "Email": f"retry{i}@example.com"})
+        if result and "error" not in result:
+            succeeded += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "succeeded": succeeded,
+        "upstream_requests": server.state.requests - before_requests,
+        "faults_injected": server.state.faults - before_faults,
+        "retries": client.retry_policy.retries,
+        "budget_refusals": client.retry_policy.budget.exhausted,
+        "seconds": elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retry engine fault-injection benchmark")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--throttle-rate", type=float, default=0.05)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    server = start_stub_server(error_rate=args.error_rate, throttle_rate=args.throttle_rate, retry_after=0)
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+    fast = {"base_delay": 0.005, "max_delay": 0.05}
+    runs = (
+        ("no-retry", dict(fast, max_attempts=1)),
+        ("retry", dict(fast, max_attempts=args.max_attempts))
+    )
+    print(f"{'mode':<10}{'ok':>6}{'of':>6}{'requests':>10}{'faults':>8}{'retries':>9}{'refused':>9}{'secs':>8}")
+    for label, retry_config in runs:
+        stats = run(server, args.requests, retry_config)
+        print(
+            f"{label:<10}{stats['succeeded']:>6}{args.requests:>6}{stats['upstream_requests']:>10}"
+            f"{stats['faults_injected']:>8}{stats['retries']:>9}{stats['budget_refusals']:>9}{stats['seconds']:>8.2f}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Load-test the webhook server under the Flask development server and under
+gunicorn, against the local IntakeQ stub.
+
+Each mode is started as a subprocess with its own copy of config.json whose
+data and log files live in a temporary directory, then receives --requests
+distinct paid-tag webhooks from --concurrency client threads. Reports
+throughput and latency percentiles per mode.
+
+Usage:
+    python benchmarks/bench_server.py --requests 2000 --concurrency 32 --request-latency-ms 20
+    python benchmarks/bench_server.py --modes gunicorn --workers 4 --threads 16
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+from benchmarks.fixtures import make_webhook_payload  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+
+PATH_KEYS = ("path", "queue_path", "cache_path", "invalidation_path")
+
+
+def isolated_config(directory):
+    """Copy config.json with every data/log path moved into directory; returns the copy's path."""
+    with open(os.path.join(ROOT, "config", "config.json")) as f:
+        config = json.load(f)
+    blocks = [(name, block) for name, block in config.items() if isinstance(block, dict)]
+    # One level of nesting, e.g. contact_enrichment.cache
+    blocks += [
+        (name, inner) for name, block in blocks for inner in block.values() if isinstance(inner, dict)
+    ]
+    for name, block in blocks:
+        for key in PATH_KEYS:
+            # mappings.path is the mapping file itself, not state
+            if key not in block or (name == "mappings" and key == "path"):
+                continue
+            block[key] = os.path.join(directory, f"{name}-{os.path.basename(block[key])}")
+    config["logging"] = {**config.get("logging", {}), "console": False, "body_sample_rate": 0}
+    path = os.path.join(directory, "config.json")
+    with open(path, "w") as f:
+        json.dump(config, f)
+    return path
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, env, args):
+    """Launch the server in the given mode and wait until /health answers."""
+    if mode == "dev":
+        # What production used to run: main.py with debug and the reloader
+        command = [sys.executable, "main.py"]
+        env = {**env, "DEBUG": "True"}
+    else:
+        command = [sys.executable, "-m", "gunicorn", "src.api.wsgi:app"]
+        env = {**env, "WEB_CONCURRENCY": str(args.workers), "GUNICORN_THREADS": str(args.threads)}
+    process = subprocess.Popen(
+        command, cwd=ROOT, env={**env, "PORT": str(port), "HOST": "127.0.0.1"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def stop_server(process):
+    """SIGTERM the whole process group (the reloader and gunicorn both fork) and wait."""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=40)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def run_load(url, total, concurrency, offset):
+    """Post total distinct webhooks from concurrency threads; returns latencies, errors and elapsed."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(offset, offset + total))
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                ok = session.post(url, json=make_webhook_payload(i), timeout=60).status_code < 300
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook server load test: dev server vs gunicorn")
+    parser.add_argument("--modes", nargs="+", default=["dev", "gunicorn"], choices=["dev", "gunicorn"])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--request-latency-ms", type=float, default=20.0, help="Stub IntakeQ latency per call")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    args = parser.parse_args()
+
+    stub = start_stub_server(request_latency=args.request_latency_ms / 1000)
+    env = {
+        **os.environ,
+        "INTAKEQ_API_KEY": "bench-key",
+        "INTAKEQ_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}/api/v1"
+    }
+
+    print(f"{'mode':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for n, mode in enumerate(args.modes):
+        with tempfile.TemporaryDirectory() as directory:
+            port = free_port()
+            process = start_server(mode, port, {**env, "CONFIG_PATH": isolated_config(directory)}, args)
+            try:
+                latencies, errors, elapsed = run_load(
+                    f"http://127.0.0.1:{port}/webhook/gohighlevel", args.requests, args.concurrency, n * args.requests
+                )
+            finally:
+                stop_server(process)
+        latencies.sort()
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"{mode:<10}{len(latencies) / elapsed:>9.1f}{cuts[49] * 1000:>9.1f}"
+              f"{cuts[94] * 1000:>9.1f}{cuts[98] * 1000:>9.1f}{errors:>8}")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Synthetic GoHighLevel data for the benchmarks.
+
+Contacts carry a realistic mix of mapped client fields, GLP-1 fields and
+custom fields the integration ignores.
+"""
+
+import random
+
+CLIENT_FIELD_VALUES = {
+    "Height Feet": lambda rng: str(rng.randint(4, 6)),
+    "Height Inches": lambda rng: str(rng.randint(0, 11)),
+    "Current Weight?": lambda rng: str(rng.randint(120, 320)),
+    "Target Weight": lambda rng: str(rng.randint(110, 220)),
+    "Current Weight Loss Medication": lambda rng: rng.choice(["None", "Ozempic", "Wegovy", ""]),
+    "Dose": lambda rng: rng.choice(["0.25mg", "0.5mg", "1mg", ""]),
+    "State": lambda rng: rng.choice(["IL", "TX", "CA", "NY"]),
+    "What brings you here today?": lambda rng: "Weight loss management",
+    "Any past surgeries?": lambda rng: rng.choice(["No", "Appendectomy", ""]),
+    "Any medication allergies?": lambda rng: rng.choice(["No", "Penicillin", ""])
+}
+
+GLP1_FIELD_VALUES = {
+    "if_yes_which_glp1_medication": lambda rng: rng.choice(["Ozempic", "Mounjaro", ""]),
+    "have_you_ever_been_diagnosed_with_any_of_the_following_conditions": lambda rng: "Hypertension, Diabetes",
+    "check_all_that_apply_in_the_past_2_weeks_other": lambda rng: rng.choice(["Headache, Fatigue", ""]),
+    "current_weight": lambda rng: str(rng.randint(120, 320)),
+    "target_weight": lambda rng: str(rng.randint(110, 220)),
+    "social_history": lambda rng: rng.choice(["Non-smoker", "Smoker", ""]),
+    "what_brings_you_here_today": lambda rng: "Weight loss management"
+}
+
+UNMAPPED_FIELDS = ["source", "utm_campaign", "preferred_contact_time", "referral_code", "notes"]
+
+
+def make_contact(i, rng=None):
+    """
+    Build a contact in the shape process_webhook passes to the mapper.
+
+    Args:
+        i (int): Sequence number (makes names and emails unique)
+        rng (random.Random): Source of randomness (seeded per contact by default)
+
+    Returns:
+        dict: The contact
+    """
+    rng = rng or random.Random(i)
+    custom_fields = []
+    for key, value in CLIENT_FIELD_VALUES.items():
+        custom_fields.append({"key": key, "field_value": value(rng)})
+    for key, value in GLP1_FIELD_VALUES.items():
+        custom_fields.append({"key": key, "field_value": value(rng)})
+    for key in UNMAPPED_FIELDS:
+        custom_fields.append({"key": key, "field_value": f"{key}-{i}"})
+    rng.shuffle(custom_fields)
+
+    return {
+        "id": f"contact-{i}",
+        "firstName": f"First{i}",
+        "lastName": f"Last{i}",
+        "email": f"contact{i}@example.com",
+        "phone": f"(555) 01{i % 100:02d}-{i % 10000:04d}",
+        "city": "Chicago",
+        "state": "IL",
+        "country": "USA",
+        "postalCode": "60601",
+        "customFields": custom_fields
+    }
+
+
+def make_webhook_payload(i, rng=None):
+    """
+    Build a GoHighLevel "contact tag added" webhook for contact i.
+
+    Args:
+        i (int): Sequence number
+        rng (random.Random): Source of randomness (seeded per contact by default)
+
+    Returns:
+        dict: The webhook payload
+    """
+    contact = make_contact(i, rng)
+    return {
+        "type": "ContactTagUpdate",
+        "webhookId": f"webhook-{i}",
+        "locationId": "location-1",
+        "payload": {
+            "contactId": contact["id"],
+            "firstName": contact["firstName"],
+            "lastName": contact["lastName"],
+            "email": contact["email"],
+            "phone": contact["phone"],
+            "city": contact["city"],
+            "state": contact["state"],
+            "country": contact["country"],
+            "postalCode": contact["postalCode"],
+            "tagName": "paid",
+            "customFields": contact["customFields"]
+        }
+    }
+
+
+def make_direct_payload(i, rng=None):
+    """
+    Build a direct-format (flat form post) payload for contact i.
+
+    Args:
+        i (int): Sequence number
+        rng (random.Random): Source of randomness (seeded per contact by default)
+
+    Returns:
+        dict: The payload
+    """
+    contact = make_contact(i, rng)
+    payload = {
+        "contact_id": contact["id"],
+        "first_name": contact["firstName"],
+        "last_name": contact["lastName"],
+        "email": contact["email"],
+        "phone": contact["phone"],
+        "city": contact["city"],
+        "state": contact["state"],
+        "country": contact["country"],
+        "postal_code": contact["postalCode"],
+        "tags": "paid, new-customer"
+    }
+    for field in contact["customFields"]:
+        payload[field["key"]] = field["field_value"]
+    return payload
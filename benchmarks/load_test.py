@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test: replay logged webhooks at a target request rate.
+
+Starts two local stubs, one standing in for IntakeQ and one for GoHighLevel,
+each with its own latency, 503 error rate and 429 throttle rate. The webhook
+server is started against them under gunicorn or the development server, with
+an isolated copy of config.json (see bench_server.py). --url targets a server
+that is already running instead; no stubs are started then.
+
+Payloads are the webhook bodies logged as "Received webhook" in --log, in the
+old text format or the JSON format. Values the log redacted get synthetic
+values. Each request gets its own contact id, email and webhookId, so the
+idempotency store and change detection treat it as new (--keep-identity
+replays the bodies as logged). --nested-share mixes in GoHighLevel
+tag-added webhooks for the GoHighLevel stub's contacts; those go through
+contact enrichment, which logged workflow payloads skip.
+
+The generator is open-loop. Request i is due at start + i / rps whether or
+not earlier requests have been answered, and its latency is measured from
+when it was due. A server that falls behind therefore shows up in the
+percentiles instead of slowing the generator down. The first --warmup seconds
+are sent but not measured.
+
+The report (throughput, p50/p95/p99 latency, status codes, stub counters) is
+printed and can be saved as JSON with --output. --baseline compares the run
+with a saved report and exits 1 if a metric regressed by more than
+--max-regression.
+
+Usage:
+    python benchmarks/load_test.py --rps 20 --duration 30 --intakeq-latency-ms 80 --output benchmarks/results/load.json
+    python benchmarks/load_test.py --rps 20 --duration 30 --intakeq-throttle-rate 0.05 --baseline benchmarks/results/load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000/webhook/gohighlevel --rps 5 --duration 10
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+from benchmarks.baseline import (  # noqa: E402
+    HIGHER, compare, latency_summary, load_report, make_report, metric, print_comparison, write_report
+)
+from benchmarks.bench_server import free_port, isolated_config, start_server, stop_server  # noqa: E402
+from benchmarks.fixtures import make_webhook_payload  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from src.utils.logging_setup import REDACTED  # noqa: E402
+
+LOG_MESSAGE = "Received webhook"
+
+# Synthetic stand-ins for redacted values, by lower-cased field name
+SYNTHETIC_VALUES = {
+    "phone": lambda n: f"(555) 02{n % 100:02d}-{n % 10000:04d}",
+    "first_name": lambda n: "Load",
+    "firstname": lambda n: "Load",
+    "last_name": lambda n: f"Test{n}",
+    "lastname": lambda n: f"Test{n}",
+    "name": lambda n: f"Load Test{n}",
+    "full_name": lambda n: f"Load Test{n}",
+    "customfields": lambda n: [],
+    "fields": lambda n: []
+}
+
+
+def load_logged_payloads(path):
+    """
+    Read the webhook bodies logged by the server.
+
+    Args:
+        path (str): Log file (text or JSON lines)
+
+    Returns:
+        list: The logged payloads (dicts), in log order
+    """
+    payloads = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if LOG_MESSAGE not in line:
+                continue
+            try:
+                if line.startswith("{"):
+                    entry = json.loads(line)
+                    body = entry.get("body") if entry.get("message") == LOG_MESSAGE else None
+                else:
+                    # "... - Received webhook: {...}" (older) or "... - Received webhook {...}"
+                    start = line.find("{", line.find(LOG_MESSAGE))
+                    body = json.loads(line[start:]) if start >= 0 else None
+            except ValueError:
+                continue
+            if isinstance(body, dict):
+                payloads.append(body)
+    return payloads
+
+
+def _fill(value, n, keep_identity):
+    """Copy a payload, replacing redacted values (and emails, unless keep_identity) with synthetic ones."""
+    if isinstance(value, dict):
+        filled = {}
+        for key, item in value.items():
+            name = key.lower()
+            if name == "email" and (item == REDACTED or not keep_identity):
+                filled[key] = f"load{n}@example.com"
+            elif item == REDACTED:
+                make = SYNTHETIC_VALUES.get(name)
+                filled[key] = make(n) if make else ""
+            else:
+                filled[key] = _fill(item, n, keep_identity)
+        return filled
+    if isinstance(value, list):
+        return [_fill(item, n, keep_identity) for item in value]
+    return value
+
+
+def personalize(template, n, run_id, keep_identity=False):
+    """
+    Build request n's payload from a logged one.
+
+    Args:
+        template (dict): The logged payload
+        n (int): Request number
+        run_id (str): Distinguishes this run's contacts from earlier runs'
+        keep_identity (bool): Keep the logged contact ids, emails and webhookId
+
+    Returns:
+        dict: The payload to send
+    """
+    payload = _fill(template, n, keep_identity)
+    if keep_identity:
+        return payload
+    contact_id = f"load-{run_id}-{n}"
+    nested = [holder for holder in (payload.get("payload"), payload.get("contact")) if isinstance(holder, dict)]
+    for holder in [payload] + nested:
+        for key in ("contact_id", "contactId"):
+            if key in holder:
+                holder[key] = contact_id
+    for holder in nested:
+        if "id" in holder:
+            holder["id"] = contact_id
+    if "webhookId" in payload:
+        payload["webhookId"] = f"load-{run_id}-{n}"
+    return payload
+
+
+def build_requests(templates, total, nested_share, ghl_contacts, seed, keep_identity):
+    """Encode the request bodies up front so sending them costs the generator as little as possible."""
+    rng = random.Random(seed)
+    run_id = f"{seed}-{int(time.time())}"
+    bodies = []
+    for n in range(total):
+        if not templates or rng.random() < nested_share:
+            payload = make_webhook_payload(n)
+            payload["webhookId"] = f"load-{run_id}-{n}"
+            payload["payload"]["contactId"] = f"contact-{rng.randrange(ghl_contacts)}"
+        else:
+            payload = personalize(rng.choice(templates), n, run_id, keep_identity)
+        bodies.append(json.dumps(payload).encode("utf-8"))
+    return bodies
+
+
+def run_open_loop(url, bodies, rps, max_in_flight, timeout):
+    """
+    Send the bodies at rps, each on schedule regardless of earlier responses.
+
+    Args:
+        url (str): Webhook URL
+        bodies (list): Encoded request bodies
+        rps (float): Target requests per second
+        max_in_flight (int): Client threads; requests due while all are busy wait (and count as latency)
+        timeout (float): Per-request timeout in seconds
+
+    Returns:
+        tuple: (results, elapsed) where results[i] is (status, latency from due time, service time)
+    """
+    results = [None] * len(bodies)
+    local = threading.local()
+
+    def send(i, due):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        sent = time.perf_counter()
+        try:
+            status = str(session.post(url, data=bodies[i], headers={"Content-Type": "application/json"},
+                                      timeout=timeout).status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        done = time.perf_counter()
+        results[i] = (status, done - due, done - sent)
+
+    start = time.perf_counter() + 0.1
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i in range(len(bodies)):
+            due = start + i / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, i, due)
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed, warmup_requests, rps):
+    """Results and compared metrics for the measured (post-warmup) requests."""
+    measured = [r for r in results[warmup_requests:] if r is not None]
+    statuses = Counter(status for status, _, _ in measured)
+    ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 300)
+    window = elapsed - warmup_requests / rps
+    latency = latency_summary([r[1] for r in measured])
+    results_block = {
+        "requests": len(measured),
+        "succeeded": ok,
+        "error_rate": round(1 - ok / len(measured), 4) if measured else 0.0,
+        "throughput_rps": round(ok / window, 2) if window else 0.0,
+        "latency_ms": latency,
+        "service_time_ms": latency_summary([r[2] for r in measured]),
+        "status_codes": dict(sorted(statuses.items()))
+    }
+    metrics = {
+        "throughput_rps": metric(results_block["throughput_rps"], "req/s", HIGHER),
+        "latency_p50_ms": metric(latency["p50"], "ms"),
+        "latency_p95_ms": metric(latency["p95"], "ms"),
+        "latency_p99_ms": metric(latency["p99"], "ms")
+    }
+    return results_block, metrics
+
+
+def stub_counters(stub):
+    state = stub.state
+    return {
+        "requests": state.requests,
+        "faults": state.faults,
+        "connections": state.connections,
+        "clients_created": len(state.clients),
+        "contact_fetches": state.contact_fetches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay logged webhooks at a target rate against local stubs")
+    parser.add_argument("--log", default=os.path.join(ROOT, "logs", "app.log"), help="Log to replay payloads from")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load (after warmup)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of unmeasured load first")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Client threads")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-identity", action="store_true", help="Send payloads with their logged identities")
+    parser.add_argument("--nested-share", type=float, default=0.2,
+                        help="Share of GoHighLevel tag webhooks (enriched from the GoHighLevel stub)")
+    parser.add_argument("--mode", default="gunicorn", choices=["gunicorn", "dev"])
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--url", help="Load an already running server's webhook URL instead")
+    parser.add_argument("--intakeq-latency-ms", type=float, default=50.0)
+    parser.add_argument("--intakeq-error-rate", type=float, default=0.0)
+    parser.add_argument("--intakeq-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--ghl-latency-ms", type=float, default=30.0)
+    parser.add_argument("--ghl-error-rate", type=float, default=0.0)
+    parser.add_argument("--ghl-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--ghl-contacts", type=int, default=500, help="Contacts seeded in the GoHighLevel stub")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--output", help="Write the JSON report here ('-' for stdout)")
+    parser.add_argument("--baseline", help="Compare with this saved report; exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Tolerated change for the worse")
+    args = parser.parse_args()
+
+    templates = load_logged_payloads(args.log) if os.path.exists(args.log) else []
+    if not templates:
+        print(f"No logged webhooks in {args.log}; sending synthetic tag webhooks only")
+    warmup_requests = int(args.warmup * args.rps)
+    total = warmup_requests + int(args.duration * args.rps)
+    # Fault injection in the stubs draws from the global generator
+    random.seed(args.seed)
+    bodies = build_requests(templates, total, args.nested_share, args.ghl_contacts, args.seed, args.keep_identity)
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    settings["logged_payloads"] = len(templates)
+    stubs = {}
+    if args.url:
+        results, elapsed = run_open_loop(args.url, bodies, args.rps, args.max_in_flight, args.timeout)
+    else:
+        stubs["intakeq"] = start_stub_server(
+            request_latency=args.intakeq_latency_ms / 1000, error_rate=args.intakeq_error_rate,
+            throttle_rate=args.intakeq_throttle_rate, retry_after=args.retry_after
+        )
+        stubs["gohighlevel"] = start_stub_server(
+            request_latency=args.ghl_latency_ms / 1000, error_rate=args.ghl_error_rate,
+            throttle_rate=args.ghl_throttle_rate, retry_after=args.retry_after, contacts=args.ghl_contacts
+        )
+        env = {key: value for key, value in os.environ.items() if key not in ("GHL_CLIENT_ID", "GHL_CLIENT_SECRET")}
+        with tempfile.TemporaryDirectory() as directory:
+            env.update({
+                "CONFIG_PATH": isolated_config(directory),
+                "METRICS_MULTIPROC_DIR": os.path.join(directory, "metrics"),
+                "INTAKEQ_API_KEY": "bench-key",
+                "INTAKEQ_BASE_URL": f"http://127.0.0.1:{stubs['intakeq'].server_address[1]}/api/v1",
+                "GHL_BASE_URL": f"http://127.0.0.1:{stubs['gohighlevel'].server_address[1]}",
+                "GHL_ACCESS_TOKEN": "bench-token"
+            })
+            port = free_port()
+            process = start_server(args.mode, port, env, args)
+            try:
+                results, elapsed = run_open_loop(
+                    f"http://127.0.0.1:{port}/webhook/gohighlevel", bodies, args.rps, args.max_in_flight, args.timeout
+                )
+            finally:
+                stop_server(process)
+
+    results_block, metrics = summarize(results, elapsed, warmup_requests, args.rps)
+    results_block["stubs"] = {name: stub_counters(stub) for name, stub in stubs.items()}
+    for stub in stubs.values():
+        stub.shutdown()
+    report = make_report("load_test", settings, results_block, metrics)
+
+    latency = results_block["latency_ms"]
+    print(f"{results_block['requests']} requests at {args.rps:g}/s: {results_block['throughput_rps']:.1f} ok/s, "
+          f"error rate {results_block['error_rate']:.2%}")
+    print(f"latency ms  p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}  "
+          f"max {latency['max']:.1f}")
+    print(f"status codes: {results_block['status_codes']}")
+    for name, counters in results_block["stubs"].items():
+        print(f"{name} stub: {counters}")
+    if args.output:
+        write_report(report, args.output)
+    if args.baseline and print_comparison(compare(report, load_report(args.baseline), args.max_regression)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
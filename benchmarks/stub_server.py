@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Local stub of the IntakeQ API (and GoHighLevel contact listing) used by the
+benchmarks and for running backfills locally.
+
+The stub speaks HTTP/1.1 with keep-alive so pooled clients can reuse
+connections. A configurable delay is charged once per new connection to stand
+in for the TCP+TLS handshake a real upstream costs, and another per request
+for server-side processing time. Faults can be injected at a configurable
+rate: 503 errors and 429 throttling with a Retry-After header.
+
+The GoHighLevel side serves GET /contacts/ with startAfterId pagination over
+a list of synthetic contacts (see --contacts); point GHL_BASE_URL at the
+server root and INTAKEQ_BASE_URL at /api/v1. GET /contacts/<id> returns one
+contact with an ETag and answers If-None-Match with 304; PUT /contacts/<id>
+updates it. Contacts carry their custom fields as {id, value}, as the real
+API does; GET /locations/<id>/customFields returns the field definitions
+(id, name, fieldKey) that map those ids to keys.
+
+POST /oauth/token emulates GoHighLevel's OAuth token endpoint. The code
+"code-<locationId>" authorizes that location. Every refresh rotates the
+refresh token, and reusing a spent one fails with invalid_grant. Access
+tokens expire after --token-ttl seconds. The stub's own tokens are checked on
+GoHighLevel requests; any other bearer token is accepted.
+
+Run standalone:
+    python benchmarks/stub_server.py --port 8801 --connect-latency-ms 40 --contacts 5000
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, parse_qsl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_contact  # noqa: E402
+
+# Every Nth seeded GoHighLevel contact lacks the "paid" tag
+UNPAID_EVERY = 10
+
+# IntakeQ client fields only listed with includeProfile=true
+PROFILE_FIELDS = frozenset(["DateOfBirth"])
+
+
+class StubState:
+    """In-memory IntakeQ client store shared by all handler threads."""
+
+    def __init__(self, connect_latency=0.0, request_latency=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1,
+                 token_ttl=86399):
+        self.connect_latency = connect_latency
+        self.request_latency = request_latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.clients = {}
+        self.ids = itertools.count(1000)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.faults = 0
+        self.contacts = []
+        self.contact_index = {}
+        self.intakes = []
+        self.contact_fetches = 0
+        self.not_modified = 0
+        # custom field key -> id
+        self.custom_fields = {}
+        self.token_ttl = token_ttl
+        # access token -> (location, expires_at); refresh token -> location (spent ones are removed)
+        self.access_tokens = {}
+        self.refresh_tokens = {}
+        self.token_serial = itertools.count(1)
+        self.token_grants = 0
+        self.token_refreshes = 0
+        self.invalid_grants = 0
+
+    def issue_token(self, location_id):
+        """Mint an access/refresh token pair for a location (call with the lock held)."""
+        serial = next(self.token_serial)
+        access_token = f"at-{location_id}-{serial}"
+        refresh_token = f"rt-{location_id}-{serial}"
+        self.access_tokens[access_token] = (location_id, time.time() + self.token_ttl)
+        self.refresh_tokens[refresh_token] = location_id
+        return {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": self.token_ttl,
+            "refresh_token": refresh_token,
+            "scope": "contacts.readonly",
+            "userType": "Location",
+            "locationId": location_id
+        }
+
+    def custom_field_id(self, key):
+        """The API id of a custom field, defining the field on first use."""
+        field_id = self.custom_fields.get(key)
+        if field_id is None:
+            field_id = self.custom_fields[key] = f"cf{len(self.custom_fields):04d}"
+        return field_id
+
+    def seed_contacts(self, count):
+        """
+        Create synthetic GoHighLevel contacts for the /contacts/ listing.
+
+        Args:
+            count (int): Number of contacts
+        """
+        for i in range(count):
+            contact = make_contact(i)
+            contact["tags"] = ["new-customer"] if i % UNPAID_EVERY == UNPAID_EVERY - 1 else ["paid", "new-customer"]
+            contact["customFields"] = [
+                {"id": self.custom_field_id(field["key"]), "value": field["field_value"]}
+                for field in contact["customFields"]
+            ]
+            self.contact_index[contact["id"]] = len(self.contacts)
+            self.contacts.append(contact)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """Threaded server with a listen backlog deep enough for concurrent clients."""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler emulating the IntakeQ client endpoints."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; avoid Nagle/delayed-ACK stalls
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        state = self.server.state
+        with state.lock:
+            state.connections += 1
+        if state.connect_latency:
+            time.sleep(state.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _begin(self):
+        """Account for a request and inject a fault if one is due; returns False if a fault was sent."""
+        state = self.server.state
+        with state.lock:
+            state.requests += 1
+        if state.request_latency:
+            time.sleep(state.request_latency)
+
+        roll = random.random()
+        if roll < state.throttle_rate:
+            with state.lock:
+                state.faults += 1
+            self.send_response(429)
+            self.send_header("Retry-After", str(state.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return False
+        if roll < state.throttle_rate + state.error_rate:
+            with state.lock:
+                state.faults += 1
+            self._send_json(503, {"error": "injected fault"})
+            return False
+        return True
+
+    def _authorized(self):
+        """Reject expired or unknown stub-issued bearer tokens with 401."""
+        token = (self.headers.get("Authorization") or "").partition("Bearer ")[2]
+        if not token.startswith("at-"):
+            return True
+        state = self.server.state
+        with state.lock:
+            issued = state.access_tokens.get(token)
+        if issued is not None and issued[1] > time.time():
+            return True
+        self._send_json(401, {"error": "invalid_token"})
+        return False
+
+    def do_GET(self):
+        if not self._begin():
+            return
+        state = self.server.state
+        parts = urlsplit(self.path)
+        if parts.path.endswith("/clients/search"):
+            email = parse_qs(parts.query).get("email", [""])[0].lower()
+            with state.lock:
+                matches = [c for c in state.clients.values() if c.get("Email", "").lower() == email]
+            self._send_json(200, matches)
+            return
+        if parts.path.endswith("/clients"):
+            self._list_clients(parse_qs(parts.query))
+            return
+        if parts.path.rstrip("/") == "/contacts":
+            if self._authorized():
+                self._list_contacts(parse_qs(parts.query))
+            return
+        if parts.path.startswith("/contacts/"):
+            if self._authorized():
+                self._get_contact(parts.path[len("/contacts/"):])
+            return
+        if parts.path.startswith("/locations/") and parts.path.endswith("/customFields"):
+            if self._authorized():
+                self._list_custom_fields()
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def _list_clients(self, query):
+        """IntakeQ client listing: pages of 100, optionally filtered by a search term.
+
+        Profile fields are only listed with includeProfile=true, as in IntakeQ.
+        """
+        state = self.server.state
+        page = max(int(query.get("page", ["1"])[0]), 1)
+        search = query.get("search", [""])[0].lower()
+        with state.lock:
+            clients = list(state.clients.values())
+        if search:
+            clients = [c for c in clients if search in c.get("Email", "").lower() or search in c.get("Name", "").lower()]
+        clients = clients[(page - 1) * 100:page * 100]
+        if query.get("includeProfile", [""])[0] != "true":
+            clients = [{k: v for k, v in c.items() if k not in PROFILE_FIELDS} for c in clients]
+        self._send_json(200, clients)
+
+    def _list_custom_fields(self):
+        """GoHighLevel custom field definitions."""
+        state = self.server.state
+        with state.lock:
+            fields = [
+                {"id": field_id, "name": key, "fieldKey": "contact." + "_".join(key.lower().replace("?", "").split())}
+                for key, field_id in state.custom_fields.items()
+            ]
+        self._send_json(200, {"customFields": fields})
+
+    def _get_contact(self, contact_id):
+        """GoHighLevel single contact, with ETag revalidation."""
+        state = self.server.state
+        with state.lock:
+            state.contact_fetches += 1
+            position = state.contact_index.get(contact_id)
+            contact = state.contacts[position] if position is not None else None
+        if contact is None:
+            self._send_json(404, {"message": "Contact not found"})
+            return
+        body = {"contact": contact}
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            with state.lock:
+                state.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_PUT(self):
+        body = self._read_json()
+        if not self._begin():
+            return
+        state = self.server.state
+        path = urlsplit(self.path).path
+        with state.lock:
+            position = state.contact_index.get(path[len("/contacts/"):]) if path.startswith("/contacts/") else None
+            if position is not None:
+                state.contacts[position] = {**state.contacts[position], **body}
+                contact = state.contacts[position]
+        if position is None:
+            self._send_json(404, {"message": "Contact not found"})
+            return
+        self._send_json(200, {"contact": contact})
+
+    def _list_contacts(self, query):
+        """GoHighLevel contact listing, paginated by startAfterId."""
+        state = self.server.state
+        limit = min(int(query.get("limit", ["20"])[0]), 100)
+        after = query.get("startAfterId", [None])[0]
+        start = state.contact_index[after] + 1 if after in state.contact_index else 0
+        contacts = state.contacts
+        search = query.get("query", [""])[0].lower()
+        if search:
+            # The cursor indexes the unfiltered list; filter what follows it
+            contacts = [c for c in contacts[start:] if search in c["email"] or search in c["firstName"].lower()]
+            start = 0
+        page = contacts[start:start + limit]
+        meta = {"total": len(state.contacts), "startAfterId": None, "startAfter": None, "nextPageUrl": None}
+        if page and start + limit < len(contacts):
+            meta["startAfterId"] = page[-1]["id"]
+            meta["startAfter"] = start + limit
+            meta["nextPageUrl"] = f"/contacts/?limit={limit}&startAfterId={page[-1]['id']}"
+        self._send_json(200, {"contacts": page, "meta": meta})
+
+    def _token(self):
+        """OAuth token endpoint: authorization_code and refresh_token grants (form-encoded)."""
+        length = int(self.headers.get("Content-Length") or 0)
+        form = dict(parse_qsl(self.rfile.read(length).decode("utf-8")))
+        if not self._begin():
+            return
+        state = self.server.state
+        with state.lock:
+            if form.get("grant_type") == "authorization_code" and form.get("code", "").startswith("code-"):
+                state.token_grants += 1
+                body = state.issue_token(form["code"][len("code-"):])
+            elif form.get("grant_type") == "refresh_token" and form.get("refresh_token") in state.refresh_tokens:
+                state.token_refreshes += 1
+                body = state.issue_token(state.refresh_tokens.pop(form["refresh_token"]))
+            else:
+                state.invalid_grants += 1
+                body = None
+        if body is None:
+            self._send_json(400, {"error": "invalid_grant"})
+        else:
+            self._send_json(200, body)
+
+    def do_POST(self):
+        if urlsplit(self.path).path == "/oauth/token":
+            self._token()
+            return
+        body = self._read_json()
+        if not self._begin():
+            return
+        state = self.server.state
+        if urlsplit(self.path).path.endswith("/clients"):
+            with state.lock:
+                body["ClientId"] = next(state.ids)
+                state.clients[body["ClientId"]] = body
+            self._send_json(200, body)
+            return
+        if urlsplit(self.path).path.endswith("/intakes"):
+            with state.lock:
+                body["Id"] = f"intake-{len(state.intakes) + 1}"
+                state.intakes.append(body)
+            self._send_json(200, body)
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def do_PATCH(self):
+        body = self._read_json()
+        if not self._begin():
+            return
+        state = self.server.state
+        try:
+            client_id = int(urlsplit(self.path).path.rsplit("/", 1)[-1])
+        except ValueError:
+            self._send_json(404, {"error": "not found"})
+            return
+        with state.lock:
+            client = state.clients.get(client_id)
+            if client is None:
+                self._send_json(404, {"error": "not found"})
+                return
+            client.update(body)
+            client["ClientId"] = client_id
+        self._send_json(200, client)
+
+
+def start_stub_server(port=0, connect_latency=0.0, request_latency=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1,
+                      contacts=0, token_ttl=86399):
+    """
+    Start the stub server on a background thread.
+
+    Args:
+        port (int): Port to bind (0 picks a free port)
+        connect_latency (float): Seconds charged per new connection
+        request_latency (float): Seconds charged per request
+        error_rate (float): Fraction of requests answered with 503
+        throttle_rate (float): Fraction of requests answered with 429
+        retry_after (int): Retry-After seconds sent with 429s
+        contacts (int): Number of GoHighLevel contacts to seed
+        token_ttl (int): Lifetime (seconds) of access tokens from /oauth/token
+
+    Returns:
+        StubHTTPServer: The running server; its ``state`` holds counters
+    """
+    server = StubHTTPServer(("127.0.0.1", port), StubHandler)
+    server.state = StubState(connect_latency, request_latency, error_rate, throttle_rate, retry_after, token_ttl)
+    server.state.seed_contacts(contacts)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local IntakeQ / GoHighLevel API stub")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0)
+    parser.add_argument("--request-latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--contacts", type=int, default=0, help="GoHighLevel contacts to seed")
+    parser.add_argument("--token-ttl", type=int, default=86399, help="OAuth access token lifetime (seconds)")
+    args = parser.parse_args()
+
+    server = start_stub_server(
+        args.port, args.connect_latency_ms / 1000, args.request_latency_ms / 1000,
+        args.error_rate, args.throttle_rate, args.retry_after, args.contacts, args.token_ttl
+    )
+    print(f"IntakeQ stub listening on http://127.0.0.1:{server.server_address[1]}/api/v1")
+    if args.contacts:
+        print(f"GoHighLevel stub serving {args.contacts} contacts at http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
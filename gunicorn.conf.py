@@ -0,0 +1,69 @@
+"""
+Gunicorn configuration for production serving (loaded automatically from the
+working directory):
+
+    gunicorn src.api.wsgi:app
+
+Every setting can be overridden from the environment so the same file works
+locally and on the host.
+"""
+
+import multiprocessing
+import os
+
+# Listen on the platform-assigned port
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+
+# Webhook handling is I/O-bound (IntakeQ round-trips), so each worker process
+# serves several requests at once on threads
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", max(2, multiprocessing.cpu_count())))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Keep idle client connections open for reuse; behind a load balancer this
+# should exceed the balancer's idle timeout
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Requests stuck this long get their worker restarted
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+# On SIGTERM, workers stop accepting connections and get this long to finish
+# in-flight webhooks (and queue jobs) before they are killed
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Build the app once in the master; workers fork with config, mapping plan
+# and imports already loaded
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Optional periodic worker recycling (0 disables it)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# The app logs each webhook itself; enable gunicorn's access log with "-" for stdout
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+# Each worker writes its metrics here so /metrics reports all workers
+os.environ.setdefault("METRICS_MULTIPROC_DIR", "data/metrics")
+
+
+def on_starting(server):
+    """Drop metrics snapshots left by the previous run."""
+    from src.utils.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir()
+
+
+def post_worker_init(worker):
+    """Start this worker's queue threads and log listener (threads do not survive fork)."""
+    from src.api.webhook_server import start_background_workers
+    start_background_workers(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    """Let in-flight queue jobs finish before the worker exits."""
+    from src.api.webhook_server import stop_background_workers
+    from src.utils.logging_setup import stop_logging
+    app = getattr(worker, "wsgi", None)
+    if app is not None:
+        stop_background_workers(app, graceful_timeout)
+    stop_logging()
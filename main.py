@@ -15,4 +15,6 @@ app = create_app()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    # Development server only; production runs gunicorn (see gunicorn.conf.py)
+    debug = os.environ.get("DEBUG", "False").lower() == "true"
+    app.run(host=os.environ.get("HOST", "0.0.0.0"), port=port, debug=debug)
@@ -0,0 +1,262 @@
+"""
+Asynchronous client for the IntakeQ API, built on httpx.
+
+Lets one event loop keep many upstream calls in flight (batch backfills,
+queue workers) with a bounded number of concurrent requests. Every operation
+runs the same flow as the sync IntakeQClient, so both clients stay in step.
+
+The flows and the rate limiter read and write the local SQLite stores (client
+index, ClientId cache, shared token buckets), so those steps run in worker
+threads and never block the event loop.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from src.api.http_session import resolve_http_config
+from src.api.intakeq_client import DEFAULT_FORM_ENDPOINT, STAGE_METRICS, IntakeQClientBase
+from src.api.retry import CONNECT_ERROR, OTHER_ERROR, arun_retry_loop, retry_loop
+from src.utils import json_codec
+from src.utils.change_detector import compute_digest
+from src.utils.client_id_cache import normalize_email
+from src.utils.logging_setup import log_body
+from src.utils.single_flight import AsyncSingleFlight
+
+# Default cap on requests in flight at once for a single client
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+def _classify_error(error):
+    """Tell connect failures (nothing was sent) from failures mid-request."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return CONNECT_ERROR
+    return OTHER_ERROR
+
+
+def _step(flow, value):
+    """Advance a flow by one request; returns (finished, next request or the flow's result)."""
+    try:
+        return False, flow.send(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+class AsyncIntakeQClient(IntakeQClientBase):
+    """Async client for interacting with the IntakeQ API."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        http_config: Optional[Dict[str, Any]] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        client_id_cache=None,
+        retry_config: Optional[Dict[str, Any]] = None,
+        rate_limiter=None,
+        breaker_config: Optional[Dict[str, Any]] = None,
+        client_index=None
+    ):
+        """
+        Initialize the async IntakeQ client.
+
+        Args:
+            api_key (str): IntakeQ API key
+            base_url (str): Override for the API base URL (defaults to INTAKEQ_BASE_URL or the public API)
+            http_config (dict): The "http" block from config.json (pool size, timeouts, keep-alive)
+            max_concurrency (int): Maximum number of requests in flight at once
+            client_id_cache (ClientIdCache): Optional email -> ClientId cache used to skip searches
+            retry_config (dict): The "retry" block from config.json
+            rate_limiter (RateLimiter): Optional limiter shared by all clients of the process
+            breaker_config (dict): The "circuit_breaker" block from config.json
+            client_index (ClientIndex): Optional local mirror of IntakeQ clients consulted before searching
+        """
+        super().__init__(
+            api_key, base_url, client_id_cache, retry_config, rate_limiter, breaker_config, client_index
+        )
+        self.settings = resolve_http_config(self.base_url, http_config)
+        self.max_concurrency = max_concurrency
+        # Created lazily so they bind to the event loop that uses them
+        self._client = None
+        self._semaphore = None
+        # Concurrent creates for one email would each miss the search and create a duplicate
+        self.single_flight = AsyncSingleFlight()
+
+    def _ensure_client(self):
+        """Create the httpx client and concurrency limiter on first use."""
+        if self._client is None:
+            settings = self.settings
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(settings["read_timeout"], connect=settings["connect_timeout"]),
+                limits=httpx.Limits(
+                    max_connections=max(settings["pool_maxsize"], self.max_concurrency),
+                    max_keepalive_connections=settings["pool_maxsize"] if settings["keep_alive"] else 0
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def _make_request(self, method, endpoint, data=None, idempotent=None):
+        """
+        Make a request to the IntakeQ API, retrying transient failures.
+
+        Args:
+            method (str): HTTP method (GET, POST, PATCH, etc.)
+            endpoint (str): API endpoint
+            data (dict): Request data
+            idempotent (bool): Override for whether the request is safe to retry
+
+        Returns:
+            dict: Response data, or a dict with "error" and "status_code" on failure
+
+        Raises:
+            CircuitOpenError: If the IntakeQ circuit is open
+        """
+        client = self._ensure_client()
+        url = f"{self.base_url}{endpoint}"
+        logged_url = self._loggable_url(endpoint)
+
+        logging.info("Making %s request to %s", method, logged_url)
+        # Encode once; the same bytes are logged and sent on every attempt
+        body = json_codec.dumps(data) if data is not None else None
+        if data:
+            log_body(logging.getLogger(), "Request data for %s %s", body, method, logged_url)
+
+        async def reserve():
+            # The limiter may be SQLite-backed and shared across processes
+            return await asyncio.to_thread(self._rate_limit_wait, method, endpoint) if self.rate_limiter else 0.0
+
+        async def send():
+            # Rate-limit and backoff sleeps are separate steps, so they don't hold a semaphore slot
+            async with self._semaphore:
+                try:
+                    with self.upstream_metrics.in_flight:
+                        return await client.request(method, url, content=body), None
+                except httpx.HTTPError as e:
+                    return None, e
+
+        loop = retry_loop(
+            method, logged_url, self.retry_policy, self.circuit_breaker, self.upstream_metrics, idempotent,
+            classify_error=_classify_error
+        )
+        response = await arun_retry_loop(loop, reserve, send)
+        if isinstance(response, dict):
+            return response
+        return self._handle_response(logged_url, response.status_code, response.content)
+
+    async def _run(self, flow):
+        """Drive a flow to completion, awaiting each request; the flow's own steps run in a worker thread."""
+        finished, request = await asyncio.to_thread(_step, flow, None)
+        while not finished:
+            stage = self._stage(request[0], request[1])
+            start = time.perf_counter()
+            with self._request_span(stage, request[0], request[1]):
+                result = await self._make_request(*request)
+            STAGE_METRICS[stage].observe(time.perf_counter() - start)
+            finished, request = await asyncio.to_thread(_step, flow, result)
+        return request
+
+    async def create_client(self, client_data):
+        """
+        Create or update a client in IntakeQ.
+
+        Concurrent calls for the same email share one search and write when
+        their data is identical and run one after the other otherwise, so the
+        later ones find the client the first created.
+
+        Args:
+            client_data (dict): Client data
+
+        Returns:
+            dict: Response data
+        """
+        email_key = normalize_email(client_data.get("Email"))
+        if not email_key:
+            return await self._run(self._create_client_flow(client_data))
+        return await self.single_flight.do(
+            email_key, lambda: self._run(self._create_client_flow(client_data)), fingerprint=compute_digest(client_data)
+        )
+
+    async def create_clients(self, client_data_list):
+        """
+        Create or update many clients concurrently.
+
+        Requests are bounded by max_concurrency and entries for the same email
+        are coalesced (see create_client); results keep the input order.
+
+        Args:
+            client_data_list (list): Client data dicts
+
+        Returns:
+            list: Response data for each client
+        """
+        return await asyncio.gather(*(self.create_client(client_data) for client_data in client_data_list))
+
+    async def search_clients(self, email):
+        """
+        Search for clients by email.
+
+        Args:
+            email (str): Email address
+
+        Returns:
+            list: Matching clients (empty if none or on error)
+        """
+        return await self._run(self._search_clients_flow(email))
+
+    async def update_client(self, client_id, client_data):
+        """
+        Update an existing client.
+
+        Args:
+            client_id (int): IntakeQ client ID
+            client_data (dict): Fields to update
+
+        Returns:
+            dict: Response data
+        """
+        return await self._run(self._update_client_flow(client_id, client_data))
+
+    async def submit_form(self, client_id, form_data, endpoint=DEFAULT_FORM_ENDPOINT):
+        """
+        Submit a client's mapped GLP-1 form answers.
+
+        Args:
+            client_id (int): IntakeQ client ID
+            form_data (dict): {"formName": ..., "fields": [{"id": ..., "value": ...}]} from the mapper
+            endpoint (str): Intake submission endpoint
+
+        Returns:
+            dict: Response data
+        """
+        return await self._run(self._submit_form_flow(client_id, form_data, endpoint))
+
+    async def add_tag(self, client_id, tag):
+        """
+        Add a tag to a client.
+
+        Args:
+            client_id (int): IntakeQ client ID
+            tag (str): Tag to add
+
+        Returns:
+            bool: True if the tag was added
+        """
+        return await self._run(self._add_tag_flow(client_id, tag))
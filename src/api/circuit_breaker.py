@@ -0,0 +1,199 @@
+"""
+Circuit breaker for upstream APIs.
+
+After a run of consecutive failures the breaker for a host opens and every
+request fails immediately with CircuitOpenError instead of tying up a worker
+waiting on a degraded upstream. Once the recovery timeout passes, a limited
+number of trial requests are let through (half-open); success closes the
+circuit, failure opens it again.
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from src.utils.metrics import BREAKER_OPENED, BREAKER_REJECTED, GAUGE, REGISTRY
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_BREAKER_CONFIG = {
+    "failure_threshold": 5,
+    "recovery_timeout": 30,
+    "half_open_max_calls": 1
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is refused because the upstream's circuit is open."""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"Circuit open for {host}, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one upstream host."""
+
+    def __init__(self, host, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1):
+        """
+        Initialize the breaker in the closed state.
+
+        Args:
+            host (str): Upstream host the breaker guards
+            failure_threshold (int): Consecutive failures that open the circuit
+            recovery_timeout (float): Seconds the circuit stays open before trial requests
+            half_open_max_calls (int): Trial requests allowed at once while half-open
+        """
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self._opened_metric = BREAKER_OPENED.labels(host)
+        self._rejected_metric = BREAKER_REJECTED.labels(host)
+
+    def before_request(self):
+        """
+        Check that a request may be sent.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or half-open with no trial slots left)
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.opened_at + self.recovery_timeout - now
+                if remaining > 0:
+                    self.rejected += 1
+                    self._rejected_metric.inc()
+                    raise CircuitOpenError(self.host, remaining)
+                logging.info("Circuit for %s half-open, allowing trial requests", self.host)
+                self.state = HALF_OPEN
+                self._half_open_calls = 0
+
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                self._rejected_metric.inc()
+                raise CircuitOpenError(self.host, self.recovery_timeout)
+            self._half_open_calls += 1
+
+    def release(self):
+        """
+        Give back a half-open trial slot taken by before_request() when no request was sent.
+
+        Call it when the request is abandoned without an outcome (client-side
+        rate limit, an unexpected error); otherwise the slot stays taken and
+        the breaker rejects every later call.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        """Record a request that reached the upstream and got a non-5xx answer."""
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info("Circuit for %s closed", self.host)
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """Record a transport error or 5xx response."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                    self._opened_metric.inc()
+                    logging.error("Circuit for %s opened after %s consecutive failures", self.host, self.failures)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        """
+        Current breaker state for health reporting.
+
+        Returns:
+            dict: State, consecutive failures and counters
+        """
+        with self._lock:
+            snapshot = {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected
+            }
+            if self.state == OPEN:
+                snapshot["retry_in"] = round(max(0.0, self.opened_at + self.recovery_timeout - time.monotonic()), 1)
+            return snapshot
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(base_url, breaker_config=None):
+    """
+    Get the process-wide breaker for an upstream host.
+
+    Args:
+        base_url (str): Base URL of the upstream API
+        breaker_config (dict): The "circuit_breaker" block from config.json
+
+    Returns:
+        CircuitBreaker: The host's breaker
+    """
+    host = urlsplit(base_url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            settings = dict(DEFAULT_BREAKER_CONFIG)
+            settings.update(breaker_config or {})
+            breaker = CircuitBreaker(
+                host,
+                failure_threshold=settings["failure_threshold"],
+                recovery_timeout=settings["recovery_timeout"],
+                half_open_max_calls=settings["half_open_max_calls"]
+            )
+            _breakers[host] = breaker
+        return breaker
+
+
+def circuit_breaker_states():
+    """
+    Snapshot every breaker created in this process.
+
+    Returns:
+        dict: Host -> breaker snapshot
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.host: breaker.snapshot() for breaker in breakers}
+
+
+def _collect_states():
+    """Scrape-time gauge of each breaker's state (1 for the current state, 0 for the others)."""
+    samples = []
+    for host, snapshot in circuit_breaker_states().items():
+        for state in (CLOSED, OPEN, HALF_OPEN):
+            samples.append(((host, state), 1 if snapshot["state"] == state else 0))
+    return [(
+        "ghl_intakeq_circuit_breaker_state", GAUGE, "Circuit breaker state of each upstream in this process",
+        ("upstream", "state"), samples
+    )]
+
+
+REGISTRY.register_collector("circuit_breakers", _collect_states)
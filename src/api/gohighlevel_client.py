@@ -3,146 +3,356 @@ Client for interacting with the GoHighLevel API.
 """
 
 import os
+import time
 import logging
+import threading
 import requests
 from dotenv import load_dotenv
+from urllib.parse import urlsplit
+from src.api.http_session import get_session, get_timeout, resolve_http_config
+from src.api.retry import RetryPolicy, retry_loop, run_retry_loop
+from src.api.circuit_breaker import get_circuit_breaker
+from src.api.oauth import OAuthError
+from src.api.pagination import Page, PaginationError, iter_items, iter_pages
+from src.utils import json_codec
+from src.utils.metrics import UpstreamMetrics
+from src.utils.tracing import CLIENT, start_span
 
 # Load environment variables
 load_dotenv()
 
+# Custom field definitions change rarely; refetch them at most this often (seconds)
+CUSTOM_FIELDS_TTL = 3600
+
 class GoHighLevelClient:
     """Client for interacting with the GoHighLevel API."""
     
-    def __init__(self):
-        """Initialize the GoHighLevel client."""
-        self.base_url = "https://services.leadconnectorhq.com"
+    def __init__(self, base_url=None, http_config=None, retry_config=None, rate_limiter=None, breaker_config=None,
+                 token_manager=None, contact_cache=None):
+        """
+        Initialize the GoHighLevel client.
+
+        Args:
+            base_url (str): Override for the API base URL (defaults to GHL_BASE_URL or the public API)
+            http_config (dict): The "http" block from config.json (pool size, timeouts, keep-alive)
+            retry_config (dict): The "retry" block from config.json
+            rate_limiter (RateLimiter): Optional limiter shared by all clients of the process
+            breaker_config (dict): The "circuit_breaker" block from config.json
+            token_manager (TokenManager): Supplies per-location OAuth tokens; without it
+                GHL_ACCESS_TOKEN is sent for every location
+            contact_cache (ContactCache): Optional read-through cache for get_contact
+        """
+        self.base_url = base_url or os.getenv("GHL_BASE_URL") or "https://services.leadconnectorhq.com"
         self.client_id = os.getenv("GHL_CLIENT_ID")
         self.client_secret = os.getenv("GHL_CLIENT_SECRET")
-        self.access_token = None
+        # A location or private-integration token, used when no OAuth token manager is configured
+        self.access_token = os.getenv("GHL_ACCESS_TOKEN")
+        self.token_manager = token_manager
+        self.contact_cache = contact_cache
+
+        # Connections are pooled per host and shared across client instances
+        self.session = get_session(self.base_url, http_config)
+        self.timeout = get_timeout(resolve_http_config(self.base_url, http_config))
+        self.retry_policy = RetryPolicy(self.base_url, retry_config)
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = get_circuit_breaker(self.base_url, breaker_config)
+        self.upstream_metrics = UpstreamMetrics(urlsplit(self.base_url).netloc)
+        # location_id -> (expires_at, {field id: keys})
+        self._custom_field_keys = {}
+        self._custom_field_lock = threading.Lock()
+    
+    def has_credentials(self, location_id=None):
+        """
+        Whether requests for a location can be authorized.
+
+        With an OAuth token manager a location is needed to pick the token;
+        otherwise GHL_ACCESS_TOKEN must be set.
+
+        Args:
+            location_id (str): The location the request is for
+        """
+        return (self.token_manager is not None and bool(location_id)) or bool(self.access_token)
     
-    def _get_headers(self):
+    def _access_token(self, location_id):
+        """
+        Get the token to send for a location.
+
+        Raises:
+            OAuthError: If the location's OAuth token cannot be obtained
+        """
+        if self.token_manager is not None and location_id:
+            return self.token_manager.get_token(location_id)
+        return self.access_token
+    
+    def _get_headers(self, access_token=None):
         """Get headers for API requests."""
-        if not self.access_token:
+        access_token = access_token or self.access_token
+        if not access_token:
             logging.error("No access token available")
             raise ValueError("No access token available")
         
         return {
-            "Authorization": f"Bearer {self.access_token}",
+            "Authorization": f"Bearer {access_token}",
             "Version": "2021-07-28",
             "Content-Type": "application/json"
         }
     
-    def get_contact(self, contact_id):
+    def _make_request(self, method, endpoint, data=None, params=None, idempotent=None, location_id=None,
+                      headers=None, response_meta=None):
         """
-        Get a contact by ID.
+        Make a request to the GoHighLevel API, retrying transient failures.
         
         Args:
-            contact_id (str): The ID of the contact
+            method (str): HTTP method (GET, POST, PUT, etc.)
+            endpoint (str): API endpoint
+            data (dict): Request data
+            params (dict): Query string parameters
+            idempotent (bool): Override for whether the request is safe to retry
+            location_id (str): Location whose OAuth token authorizes the request
+            headers (dict): Extra request headers (e.g. conditional request headers)
+            response_meta (dict): If given, filled with the final status_code, etag and last_modified
             
         Returns:
-            dict: The contact data
+            dict: Response data or None if request failed
+
+        Raises:
+            CircuitOpenError: If the GoHighLevel circuit is open
         """
-        logging.info(f"Getting contact {contact_id} from GoHighLevel")
+        with start_span("gohighlevel", CLIENT, {
+            "http.method": method,
+            "url.path": endpoint,
+            "server.address": self.upstream_metrics.host
+        }):
+            return self._send_request(method, endpoint, data, params, idempotent, location_id, headers, response_meta)
+
+    def _send_request(self, method, endpoint, data, params, idempotent, location_id, headers, response_meta):
+        """Send a request for _make_request (in its span), with retries and token renewal."""
+        url = f"{self.base_url}{endpoint}"
+        logging.info("Making %s request to %s", method, url)
+        # Encode once; the same bytes are sent on every attempt
+        body = json_codec.dumps(data) if data is not None else None
+        try:
+            access_token = self._access_token(location_id)
+        except OAuthError as e:
+            logging.error("No GoHighLevel token for location %s: %s", location_id, e)
+            return {"error": str(e), "status_code": e.status_code or 401}
+        if not access_token:
+            logging.error("No GoHighLevel access token available")
+            return {"error": "No access token available", "status_code": 401}
+        credentials = {"access_token": access_token}
+
+        def reserve():
+            if self.rate_limiter is None:
+                return 0.0
+            return self.rate_limiter.reserve(self.base_url, method, endpoint)
+
+        def send():
+            try:
+                with self.upstream_metrics.in_flight:
+                    return self.session.request(
+                        method, url, headers={**self._get_headers(credentials["access_token"]), **(headers or {})},
+                        data=body, params=params, timeout=self.timeout
+                    ), None
+            except requests.exceptions.RequestException as e:
+                return None, e
+
+        def renew():
+            credentials["access_token"] = self.token_manager.renew(location_id, credentials["access_token"])
+            return True
+
+        loop = retry_loop(
+            method, url, self.retry_policy, self.circuit_breaker, self.upstream_metrics, idempotent,
+            on_unauthorized=renew if self.token_manager is not None and location_id else None
+        )
+        try:
+            response = run_retry_loop(loop, reserve, send)
+        except OAuthError as e:
+            logging.error("Could not renew the GoHighLevel token for %s: %s", location_id, e)
+            return {"error": str(e), "status_code": 401}
+        if isinstance(response, dict):
+            return response
         
-        # TODO: Implement OAuth token retrieval
-        # For now, this is a placeholder implementation
+        logging.info("Response status: %s", response.status_code)
+        if response_meta is not None:
+            response_meta.update(
+                status_code=response.status_code,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
         
-        # Mock response for development with enhanced fields
-        mock_contact = {
-            "id": "1872",  # Client ID as specified
-            "firstName": "Rolanda",
-            "lastName": "Green",
-            "email": "mz_green174@yahoo.com",
-            "phone": "(773) 726-2196",  # Mobile phone
-            "address1": "",  # Address left empty as specified
-            "city": "",
-            "state": "",
-            "postalCode": "",
-            "gender": "Female",
-            "dateOfBirth": "",  # Empty for now
-            "tags": ["paid", "new-customer"],
-            "customFields": [
-                {
-                    "id": "location_field_id",
-                    "key": "location",
-                    "field_value": "Downtown"
-                },
-                {
-                    "id": "treatment_field_id",
-                    "key": "treatment",
-                    "field_value": "Weight Loss"
-                },
-                {
-                    "id": "sex_field_id",
-                    "key": "sex",
-                    "field_value": "Female"
-                },
-                {
-                    "id": "marital_status_field_id",
-                    "key": "marital_status",
-                    "field_value": ""
-                },
-                {
-                    "id": "height_feet_field_id",
-                    "key": "height_feet",
-                    "field_value": ""
-                },
-                {
-                    "id": "height_inches_field_id",
-                    "key": "height_inches",
-                    "field_value": ""
-                },
-                {
-                    "id": "bmi_field_id",
-                    "key": "bmi",
-                    "field_value": ""
-                },
-                {
-                    "id": "current_weight_field_id",
-                    "key": "current_weight",
-                    "field_value": ""
-                },
-                {
-                    "id": "target_weight_field_id",
-                    "key": "target_weight",
-                    "field_value": ""
-                },
-                {
-                    "id": "body_mass_reduction_percentage_field_id",
-                    "key": "body_mass_reduction_percentage",
-                    "field_value": ""
-                },
-                {
-                    "id": "current_weight_loss_medication_field_id",
-                    "key": "current_weight_loss_medication",
-                    "field_value": ""
-                },
-                {
-                    "id": "tracking_field_id",
-                    "key": "tracking",
-                    "field_value": ""
-                },
-                {
-                    "id": "check_all_that_apply_in_the_past_2_weeks_other_field_id",
-                    "key": "check_all_that_apply_in_the_past_2_weeks_other",
-                    "field_value": "Headache, Fatigue"
-                },
-                {
-                    "id": "if_yes_which_glp1_medication_field_id",
-                    "key": "if_yes_which_glp1_medication",
-                    "field_value": "Ozempic"
-                },
-                {
-                    "id": "have_you_ever_been_diagnosed_with_any_of_the_following_conditions_field_id",
-                    "key": "have_you_ever_been_diagnosed_with_any_of_the_following_conditions",
-                    "field_value": "Hypertension, Diabetes"
-                },
-                {
-                    "id": "what_brings_you_here_today_field_id",
-                    "key": "what_brings_you_here_today",
-                    "field_value": "Weight loss management"
-                }
-            ]
-        }
+        if response.status_code == 404:
+            logging.error("Resource not found")
+            return {"error": "Resource not found", "status_code": 404}
+        
+        if response.status_code >= 400:
+            logging.error("Request failed: %s Error for url: %s", response.status_code, url)
+            return {"error": f"{response.status_code} Error for url: {url}", "status_code": response.status_code}
+        
+        if not response.content:
+            return {}
+        
+        try:
+            return json_codec.loads(response.content)
+        except ValueError as e:
+            logging.error("Failed to parse JSON response: %s", e)
+            return {"error": f"Invalid JSON response: {str(e)}", "status_code": response.status_code}
+    
+    def list_contacts(self, location_id, limit=100, start_after_id=None, start_after=None, query=None):
+        """
+        Get one page of a location's contacts.
+        
+        Args:
+            location_id (str): The GoHighLevel location (sub-account) ID
+            limit (int): Page size (the API allows at most 100)
+            start_after_id (str): Cursor: ID of the last contact of the previous page
+            start_after (int): Cursor: timestamp of the last contact of the previous page
+            query (str): Optional search term
+            
+        Returns:
+            dict: {"contacts": [...], "meta": {...}} with the next page's cursor in meta,
+                or a dict with "error" and "status_code" on failure
+        """
+        params = {"locationId": location_id, "limit": limit}
+        if start_after_id:
+            params["startAfterId"] = start_after_id
+        if start_after:
+            params["startAfter"] = start_after
+        if query:
+            params["query"] = query
+        return self._make_request("GET", "/contacts/", params=params, location_id=location_id)
+    
+    def _fetch_contacts_page(self, location_id, limit, query, cursor):
+        """Fetch one page of contacts for iter_pages; the cursor is {"start_after_id", "start_after"}."""
+        cursor = cursor or {}
+        result = self.list_contacts(
+            location_id, limit, cursor.get("start_after_id"), cursor.get("start_after"), query
+        )
+        if not isinstance(result, dict) or "error" in result:
+            result = result if isinstance(result, dict) else {"error": "Empty response"}
+            raise PaginationError(f"Failed to list contacts: {result['error']}", result.get("status_code"))
+        contacts = result.get("contacts") or []
+        meta = result.get("meta") or {}
+        next_cursor = None
+        if contacts and meta.get("startAfterId"):
+            next_cursor = {"start_after_id": meta["startAfterId"], "start_after": meta.get("startAfter")}
+        return Page(contacts, next_cursor)
+    
+    def iter_contact_pages(self, location_id, limit=100, query=None, cursor=None, prefetch=True):
+        """
+        Lazily iterate pages of a location's contacts, fetching the next page in the background.
+        
+        Args:
+            location_id (str): The GoHighLevel location ID
+            limit (int): Page size (at most 100)
+            query (str): Optional search term
+            cursor (dict): Cursor to start from (a previous page's next_cursor)
+            prefetch (bool): Fetch the next page while the caller processes the current one
+            
+        Yields:
+            Page: Lists of contacts, with the next page's cursor as next_cursor
+            
+        Raises:
+            PaginationError: If a page cannot be fetched
+        """
+        fetch = lambda page_cursor: self._fetch_contacts_page(location_id, limit, query, page_cursor)  # noqa: E731
+        return iter_pages(fetch, cursor, prefetch)
+    
+    def iter_contacts(self, location_id, limit=100, prefetch=True):
+        """
+        Lazily iterate every contact of a location without holding them all in memory.
+        
+        Args:
+            location_id (str): The GoHighLevel location ID
+            limit (int): Page size (at most 100)
+            prefetch (bool): Fetch the next page while the caller processes the current one
+            
+        Yields:
+            dict: Each contact
+            
+        Raises:
+            PaginationError: If a page cannot be fetched
+        """
+        return iter_items(self.iter_contact_pages(location_id, limit, prefetch=prefetch))
+    
+    def iter_search(self, location_id, query, limit=100, prefetch=True):
+        """
+        Lazily iterate a location's contacts matching a search term.
+        
+        Args:
+            location_id (str): The GoHighLevel location ID
+            query (str): Search term (name, email, phone, ...)
+            limit (int): Page size (at most 100)
+            prefetch (bool): Fetch the next page while the caller processes the current one
+            
+        Yields:
+            dict: Each matching contact
+            
+        Raises:
+            PaginationError: If a page cannot be fetched
+        """
+        return iter_items(self.iter_contact_pages(location_id, limit, query, prefetch=prefetch))
+    
+    def get_contact(self, contact_id, location_id=None):
+        """
+        Get a contact by ID, through the contact cache if one is configured.
         
-        return mock_contact
+        Args:
+            contact_id (str): The ID of the contact
+            location_id (str): The contact's location (selects its OAuth token)
+            
+        Returns:
+            dict: The contact data, or a dict with "error" and "status_code" on
+            failure (a 404 may be served from the cache)
+        """
+        fetch = lambda headers: self._fetch_contact(contact_id, location_id, headers)  # noqa: E731
+        if self.contact_cache is None:
+            result, _ = fetch({})
+            return result.get("contact", result) if result and "error" not in result else result
+        return self.contact_cache.get(contact_id, fetch)
+    
+    def _fetch_contact(self, contact_id, location_id, headers):
+        """GET one contact; returns the result and the response's status and validators."""
+        logging.info("Getting contact %s from GoHighLevel", contact_id)
+        meta = {}
+        result = self._make_request(
+            "GET", f"/contacts/{contact_id}", location_id=location_id, headers=headers, response_meta=meta
+        )
+        return result, meta
+    
+    def get_custom_field_keys(self, location_id):
+        """
+        Map a location's custom field ids to the keys the mappings use.
+
+        The contacts API returns custom fields as {id, value}, while webhooks
+        and config/mappings.json use the field's name or its key (fieldKey
+        without the "contact." prefix). Definitions are cached for
+        CUSTOM_FIELDS_TTL seconds per location.
+
+        Args:
+            location_id (str): The GoHighLevel location ID
+
+        Returns:
+            dict: Field id -> tuple of keys (empty if the definitions cannot be fetched)
+        """
+        if not location_id:
+            return {}
+        cached = self._custom_field_keys.get(location_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        with self._custom_field_lock:
+            cached = self._custom_field_keys.get(location_id)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+            result = self._make_request("GET", f"/locations/{location_id}/customFields", location_id=location_id)
+            if not result or "error" in result:
+                logging.warning("Could not fetch custom fields for location %s: %s",
+                                location_id, (result or {}).get("error"))
+                return {}
+            keys = {}
+            for field in result.get("customFields") or ():
+                field_key = (field.get("fieldKey") or "").split(".", 1)[-1]
+                names = tuple(dict.fromkeys(k for k in (field.get("name"), field_key) if k))
+                if field.get("id") and names:
+                    keys[field["id"]] = names
+            self._custom_field_keys[location_id] = (time.monotonic() + CUSTOM_FIELDS_TTL, keys)
+            return keys
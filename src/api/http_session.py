@@ -0,0 +1,137 @@
+"""
+Shared, pooled HTTP sessions for the upstream API clients.
+
+Every API client talks to its upstream through a long-lived
+``requests.Session`` so that TCP/TLS connections are kept alive and reused
+across webhooks instead of being re-established for every request.
+"""
+
+import logging
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Defaults used when config.json has no "http" block (or omits a key)
+DEFAULT_HTTP_CONFIG = {
+    "pool_connections": 4,
+    "pool_maxsize": 20,
+    "connect_timeout": 3.05,
+    "read_timeout": 30,
+    "keep_alive": True
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _host_key(base_url):
+    """Return the scheme://host[:port] key a session is shared under."""
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def resolve_http_config(base_url, http_config=None):
+    """
+    Resolve the effective HTTP settings for an upstream host.
+
+    The "http" block in config.json holds a "default" section and optional
+    per-host overrides under "hosts", keyed by hostname.
+
+    Args:
+        base_url (str): Base URL of the upstream API
+        http_config (dict): The "http" block from config.json
+
+    Returns:
+        dict: The merged settings for the host
+    """
+    settings = dict(DEFAULT_HTTP_CONFIG)
+    if not http_config:
+        return settings
+
+    settings.update(http_config.get("default", {}))
+    hostname = urlsplit(base_url).hostname or ""
+    settings.update(http_config.get("hosts", {}).get(hostname, {}))
+    return settings
+
+
+def get_timeout(settings):
+    """
+    Build the (connect, read) timeout tuple passed to requests.
+
+    Args:
+        settings (dict): Resolved HTTP settings
+
+    Returns:
+        tuple: (connect_timeout, read_timeout)
+    """
+    return (settings["connect_timeout"], settings["read_timeout"])
+
+
+def get_session(base_url, http_config=None):
+    """
+    Get the process-wide session for an upstream host, creating it on first use.
+
+    Sessions are shared by every client instance talking to the same host, so
+    constructing a new client does not throw away warm connections.
+
+    Args:
+        base_url (str): Base URL of the upstream API
+        http_config (dict): The "http" block from config.json
+
+    Returns:
+        requests.Session: The pooled session for the host
+    """
+    key = _host_key(base_url)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is not None:
+            return session
+
+        settings = resolve_http_config(base_url, http_config)
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings["pool_connections"],
+            pool_maxsize=settings["pool_maxsize"],
+            max_retries=0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not settings["keep_alive"]:
+            session.headers["Connection"] = "close"
+
+        logging.info(
+            "Created HTTP session for %s (pool_maxsize=%s, keep_alive=%s)",
+            key, settings['pool_maxsize'], settings['keep_alive']
+        )
+        _sessions[key] = session
+        return session
+
+
+def close_sessions():
+    """Close every pooled session. Used on shutdown and by benchmarks."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _drop_inherited_connections():
+    """
+    Drop pooled connections inherited across fork.
+
+    A socket opened by the parent must not be shared with a child, so the
+    child's sessions start with empty pools and open their own connections.
+    """
+    for session in list(_sessions.values()):
+        session.close()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_drop_inherited_connections)
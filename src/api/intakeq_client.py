@@ -3,23 +3,74 @@ Client for interacting with the IntakeQ API.
 """
 
 import os
+import time
 import logging
 import requests
 from dotenv import load_dotenv
-import json
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
+from urllib.parse import quote, urlencode, urlsplit
+from src.api.http_session import get_session, get_timeout, resolve_http_config
+from src.api.retry import RetryPolicy, retry_loop, run_retry_loop
+from src.api.circuit_breaker import get_circuit_breaker
+from src.api.pagination import Page, PaginationError, iter_items, iter_pages
+from src.utils import json_codec
+from src.utils.client_id_cache import normalize_email
+from src.utils.logging_setup import log_body
+from src.utils import metrics
+from src.utils.tracing import CLIENT, start_span
+
+# Latency histogram of each IntakeQ stage (retries and backoff included)
+STAGE_METRICS = {
+    "intakeq_search": metrics.STAGE_INTAKEQ_SEARCH,
+    "intakeq_write": metrics.STAGE_INTAKEQ_WRITE,
+    "intakeq_read": metrics.STAGE_INTAKEQ_READ
+}
 
 # Load environment variables
 load_dotenv()
 
-class IntakeQClient:
-    """Client for interacting with the IntakeQ API."""
+# IntakeQ returns client lists in fixed pages of this size
+CLIENTS_PAGE_SIZE = 100
+
+# Where GLP-1 form answers are submitted (overridable via glp1_forms.endpoint)
+DEFAULT_FORM_ENDPOINT = "/intakes"
+
+class IntakeQClientBase:
+    """
+    Transport-independent core shared by the sync and async IntakeQ clients.
+
+    Each API operation is written once as a flow: a generator that yields
+    ``(method, endpoint, data[, idempotent])`` requests and receives the parsed
+    response for each. Subclasses drive flows with their own transport via
+    ``_make_request``.
+    """
     
-    def __init__(self, api_key: str):
-        """Initialize the IntakeQ client."""
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        client_id_cache=None,
+        retry_config=None,
+        rate_limiter=None,
+        breaker_config=None,
+        client_index=None
+    ):
+        """
+        Initialize the shared client state.
+
+        Args:
+            api_key (str): IntakeQ API key
+            base_url (str): Override for the API base URL (defaults to INTAKEQ_BASE_URL or the public API)
+            client_id_cache (ClientIdCache): Optional email -> ClientId cache used to skip searches
+            retry_config (dict): The "retry" block from config.json
+            rate_limiter (RateLimiter): Optional limiter shared by all clients of the process
+            breaker_config (dict): The "circuit_breaker" block from config.json
+            client_index (ClientIndex): Optional local mirror of IntakeQ clients consulted before searching
+        """
         self.api_key = api_key
-        self.base_url = "https://intakeq.com/api/v1"  # Updated base URL
+        self.client_id_cache = client_id_cache
+        self.client_index = client_index
+        self.base_url = base_url or os.getenv("INTAKEQ_BASE_URL") or "https://intakeq.com/api/v1"
         self.headers = {
             "X-Auth-Key": api_key,  # Using X-Auth-Key header as per API docs
             "Content-Type": "application/json",
@@ -28,51 +79,277 @@ class IntakeQClient:
         self.logger = logging.getLogger(__name__)
         if not self.api_key:
             raise ValueError("INTAKEQ_API_KEY environment variable is not set")
-        logging.info(f"IntakeQ API Key found: {self.api_key[:4]}...")
+        self.retry_policy = RetryPolicy(self.base_url, retry_config)
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = get_circuit_breaker(self.base_url, breaker_config)
+        self.upstream_metrics = metrics.UpstreamMetrics(urlsplit(self.base_url).netloc)
+
+    def _rate_limit_wait(self, method, endpoint):
+        """
+        Reserve a rate-limit slot for a request.
+
+        Returns:
+            float: Seconds to wait before sending, or None if the request must be rejected
+        """
+        if self.rate_limiter is None:
+            return 0.0
+        return self.rate_limiter.reserve(self.base_url, method, endpoint)
+
+    @staticmethod
+    def _stage(method, endpoint):
+        """The pipeline stage a request belongs to (a key of STAGE_METRICS)."""
+        if method in ("POST", "PATCH", "PUT"):
+            return "intakeq_write"
+        if "search" in endpoint:
+            return "intakeq_search"
+        return "intakeq_read"
+
+    def _request_span(self, stage, method, endpoint):
+        """Start the span of one request (retries included); the query string is left out as it may hold PHI."""
+        return start_span(stage, CLIENT, {
+            "http.method": method,
+            "url.path": endpoint.split("?", 1)[0],
+            "server.address": self.upstream_metrics.host
+        })
+
+    def _loggable_url(self, endpoint):
+        """The URL of a request without its query string, which may hold PHI (e.g. ?email=), for logs and errors."""
+        return f"{self.base_url}{endpoint.split('?', 1)[0]}"
+
+    def _handle_response(self, url, status_code, body):
+        """
+        Turn an HTTP response into the client's result convention.
+
+        Args:
+            url (str): Requested URL, without its query string (see _loggable_url)
+            status_code (int): HTTP status code
+            body (bytes): Raw response body
 
-    def _make_request(self, method, endpoint, data=None):
+        Returns:
+            dict: Response data, or a dict with "error" and "status_code" on failure
         """
-        Make a request to the IntakeQ API.
+        logging.info("Response status: %s", status_code)
+        log_body(logging.getLogger(), "Response body from %s", body, url)
+        
+        if status_code == 401:
+            logging.error("Authentication failed")
+            return {"error": "Authentication failed", "status_code": 401}
+        
+        if status_code == 404:
+            logging.error("Resource not found")
+            return {"error": "Resource not found", "status_code": 404}
+        
+        if status_code >= 400:
+            logging.error("Request failed: %s Error for url: %s", status_code, url)
+            return {"error": f"{status_code} Error for url: {url}", "status_code": status_code}
+        
+        if not body:
+            return {}
+        
+        try:
+            return json_codec.loads(body)
+        except ValueError as e:
+            logging.error("Failed to parse JSON response: %s", e)
+            return {"error": f"Invalid JSON response: {str(e)}", "status_code": status_code}
+
+    def _create_client_flow(self, client_data):
+        """Flow for create_client: match locally or search by email, then POST or PATCH."""
+        email = client_data.get("Email")
+        if not email:
+            logging.error("Email is required")
+            return None
+        
+        cache = self.client_id_cache
+        index = self.client_index
+        
+        # Skip the search when we already know the client's ID
+        client_id = cache.get(email) if cache is not None else None
+        source = "cached"
+        if not client_id and index is not None:
+            # Only an exact email match may be written to; see ClientIndex.match_email
+            client_id = index.match_email(email)
+            source = "indexed"
+        if client_id:
+            logging.info("Updating %s client %s", source, client_id)
+            result = yield ("PATCH", f"/clients/{client_id}", client_data)
+            if not (result and result.get("status_code") == 404):
+                self._remember_client(email, client_id, client_data, result)
+                return result
+            # The client was deleted or merged upstream; fall back to a search
+            logging.info("%s client %s not found, searching by email", source.capitalize(), client_id)
+            if cache is not None:
+                cache.invalidate(email)
+            if index is not None:
+                index.remove(client_id)
+        
+        # Search for existing client by email
+        search_result = yield ("GET", f"/clients/search?email={quote(email.lower())}", None)
+        if isinstance(search_result, list):
+            # Never update someone else's record: the email must match exactly
+            key = normalize_email(email)
+            search_result = [c for c in search_result if normalize_email(c.get("Email")) == key]
+        if not search_result or "error" in search_result:
+            logging.info("No existing client found, creating new client")
+            result = yield ("POST", "/clients", client_data)
+            if result and "error" not in result:
+                self._remember_client(email, result.get("ClientId"), client_data, result)
+            return result
+        
+        # Update existing client
+        client_id = search_result[0].get("ClientId")
+        if client_id:
+            logging.info("Updating existing client %s", client_id)
+            result = yield ("PATCH", f"/clients/{client_id}", client_data)
+            self._remember_client(email, client_id, client_data, result)
+            return result
+        
+        logging.error("Failed to get client ID from search result")
+        return None
+
+    def _remember_client(self, email, client_id, client_data, result):
+        """Record a successful write in the ClientId cache and the local client index."""
+        if not client_id or (result and "error" in result):
+            return
+        if self.client_id_cache is not None:
+            self.client_id_cache.set(email, client_id)
+        if self.client_index is not None:
+            client = dict(client_data)
+            if isinstance(result, dict):
+                client.update(result)
+            client["ClientId"] = client_id
+            self.client_index.upsert(client)
+
+    def _search_clients_flow(self, email):
+        """Flow for search_clients."""
+        result = yield ("GET", f"/clients/search?email={quote(email.lower())}", None)
+        if not result or "error" in result:
+            return []
+        if self.client_id_cache is not None and len(result) == 1:
+            self.client_id_cache.set(email, result[0].get("ClientId"))
+        if self.client_index is not None:
+            for client in result:
+                self.client_index.upsert(client)
+        return result
+
+    def _clients_page_flow(self, search=None, page=1, include_profile=False):
+        """Flow for one page of the client list (optionally filtered by a search term)."""
+        params = {"page": page}
+        if search:
+            params["search"] = search
+        if include_profile:
+            params["includeProfile"] = "true"
+        return (yield ("GET", f"/clients?{urlencode(params)}", None))
+
+    def _submit_form_flow(self, client_id, form_data, endpoint):
+        """Flow for submit_form."""
+        body = {
+            "ClientId": client_id,
+            "QuestionnaireName": form_data.get("formName"),
+            "Questions": [{"Id": field["id"], "Answer": field["value"]} for field in form_data.get("fields", [])]
+        }
+        return (yield ("POST", endpoint, body))
+
+    def _update_client_flow(self, client_id, client_data):
+        """Flow for update_client."""
+        return (yield ("PATCH", f"/clients/{client_id}", client_data))
+
+    def _add_tag_flow(self, client_id, tag):
+        """Flow for add_tag."""
+        # Adding a tag twice is harmless, so the POST is safe to retry
+        response = yield ("POST", "/clientTags", {"ClientId": client_id, "Tag": tag}, True)
+        if response is None or "error" in response:
+            self.logger.error("Failed to add tag %s to client %s", tag, client_id)
+            return False
+        self.logger.info("Successfully added tag %s to client %s", tag, client_id)
+        return True
+
+
+class IntakeQClient(IntakeQClientBase):
+    """Client for interacting with the IntakeQ API."""
+    
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        http_config: Optional[Dict[str, Any]] = None,
+        client_id_cache=None,
+        retry_config: Optional[Dict[str, Any]] = None,
+        rate_limiter=None,
+        breaker_config: Optional[Dict[str, Any]] = None,
+        client_index=None
+    ):
+        """
+        Initialize the IntakeQ client.
+
+        Args:
+            api_key (str): IntakeQ API key
+            base_url (str): Override for the API base URL (defaults to INTAKEQ_BASE_URL or the public API)
+            http_config (dict): The "http" block from config.json (pool size, timeouts, keep-alive)
+            client_id_cache (ClientIdCache): Optional email -> ClientId cache used to skip searches
+            retry_config (dict): The "retry" block from config.json
+            rate_limiter (RateLimiter): Optional limiter shared by all clients of the process
+            breaker_config (dict): The "circuit_breaker" block from config.json
+            client_index (ClientIndex): Optional local mirror of IntakeQ clients consulted before searching
+        """
+        super().__init__(
+            api_key, base_url, client_id_cache, retry_config, rate_limiter, breaker_config, client_index
+        )
+
+        # Connections are pooled per host and shared across client instances
+        self.session = get_session(self.base_url, http_config)
+        self.timeout = get_timeout(resolve_http_config(self.base_url, http_config))
+
+    def _make_request(self, method, endpoint, data=None, idempotent=None):
+        """
+        Make a request to the IntakeQ API, retrying transient failures.
         
         Args:
             method (str): HTTP method (GET, POST, PATCH, etc.)
             endpoint (str): API endpoint
             data (dict): Request data
+            idempotent (bool): Override for whether the request is safe to retry
             
         Returns:
             dict: Response data or None if request failed
+
+        Raises:
+            CircuitOpenError: If the IntakeQ circuit is open
         """
         url = f"{self.base_url}{endpoint}"
+        logged_url = self._loggable_url(endpoint)
         
+        logging.info("Making %s request to %s", method, logged_url)
+        # Encode once; the same bytes are logged and sent on every attempt
+        body = json_codec.dumps(data) if data is not None else None
+        if data:
+            log_body(logging.getLogger(), "Request data for %s %s", body, method, logged_url)
+        
+        def send():
+            try:
+                with self.upstream_metrics.in_flight:
+                    return self.session.request(method, url, headers=self.headers, data=body, timeout=self.timeout), None
+            except requests.exceptions.RequestException as e:
+                return None, e
+
+        loop = retry_loop(method, logged_url, self.retry_policy, self.circuit_breaker, self.upstream_metrics, idempotent)
+        response = run_retry_loop(loop, lambda: self._rate_limit_wait(method, endpoint), send)
+        if isinstance(response, dict):
+            return response
+        return self._handle_response(logged_url, response.status_code, response.content)
+
+    def _run(self, flow):
+        """Drive a flow to completion, performing each request synchronously."""
         try:
-            logging.info(f"Making {method} request to {url}")
-            if data:
-                logging.info(f"Request data: {json.dumps(data)}")
-            
-            response = requests.request(method, url, headers=self.headers, json=data)
-            logging.info(f"Response status: {response.status_code}")
-            logging.info(f"Response body: {response.text}")
-            
-            if response.status_code == 401:
-                logging.error("Authentication failed")
-                return {"error": "Authentication failed", "status_code": 401}
-            
-            if response.status_code == 404:
-                logging.error("Resource not found")
-                return {"error": "Resource not found", "status_code": 404}
-            
-            response.raise_for_status()
-            
-            if not response.text:
-                return {}
-            
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Request failed: {str(e)}")
-            return {"error": str(e), "status_code": getattr(e.response, 'status_code', None)}
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to parse JSON response: {str(e)}")
-            return {"error": f"Invalid JSON response: {str(e)}", "status_code": response.status_code}
+            request = next(flow)
+            while True:
+                stage = self._stage(request[0], request[1])
+                start = time.perf_counter()
+                with self._request_span(stage, request[0], request[1]):
+                    result = self._make_request(*request)
+                STAGE_METRICS[stage].observe(time.perf_counter() - start)
+                request = flow.send(result)
+        except StopIteration as stop:
+            return stop.value
 
     def create_client(self, client_data):
         """
@@ -84,44 +361,133 @@ class IntakeQClient:
         Returns:
             dict: Response data
         """
-        # Search for existing client by email
-        email = client_data.get("Email")
-        if not email:
-            logging.error("Email is required")
-            return None
+        return self._run(self._create_client_flow(client_data))
+
+    def search_clients(self, email):
+        """
+        Search for clients by email.
         
-        search_result = self._make_request("GET", f"/clients/search?email={email.lower()}")
-        if not search_result or "error" in search_result:
-            logging.info("No existing client found, creating new client")
-            return self._make_request("POST", "/clients", client_data)
+        Args:
+            email (str): Email address
+            
+        Returns:
+            list: Matching clients (empty if none or on error)
+        """
+        return self._run(self._search_clients_flow(email))
+
+    def update_client(self, client_id, client_data):
+        """
+        Update an existing client.
         
-        # Update existing client
-        client_id = search_result[0].get("ClientId")
-        if client_id:
-            logging.info(f"Updating existing client {client_id}")
-            return self._make_request("PATCH", f"/clients/{client_id}", client_data)
+        Args:
+            client_id (int): IntakeQ client ID
+            client_data (dict): Fields to update
+            
+        Returns:
+            dict: Response data
+        """
+        return self._run(self._update_client_flow(client_id, client_data))
+
+    def submit_form(self, client_id, form_data, endpoint=DEFAULT_FORM_ENDPOINT):
+        """
+        Submit a client's mapped GLP-1 form answers.
         
-        logging.error("Failed to get client ID from search result")
-        return None
+        Args:
+            client_id (int): IntakeQ client ID
+            form_data (dict): {"formName": ..., "fields": [{"id": ..., "value": ...}]} from the mapper
+            endpoint (str): Intake submission endpoint
+            
+        Returns:
+            dict: Response data
+        """
+        return self._run(self._submit_form_flow(client_id, form_data, endpoint))
+
+    def add_tag(self, client_id, tag):
+        """
+        Add a tag to a client.
+        
+        Args:
+            client_id (int): IntakeQ client ID
+            tag (str): Tag to add
+            
+        Returns:
+            bool: True if the tag was added
+        """
+        return self._run(self._add_tag_flow(client_id, tag))
+
+    def _fetch_clients_page(self, search, include_profile, page):
+        """Fetch one page of clients for iter_pages; the cursor is the page number."""
+        result = self._run(self._clients_page_flow(search, page or 1, include_profile))
+        if result is None or isinstance(result, dict):
+            error = (result or {}).get("error", "Empty response")
+            raise PaginationError(f"Failed to list clients: {error}", (result or {}).get("status_code"))
+        next_page = (page or 1) + 1 if len(result) >= CLIENTS_PAGE_SIZE else None
+        return Page(result, next_page)
+
+    def iter_client_pages(self, search=None, include_profile=False, start_page=1, prefetch=True):
+        """
+        Lazily iterate pages of clients, fetching the next page in the background.
+        
+        Args:
+            search (str): Optional search term (name, email or client number)
+            include_profile (bool): Include full client profiles
+            start_page (int): Page to start from (e.g. to resume)
+            prefetch (bool): Fetch the next page while the caller processes the current one
+            
+        Yields:
+            Page: Lists of clients, with the next page number as next_cursor
+            
+        Raises:
+            PaginationError: If a page cannot be fetched
+        """
+        fetch = lambda page: self._fetch_clients_page(search, include_profile, page)  # noqa: E731
+        return iter_pages(fetch, start_page, prefetch)
+
+    def iter_clients(self, include_profile=False, prefetch=True):
+        """
+        Lazily iterate every client without holding the full list in memory.
+        
+        Args:
+            include_profile (bool): Include full client profiles
+            prefetch (bool): Fetch the next page while the caller processes the current one
+            
+        Yields:
+            dict: Each client
+            
+        Raises:
+            PaginationError: If a page cannot be fetched
+        """
+        return iter_items(self.iter_client_pages(include_profile=include_profile, prefetch=prefetch))
+
+    def iter_search(self, search, include_profile=False, prefetch=True):
+        """
+        Lazily iterate the clients matching a search term.
+        
+        Args:
+            search (str): Search term (name, email or client number)
+            include_profile (bool): Include full client profiles
+            prefetch (bool): Fetch the next page while the caller processes the current one
+            
+        Yields:
+            dict: Each matching client
+            
+        Raises:
+            PaginationError: If a page cannot be fetched
+        """
+        return iter_items(self.iter_client_pages(search, include_profile, prefetch=prefetch))
 
     def _add_tag_to_client(self, client_id: int, tag: str) -> bool:
         """Add a tag to a client"""
         try:
-            response = self._make_request("POST", f"clients/{client_id}/tags", json={"tag": tag})
-            
-            if response:
-                self.logger.info(f"Successfully added tag {tag} to client {client_id}")
-                return True
-            return False
+            return self.add_tag(client_id, tag)
         except Exception as e:
-            self.logger.error(f"Error adding tag to client: {str(e)}")
+            self.logger.error("Error adding tag to client: %s", e)
             return False
 
     def _search_clients_by_email(self, email):
         """Search for clients by email."""
         try:
-            response = self._make_request("GET", "clients", params={'search': email})
-            return response
+            return self._run(self._clients_page_flow(search=email))
         except Exception as e:
-            logging.error(f"Error searching clients: {str(e)}")
+            logging.error("Error searching clients: %s", e)
             return None 
\ No newline at end of file
@@ -0,0 +1,508 @@
+"""
+OAuth access tokens for the GoHighLevel API.
+
+GoHighLevel gives each location that installs the app an access token that
+expires after about a day, plus a refresh token. Every refresh issues a new
+refresh token and invalidates the old one. The token manager keeps tokens per
+location in memory and in a SQLite file shared by every worker process, so a
+restart or a freshly forked worker reuses the stored token instead of forcing
+the location to re-authorize.
+
+Tokens are refreshed before they expire:
+- A background thread renews tokens within ``refresh_margin`` seconds of
+  expiry.
+- A request only refreshes inline when its token is about to expire or was
+  rejected.
+
+Exactly one refresh happens per expiry. Threads of one process coalesce
+through SingleFlight. Processes take a lease on the token's row before
+calling the token endpoint, and a process that finds the lease taken waits
+for the new token instead of spending the refresh token a second time.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+import requests
+from src.api.http_session import get_session, get_timeout, resolve_http_config
+from src.utils import json_codec
+from src.utils.single_flight import SingleFlight
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+DEFAULT_TOKEN_PATH = "data/ghl_tokens.sqlite3"
+
+# Tokens with less validity left than this (seconds) are refreshed before use
+DEFAULT_MIN_VALIDITY = 60.0
+
+# How often a process waiting on another process's refresh re-reads the store
+LEASE_POLL_INTERVAL = 0.1
+
+# Outcomes of TokenStore.acquire_lease
+FRESH = "fresh"
+ACQUIRED = "acquired"
+BUSY = "busy"
+
+
+class OAuthError(Exception):
+    """Raised when no usable access token can be obtained."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OAuthToken:
+    """One location's access and refresh token."""
+
+    __slots__ = ("location_id", "access_token", "refresh_token", "expires_at")
+
+    def __init__(self, location_id, access_token, refresh_token, expires_at):
+        self.location_id = location_id
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+
+    def remaining(self, now=None):
+        """Seconds until the access token expires."""
+        return self.expires_at - (time.time() if now is None else now)
+
+
+class TokenStore:
+    """
+    Tokens persisted in a SQLite file shared by all worker processes.
+
+    Each row also holds the refresh lease: the process that owns it until
+    ``lease_until`` is the only one allowed to spend the refresh token.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the store, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self._db = ThreadLocalSQLite(path)
+        self._db.connection().execute(
+            "CREATE TABLE IF NOT EXISTS oauth_tokens ("
+            "location_id TEXT PRIMARY KEY, access_token TEXT NOT NULL, refresh_token TEXT, "
+            "expires_at REAL NOT NULL, lease_owner TEXT, lease_until REAL NOT NULL DEFAULT 0, "
+            "updated_at REAL NOT NULL)"
+        )
+        # The file holds credentials
+        try:
+            os.chmod(path, 0o600)
+        except OSError as e:
+            logging.warning("Could not restrict permissions of %s: %s", path, e)
+
+    def get(self, location_id):
+        """
+        Look up a location's token.
+
+        Args:
+            location_id (str): GoHighLevel location ID
+
+        Returns:
+            OAuthToken: The stored token, or None
+        """
+        row = self._db.connection().execute(
+            "SELECT access_token, refresh_token, expires_at FROM oauth_tokens WHERE location_id = ?",
+            (location_id,)
+        ).fetchone()
+        return OAuthToken(location_id, *row) if row else None
+
+    def save(self, token):
+        """
+        Store a token, releasing any refresh lease on its location.
+
+        Args:
+            token (OAuthToken): The token
+        """
+        self._db.connection().execute(
+            "INSERT OR REPLACE INTO oauth_tokens "
+            "(location_id, access_token, refresh_token, expires_at, lease_owner, lease_until, updated_at) "
+            "VALUES (?, ?, ?, ?, NULL, 0, ?)",
+            (token.location_id, token.access_token, token.refresh_token, token.expires_at, time.time())
+        )
+
+    def acquire_lease(self, location_id, owner, duration, stale_access_token):
+        """
+        Take the right to refresh a location's token.
+
+        Args:
+            location_id (str): GoHighLevel location ID
+            owner (str): Identifies the caller's process
+            duration (float): Seconds the lease is held before others may take it over
+            stale_access_token (str): The token the caller wants replaced
+
+        Returns:
+            tuple: (FRESH, token) if the stored token was already replaced,
+            (ACQUIRED, token) if the caller now holds the lease, or
+            (BUSY, token) if another process is refreshing. The token is
+            None if the location has no stored token.
+        """
+        conn = self._db.connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT access_token, refresh_token, expires_at, lease_owner, lease_until "
+                "FROM oauth_tokens WHERE location_id = ?",
+                (location_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return ACQUIRED, None
+            token = OAuthToken(location_id, row[0], row[1], row[2])
+            if token.access_token != stale_access_token:
+                outcome = FRESH
+            elif row[3] and row[3] != owner and row[4] > now:
+                outcome = BUSY
+            else:
+                conn.execute(
+                    "UPDATE oauth_tokens SET lease_owner = ?, lease_until = ? WHERE location_id = ?",
+                    (owner, now + duration, location_id)
+                )
+                outcome = ACQUIRED
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return outcome, token
+
+    def release_lease(self, location_id, owner):
+        """Give up a lease without replacing the token (the refresh failed)."""
+        self._db.connection().execute(
+            "UPDATE oauth_tokens SET lease_owner = NULL, lease_until = 0 WHERE location_id = ? AND lease_owner = ?",
+            (location_id, owner)
+        )
+
+    def expiring(self, before):
+        """
+        Locations whose refreshable token expires before a time.
+
+        Args:
+            before (float): Unix timestamp
+
+        Returns:
+            list: Location IDs
+        """
+        rows = self._db.connection().execute(
+            "SELECT location_id FROM oauth_tokens WHERE expires_at < ? AND refresh_token IS NOT NULL",
+            (before,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self):
+        """Number of stored tokens."""
+        return self._db.connection().execute("SELECT COUNT(*) FROM oauth_tokens").fetchone()[0]
+
+
+class TokenManager:
+    """Per-location GoHighLevel access tokens with proactive, single-flight refresh."""
+
+    def __init__(self, client_id, client_secret, store, base_url=None, http_config=None, refresh_margin=300.0,
+                 check_interval=60.0, lease_timeout=30.0, user_type="Location", min_validity=DEFAULT_MIN_VALIDITY):
+        """
+        Initialize the token manager.
+
+        Args:
+            client_id (str): OAuth client ID of the GoHighLevel app
+            client_secret (str): OAuth client secret
+            store (TokenStore): Where tokens are persisted
+            base_url (str): API base URL serving /oauth/token (defaults to GHL_BASE_URL or the public API)
+            http_config (dict): The "http" block from config.json
+            refresh_margin (float): Seconds before expiry at which tokens are refreshed in the background
+            check_interval (float): Seconds between background expiry checks (0 disables the background thread)
+            lease_timeout (float): Seconds a refresh lease is held before another process may take over
+            user_type (str): Token type requested on refresh ("Location" or "Company")
+            min_validity (float): Seconds of validity below which a request refreshes the token inline
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.store = store
+        self.base_url = base_url or os.getenv("GHL_BASE_URL") or "https://services.leadconnectorhq.com"
+        self.session = get_session(self.base_url, http_config)
+        self.timeout = get_timeout(resolve_http_config(self.base_url, http_config))
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.lease_timeout = lease_timeout
+        self.user_type = user_type
+        self.min_validity = min_validity
+        self.single_flight = SingleFlight()
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._owner = None
+        self._refresher_pid = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.lease_waits = 0
+
+    @property
+    def owner(self):
+        """Lease owner ID of this process (regenerated after fork)."""
+        pid = os.getpid()
+        if self._owner is None or not self._owner.startswith(f"{pid}:"):
+            self._owner = f"{pid}:{uuid.uuid4().hex}"
+        return self._owner
+
+    def get_token(self, location_id):
+        """
+        Get a valid access token for a location.
+
+        Args:
+            location_id (str): GoHighLevel location ID
+
+        Returns:
+            str: The access token
+
+        Raises:
+            OAuthError: If the location has no token or it cannot be refreshed
+        """
+        self._ensure_refresher()
+        token = self._tokens.get(location_id)
+        if token is not None and token.remaining() > self.min_validity:
+            self.hits += 1
+            return token.access_token
+        return self.single_flight.do(location_id, lambda: self._obtain(location_id, None)).access_token
+
+    def renew(self, location_id, stale_access_token):
+        """
+        Replace a token the API rejected (e.g. with 401) before its expiry.
+
+        Concurrent callers holding the same rejected token share one refresh.
+
+        Args:
+            location_id (str): GoHighLevel location ID
+            stale_access_token (str): The rejected token
+
+        Returns:
+            str: The new access token
+
+        Raises:
+            OAuthError: If the token cannot be refreshed
+        """
+        token = self.single_flight.do(
+            location_id, lambda: self._obtain(location_id, stale_access_token), fingerprint=stale_access_token
+        )
+        return token.access_token
+
+    def _obtain(self, location_id, stale_access_token):
+        """Use the stored token if another process already refreshed it, else refresh."""
+        token = self.store.get(location_id)
+        if token is None:
+            raise OAuthError(f"No OAuth token for location {location_id}; the app must be authorized first", 401)
+        if token.access_token != stale_access_token and token.remaining() > self.min_validity:
+            self._remember(token)
+            return token
+        return self._refresh(token)
+
+    def _refresh(self, token):
+        """Refresh a token under the cross-process lease."""
+        location_id = token.location_id
+        owner = self.owner
+        deadline = time.monotonic() + self.lease_timeout * 2
+        while True:
+            outcome, current = self.store.acquire_lease(location_id, owner, self.lease_timeout, token.access_token)
+            if current is None:
+                raise OAuthError(f"No OAuth token for location {location_id}; the app must be authorized first", 401)
+            if outcome == FRESH:
+                self._remember(current)
+                return current
+            if outcome == ACQUIRED:
+                break
+            self.lease_waits += 1
+            if time.monotonic() >= deadline:
+                raise OAuthError(f"Timed out waiting for another process to refresh the token of {location_id}")
+            time.sleep(LEASE_POLL_INTERVAL)
+
+        if not current.refresh_token:
+            self.store.release_lease(location_id, owner)
+            raise OAuthError(f"The token of {location_id} cannot be refreshed; the app must be re-authorized", 401)
+        try:
+            refreshed = self._request_token(
+                {"grant_type": "refresh_token", "refresh_token": current.refresh_token, "user_type": self.user_type},
+                location_id
+            )
+        except OAuthError as e:
+            self.store.release_lease(location_id, owner)
+            self.refresh_failures += 1
+            if current.remaining() > 0 and e.status_code not in (400, 401):
+                # A transient failure; the old token still works and the next check retries
+                logging.warning("Token refresh for %s failed, keeping the current token: %s", location_id, e)
+                self._remember(current)
+                return current
+            raise
+
+        self.store.save(refreshed)
+        self._remember(refreshed)
+        self.refreshes += 1
+        logging.info("Refreshed GoHighLevel token for %s (expires in %.0fs)", location_id, refreshed.remaining())
+        return refreshed
+
+    def exchange_code(self, code, redirect_uri=None):
+        """
+        Exchange an authorization code (from the app's OAuth callback) for tokens and store them.
+
+        Args:
+            code (str): The authorization code
+            redirect_uri (str): The redirect URI used in the authorization request
+
+        Returns:
+            OAuthToken: The stored token
+
+        Raises:
+            OAuthError: If the code is rejected or the response names no location
+        """
+        form = {"grant_type": "authorization_code", "code": code, "user_type": self.user_type}
+        if redirect_uri:
+            form["redirect_uri"] = redirect_uri
+        token = self._request_token(form, None)
+        if not token.location_id:
+            raise OAuthError("Token response did not include a locationId")
+        self.store.save(token)
+        self._remember(token)
+        logging.info("Stored GoHighLevel token for location %s", token.location_id)
+        return token
+
+    def _request_token(self, form, location_id):
+        """
+        POST to the token endpoint.
+
+        Never retried: the server may have rotated the refresh token even if
+        the response was lost, and the background check retries anyway.
+        """
+        url = f"{self.base_url}/oauth/token"
+        try:
+            response = self.session.post(
+                url,
+                data={**form, "client_id": self.client_id, "client_secret": self.client_secret},
+                headers={"Accept": "application/json"},
+                timeout=self.timeout
+            )
+        except requests.exceptions.RequestException as e:
+            raise OAuthError(f"Token request failed: {str(e)}") from e
+        if response.status_code >= 400:
+            raise OAuthError(f"Token request failed with status {response.status_code}", response.status_code)
+        try:
+            body = json_codec.loads(response.content)
+            return OAuthToken(
+                body.get("locationId") or location_id,
+                body["access_token"],
+                body.get("refresh_token"),
+                time.time() + float(body.get("expires_in", 0))
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            raise OAuthError(f"Invalid token response: {str(e)}", response.status_code) from e
+
+    def _remember(self, token):
+        with self._lock:
+            self._tokens[token.location_id] = token
+
+    def refresh_due(self):
+        """
+        Refresh every stored token that expires within the refresh margin.
+
+        Returns:
+            int: Tokens checked
+        """
+        due = self.store.expiring(time.time() + self.refresh_margin)
+        for location_id in due:
+            try:
+                # Its own key: get_token callers must not share a result that may be None
+                self.single_flight.do(f"refresh:{location_id}", lambda: self._refresh_stored(location_id))
+            except OAuthError as e:
+                logging.error("Proactive token refresh for %s failed: %s", location_id, e)
+        return len(due)
+
+    def _refresh_stored(self, location_id):
+        """Refresh a stored token unless it is gone or another process refreshed it (None if gone)."""
+        token = self.store.get(location_id)
+        if token is None:
+            return None
+        if token.remaining() > self.refresh_margin:
+            # Already refreshed by another process
+            self._remember(token)
+            return token
+        return self._refresh(token)
+
+    def _ensure_refresher(self):
+        """Start the background refresh thread in this process (threads do not survive fork)."""
+        if not self.check_interval or self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            self._stop.clear()
+            threading.Thread(target=self._refresh_loop, name="ghl-token-refresher", daemon=True).start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh_due()
+            except Exception as e:
+                logging.error("Token refresher error: %s", e)
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        self._refresher_pid = None
+
+    def stats(self):
+        """
+        Token counters.
+
+        Returns:
+            dict: Stored tokens, cache hits, refreshes, failed refreshes and waits on another process's refresh
+        """
+        return {
+            "locations": self.store.count(),
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "lease_waits": self.lease_waits
+        }
+
+
+def create_token_manager(oauth_config, base_url=None, http_config=None):
+    """
+    Build the token manager described by the "ghl_oauth" block of config.json.
+
+    The app credentials come from GHL_CLIENT_ID and GHL_CLIENT_SECRET.
+
+    Args:
+        oauth_config (dict): Settings (enabled, path, refresh_margin, min_validity, check_interval,
+            lease_timeout, user_type)
+        base_url (str): GoHighLevel API base URL
+        http_config (dict): The "http" block from config.json
+
+    Returns:
+        TokenManager: The manager, or None if disabled or the credentials are not set
+    """
+    if not oauth_config or not oauth_config.get("enabled", True):
+        return None
+    client_id = os.getenv("GHL_CLIENT_ID")
+    client_secret = os.getenv("GHL_CLIENT_SECRET")
+    if not (client_id and client_secret):
+        logging.info("GHL_CLIENT_ID/GHL_CLIENT_SECRET not set, GoHighLevel OAuth disabled")
+        return None
+    path = oauth_config.get("path", DEFAULT_TOKEN_PATH)
+    logging.info("Using GoHighLevel OAuth token store at %s", path)
+    return TokenManager(
+        client_id,
+        client_secret,
+        TokenStore(path),
+        base_url=base_url,
+        http_config=http_config,
+        refresh_margin=oauth_config.get("refresh_margin", 300),
+        check_interval=oauth_config.get("check_interval", 60),
+        lease_timeout=oauth_config.get("lease_timeout", 30),
+        user_type=oauth_config.get("user_type", "Location"),
+        min_validity=oauth_config.get("min_validity", DEFAULT_MIN_VALIDITY)
+    )
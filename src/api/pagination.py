@@ -0,0 +1,82 @@
+"""
+Lazy, prefetching pagination shared by the API clients.
+
+A paginated endpoint is described by a fetch function that takes a cursor and
+returns one page plus the cursor of the next. iter_pages walks it lazily and,
+while the caller works through one page, fetches the next on a background
+thread. At most two pages are held at a time, so iterating tens of thousands
+of records runs in constant memory.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PaginationError(Exception):
+    """Raised when a page cannot be fetched."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Page:
+    """One page of results and the cursor of the page after it (None on the last page)."""
+
+    __slots__ = ("items", "next_cursor")
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+def iter_pages(fetch, cursor=None, prefetch=True):
+    """
+    Iterate a paginated endpoint page by page.
+
+    Args:
+        fetch (callable): Called with a cursor (None for the first page); returns a Page
+            or raises PaginationError
+        cursor: Cursor to start from (e.g. a checkpointed next_cursor)
+        prefetch (bool): Fetch the next page in the background while the caller
+            processes the current one
+
+    Yields:
+        Page: Each page in order
+
+    Raises:
+        PaginationError: If a page cannot be fetched
+    """
+    if not prefetch:
+        while True:
+            page = fetch(cursor)
+            yield page
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch")
+    try:
+        future = executor.submit(fetch, cursor)
+        while True:
+            page = future.result()
+            future = executor.submit(fetch, page.next_cursor) if page.next_cursor is not None else None
+            yield page
+            if future is None:
+                return
+    finally:
+        # Runs when the caller stops early too; an in-flight prefetch is left to finish and dropped
+        executor.shutdown(wait=False)
+
+
+def iter_items(pages):
+    """
+    Flatten pages into their items.
+
+    Args:
+        pages: Iterator of Page
+
+    Yields:
+        Each item of each page
+    """
+    for page in pages:
+        yield from page.items
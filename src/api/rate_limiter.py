@@ -0,0 +1,201 @@
+"""
+Client-side token-bucket rate limiting for upstream API calls.
+
+Each upstream host has an overall bucket ("default") and optional buckets
+per endpoint class ("search", "read", "write"). Requests reserve a token from
+every bucket that applies and sleep until their slot comes up, which smooths
+bursts into the vendor's quota instead of turning them into 429s.
+
+The in-process backend shares buckets between threads; the SQLite backend
+shares them between every worker process using the same file, so N gunicorn
+workers draw from one budget.
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+DEFAULT_BUCKET = "default"
+
+
+def endpoint_class(method, endpoint):
+    """
+    Classify a request for per-endpoint limits.
+
+    Args:
+        method (str): HTTP method
+        endpoint (str): API endpoint
+
+    Returns:
+        str: "search", "read" or "write"
+    """
+    if "/search" in endpoint:
+        return "search"
+    if method.upper() in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+
+class RateLimiter:
+    """Base class resolving buckets from config; backends implement _reserve/_refund."""
+
+    def __init__(self, upstreams, max_wait=10.0):
+        """
+        Initialize the limiter.
+
+        Args:
+            upstreams (dict): Per-host limits, e.g.
+                ``{"intakeq.com": {"default": {"rate": 10, "burst": 20}, "search": {...}}}``
+            max_wait (float): Longest a request will wait for a slot before failing
+        """
+        self.upstreams = upstreams or {}
+        self.max_wait = max_wait
+        self.throttled = 0
+        self.rejected = 0
+
+    def reserve(self, base_url, method, endpoint):
+        """
+        Reserve a slot for a request.
+
+        Args:
+            base_url (str): Base URL of the upstream API
+            method (str): HTTP method
+            endpoint (str): API endpoint
+
+        Returns:
+            float: Seconds the caller must wait before sending, or None if the
+            wait would exceed max_wait (nothing is reserved in that case)
+        """
+        host = urlsplit(base_url).hostname or ""
+        limits = self.upstreams.get(host)
+        if not limits:
+            return 0.0
+
+        now = time.time()
+        reserved = []
+        wait = 0.0
+        for bucket in (DEFAULT_BUCKET, endpoint_class(method, endpoint)):
+            spec = limits.get(bucket)
+            if not spec:
+                continue
+            name = f"{host}:{bucket}"
+            bucket_wait = self._reserve(name, spec["rate"], spec.get("burst", spec["rate"]), now)
+            reserved.append((name, spec))
+            wait = max(wait, bucket_wait)
+
+        if wait > self.max_wait:
+            for name, spec in reserved:
+                self._refund(name, spec.get("burst", spec["rate"]))
+            self.rejected += 1
+            logging.warning("Rate limit wait of %.1fs for %s exceeds max wait, rejecting request", wait, host)
+            return None
+
+        if wait > 0:
+            self.throttled += 1
+        return wait
+
+    def stats(self):
+        """
+        Throttling counters.
+
+        Returns:
+            dict: Requests delayed and requests rejected by the limiter
+        """
+        return {"throttled": self.throttled, "rejected": self.rejected}
+
+    def _reserve(self, name, rate, burst, now):
+        raise NotImplementedError
+
+    def _refund(self, name, burst):
+        raise NotImplementedError
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """Buckets shared by the threads of one process."""
+
+    def __init__(self, upstreams, max_wait=10.0):
+        super().__init__(upstreams, max_wait)
+        # name -> [tokens, updated_at]; tokens go negative as future slots are reserved
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, name, rate, burst, now):
+        with self._lock:
+            state = self._buckets.get(name)
+            if state is None:
+                state = self._buckets[name] = [float(burst), now]
+            tokens = min(burst, state[0] + max(0.0, now - state[1]) * rate) - 1.0
+            state[0], state[1] = tokens, max(now, state[1])
+        return max(0.0, -tokens / rate)
+
+    def _refund(self, name, burst):
+        with self._lock:
+            state = self._buckets.get(name)
+            if state is not None:
+                state[0] = min(burst, state[0] + 1.0)
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """Buckets in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path, upstreams, max_wait=10.0):
+        """
+        Initialize the limiter, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            upstreams (dict): Per-host limits
+            max_wait (float): Longest a request will wait for a slot before failing
+        """
+        super().__init__(upstreams, max_wait)
+        self.path = path
+        self._db = ThreadLocalSQLite(path)
+        self._db.connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _reserve(self, name, rate, burst, now):
+        conn = self._db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (name,)).fetchone()
+            tokens = float(burst) if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            tokens -= 1.0
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, tokens, max(now, row[1]) if row else now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return max(0.0, -tokens / rate)
+
+    def _refund(self, name, burst):
+        self._db.connection().execute(
+            "UPDATE rate_buckets SET tokens = MIN(?, tokens + 1.0) WHERE name = ?", (burst, name)
+        )
+
+
+def create_rate_limiter(rate_limit_config):
+    """
+    Build the limiter described by the "rate_limits" block of config.json.
+
+    Args:
+        rate_limit_config (dict): Settings (enabled, backend, path, max_wait, upstreams)
+
+    Returns:
+        RateLimiter: The limiter, or None if disabled
+    """
+    if not rate_limit_config or not rate_limit_config.get("enabled", True):
+        return None
+
+    upstreams = rate_limit_config.get("upstreams", {})
+    max_wait = rate_limit_config.get("max_wait", 10)
+    if rate_limit_config.get("backend", "memory") == "sqlite":
+        path = rate_limit_config.get("path", "data/rate_limits.sqlite3")
+        logging.info("Using SQLite rate limiter at %s", path)
+        return SQLiteRateLimiter(path, upstreams, max_wait=max_wait)
+    return InMemoryRateLimiter(upstreams, max_wait=max_wait)
@@ -0,0 +1,428 @@
+"""
+Retry policy for upstream API calls.
+
+Implements the "retry" block of config.json: exponential backoff with full
+jitter, honoring Retry-After on 429/503, retrying only requests that are safe
+to repeat, and a per-host retry budget so retries cannot multiply load on an
+upstream that is already failing.
+
+retry_loop is the one request loop every upstream client shares: retries,
+circuit breaker, rate limiting and an optional credential-renewal hook. It is
+a generator that yields the I/O it needs, in the style of the IntakeQ flows,
+so run_retry_loop drives it with blocking calls and arun_retry_loop with
+coroutines.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from src.utils.metrics import UPSTREAM_RETRIES
+from src.utils.tracing import current_span
+
+DEFAULT_RETRY_CONFIG = {
+    "max_attempts": 3,
+    "backoff_factor": 2,
+    "base_delay": 0.5,
+    "max_delay": 30,
+    "jitter": True,
+    "retry_statuses": [429, 502, 503, 504],
+    "budget_ratio": 0.2,
+    "budget_min_per_second": 1.0
+}
+
+# Methods that can be repeated without changing the outcome
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"])
+
+# Statuses that mean the request was rejected before being processed, so any
+# method is safe to repeat
+REJECTED_STATUSES = frozenset([429])
+
+# Failure kinds reported by the transports
+CONNECT_ERROR = "connect"
+OTHER_ERROR = "other"
+
+# Steps retry_loop asks its driver to perform
+RESERVE = "reserve"
+SEND = "send"
+SLEEP = "sleep"
+
+
+def classify_requests_error(error):
+    """
+    Tell connect failures (nothing was sent) from failures mid-request.
+
+    Args:
+        error (requests.exceptions.RequestException): The failure
+
+    Returns:
+        str: CONNECT_ERROR or OTHER_ERROR
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return CONNECT_ERROR
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        if isinstance(reason, NewConnectionError):
+            return CONNECT_ERROR
+    return OTHER_ERROR
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value (str): Delay in seconds or an HTTP date
+
+    Returns:
+        float: Seconds to wait, or None if absent/unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic for one upstream host.
+
+    Every request deposits ``ratio`` tokens and every retry withdraws one, so
+    retries can add at most ``ratio`` extra load. A small floor of tokens per
+    second keeps low-traffic hosts able to retry at all.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=10.0):
+        """
+        Initialize the budget.
+
+        Args:
+            ratio (float): Retry tokens earned per request
+            min_per_second (float): Tokens granted per second regardless of traffic
+            max_tokens (float): Cap on saved-up tokens
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.exhausted = 0
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self):
+        """Deposit tokens for a first attempt."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self):
+        """
+        Spend a token for a retry.
+
+        Returns:
+            bool: True if the retry is within budget
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            self.exhausted += 1
+            return False
+
+
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(base_url, retry_config):
+    """
+    Get the process-wide retry budget for an upstream host.
+
+    Args:
+        base_url (str): Base URL of the upstream API
+        retry_config (dict): Resolved retry settings
+
+    Returns:
+        RetryBudget: The host's budget
+    """
+    host = urlsplit(base_url).netloc
+    with _budgets_lock:
+        budget = _budgets.get(host)
+        if budget is None:
+            budget = RetryBudget(retry_config["budget_ratio"], retry_config["budget_min_per_second"])
+            _budgets[host] = budget
+        return budget
+
+
+class RetryPolicy:
+    """Decides whether and when a failed request is retried."""
+
+    def __init__(self, base_url, retry_config=None):
+        """
+        Initialize the policy.
+
+        Args:
+            base_url (str): Base URL of the upstream API (selects the retry budget)
+            retry_config (dict): The "retry" block from config.json
+        """
+        settings = dict(DEFAULT_RETRY_CONFIG)
+        settings.update(retry_config or {})
+        self.max_attempts = max(1, int(settings["max_attempts"]))
+        self.backoff_factor = settings["backoff_factor"]
+        self.base_delay = settings["base_delay"]
+        self.max_delay = settings["max_delay"]
+        self.jitter = settings["jitter"]
+        self.retry_statuses = frozenset(settings["retry_statuses"])
+        self.budget = get_retry_budget(base_url, settings)
+        self.retries = 0
+        self._retries_metric = UPSTREAM_RETRIES.labels(urlsplit(base_url).netloc)
+
+    def backoff(self, attempt):
+        """
+        Delay before the next attempt after ``attempt`` failed.
+
+        Args:
+            attempt (int): Number of the attempt that just failed (1-based)
+
+        Returns:
+            float: Seconds to wait
+        """
+        delay = min(self.max_delay, self.base_delay * (self.backoff_factor ** (attempt - 1)))
+        if self.jitter:
+            # Full jitter spreads retries from many workers apart
+            delay = random.uniform(0, delay)
+        return delay
+
+    def next_delay(self, method, attempt, idempotent=None, status_code=None, error_kind=None, retry_after=None):
+        """
+        Decide whether a failed attempt is retried.
+
+        Args:
+            method (str): HTTP method
+            attempt (int): Number of the attempt that just completed (1-based)
+            idempotent (bool): Override for whether the request is safe to repeat
+            status_code (int): Response status, if a response was received
+            error_kind (str): CONNECT_ERROR or OTHER_ERROR if no response was received
+            retry_after (str): The response's Retry-After header
+
+        Returns:
+            float: Seconds to wait before retrying, or None to give up
+        """
+        if attempt == 1:
+            self.budget.record_request()
+
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        if status_code is not None:
+            if status_code not in self.retry_statuses:
+                return None
+            if not idempotent and status_code not in REJECTED_STATUSES:
+                return None
+        elif error_kind is not None:
+            # A connect failure means nothing was sent; anything later may have been processed
+            if not idempotent and error_kind != CONNECT_ERROR:
+                return None
+        else:
+            return None
+
+        if attempt >= self.max_attempts:
+            return None
+
+        delay = self.backoff(attempt)
+        if status_code in (429, 503):
+            server_delay = parse_retry_after(retry_after)
+            if server_delay is not None:
+                if server_delay > self.max_delay:
+                    logging.warning("Retry-After of %.0fs exceeds max delay, giving up", server_delay)
+                    return None
+                delay = max(delay, server_delay)
+
+        if not self.budget.try_withdraw():
+            logging.warning("Retry budget exhausted, not retrying")
+            return None
+
+        self.retries += 1
+        self._retries_metric.inc()
+        return delay
+
+
+def record_outcome(breaker, upstream_metrics, status_code):
+    """
+    Feed a request's outcome to the circuit breaker and the status-code metrics.
+
+    Args:
+        breaker (CircuitBreaker): The upstream's circuit breaker
+        upstream_metrics (UpstreamMetrics): The upstream's request metrics
+        status_code (int): Response status, or None if no response was received
+    """
+    upstream_metrics.record_status(status_code)
+    if status_code is None or status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def retry_loop(method, logged_url, policy, breaker, upstream_metrics, idempotent=None,
+               classify_error=classify_requests_error, on_unauthorized=None):
+    """
+    Send one request through the circuit breaker and rate limiter, retrying transient failures.
+
+    The loop does no I/O itself. It yields ``(step, value)`` pairs and its
+    driver (run_retry_loop or arun_retry_loop) performs each step and sends
+    back the result:
+
+    - ``(RESERVE, None)``: reserve a rate-limit slot; send back the seconds
+      to wait first, or None if the request must be rejected
+    - ``(SLEEP, seconds)``: wait; send back None
+    - ``(SEND, None)``: send the request once; send back ``(response, None)``
+      or ``(None, error)`` for a transport error
+
+    Args:
+        method (str): HTTP method
+        logged_url (str): URL for log messages (without a query string that may hold PHI)
+        policy (RetryPolicy): Decides whether and when to retry
+        breaker (CircuitBreaker): The upstream's circuit breaker
+        upstream_metrics (UpstreamMetrics): The upstream's request metrics
+        idempotent (bool): Override for whether the request is safe to retry
+        classify_error (callable): Maps a transport error to CONNECT_ERROR or OTHER_ERROR
+        on_unauthorized (callable): Called on the first 401; returns True once the
+            credentials were renewed, and the request is resent without counting as a retry
+
+    Returns:
+        The final response (the transport's response object), or a dict with
+        "error" and "status_code" if no response was received or the rate
+        limiter rejected the request
+
+    Raises:
+        CircuitOpenError: If the upstream's circuit is open
+    """
+    span = current_span()
+    attempt = 0
+    renewed = False
+    while True:
+        attempt += 1
+        span.set_attribute("http.attempts", attempt)
+        breaker.before_request()
+        try:
+            wait = yield RESERVE, None
+            if wait is None:
+                breaker.release()
+                return {"error": "Client-side rate limit exceeded", "status_code": 429}
+            if wait:
+                yield SLEEP, wait
+            response, error = yield SEND, None
+        except BaseException:
+            # No outcome to report; don't leave a half-open trial slot taken
+            breaker.release()
+            raise
+
+        if error is not None:
+            record_outcome(breaker, upstream_metrics, None)
+            delay = policy.next_delay(method, attempt, idempotent, error_kind=classify_error(error))
+            if delay is None:
+                span.set_error(type(error).__name__)
+                logging.error("Request failed: %s", error)
+                status_code = getattr(getattr(error, "response", None), "status_code", None)
+                return {"error": str(error), "status_code": status_code}
+            logging.warning("Request failed (%s), retrying in %.2fs (attempt %s)", error, delay, attempt)
+            yield SLEEP, delay
+            continue
+
+        record_outcome(breaker, upstream_metrics, response.status_code)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code == 401 and on_unauthorized is not None and not renewed:
+            # Revoked or rotated before its expiry: renew once and resend
+            renewed = True
+            if on_unauthorized():
+                attempt -= 1
+                continue
+        delay = policy.next_delay(
+            method, attempt, idempotent,
+            status_code=response.status_code,
+            retry_after=response.headers.get("Retry-After")
+        )
+        if delay is None:
+            return response
+        logging.warning("Got %s from %s, retrying in %.2fs (attempt %s)",
+                        response.status_code, logged_url, delay, attempt)
+        yield SLEEP, delay
+
+
+def run_retry_loop(loop, reserve, send):
+    """
+    Drive a retry_loop with blocking calls.
+
+    Args:
+        loop (generator): The retry_loop
+        reserve (callable): Returns the rate-limit wait (see RESERVE)
+        send (callable): Sends the request once; returns (response, error)
+
+    Returns:
+        The retry_loop's result
+    """
+    try:
+        step, value = next(loop)
+        while True:
+            try:
+                if step == SEND:
+                    result = send()
+                elif step == RESERVE:
+                    result = reserve()
+                else:
+                    result = time.sleep(value)
+            except BaseException as e:
+                step, value = loop.throw(e)
+                continue
+            step, value = loop.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_retry_loop(loop, reserve, send):
+    """
+    Drive a retry_loop on an event loop.
+
+    Args:
+        loop (generator): The retry_loop
+        reserve (callable): Coroutine function returning the rate-limit wait (see RESERVE)
+        send (callable): Coroutine function sending the request once; returns (response, error)
+
+    Returns:
+        The retry_loop's result
+    """
+    try:
+        step, value = next(loop)
+        while True:
+            try:
+                if step == SEND:
+                    result = await send()
+                elif step == RESERVE:
+                    result = await reserve()
+                else:
+                    result = await asyncio.sleep(value)
+            except BaseException as e:
+                step, value = loop.throw(e)
+                continue
+            step, value = loop.send(result)
+    except StopIteration as stop:
+        return stop.value
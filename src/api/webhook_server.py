@@ -3,45 +3,291 @@ Flask server to handle webhooks from GoHighLevel.
 """
 
 import os
-import json
+import time
+import atexit
 import logging
 from flask import Flask, request, jsonify
-from src.handlers.webhook_handler import process_webhook
+from flask.json.provider import JSONProvider
+from src.api.circuit_breaker import OPEN, circuit_breaker_states
+from src.api.oauth import OAuthError
+from src.handlers.webhook_handler import (
+    invalidate_cached_contact, process_form_submission, process_webhook, is_paid_webhook
+)
+from src.jobs.job_queue import FAILED, PENDING, PROCESSING, SQLiteJobQueue
+from src.jobs.worker_pool import WorkerPool
+from src.utils.app_context import init_app_context
+from src.utils import json_codec
+from src.utils.idempotency_store import derive_idempotency_key
+from src.utils.logging_setup import buffer_startup_logging, configure_logging, log_body, restart_logging
+from src.utils.metrics import (
+    CONTENT_TYPE, GAUGE, REGISTRY, WEBHOOK_DURATION_SERIES, WEBHOOKS_IN_FLIGHT_SERIES, count_webhook,
+    render_metrics, start_snapshot_writer, stop_snapshot_writer
+)
+from src.utils.profiling import create_profiler
+from src.utils.tracing import (
+    SERVER, configure_tracing, get_tracer, new_trace_id, parse_incoming, shutdown_tracing, start_span
+)
 
-def create_app():
-    """Create and configure the Flask application."""
+class CodecJSONProvider(JSONProvider):
+    """Flask JSON provider backed by json_codec (orjson when installed)."""
+    
+    def dumps(self, obj, **kwargs):
+        return json_codec.dumps_text(obj)
+    
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
+def create_app(start_workers=True):
+    """
+    Create and configure the Flask application.
+    
+    Args:
+        start_workers (bool): Start the queue worker threads now. Pre-forking
+            servers pass False and call start_background_workers in each
+            worker process instead (see gunicorn.conf.py).
+    """
     app = Flask(__name__)
+    app.json = CodecJSONProvider(app)
+    
+    # Request threads only enqueue log records; a listener thread writes them.
+    # Startup messages are buffered until the logging config has been read.
+    buffer_startup_logging()
+    
+    # Parse config and build API clients once for the whole process
+    context = init_app_context()
+    app.config["APP_CONTEXT"] = context
+    configure_logging(context.config.get("logging"))
+    configure_tracing(context.config.get("tracing"))
+    profiler = create_profiler(context.config.get("profiling"))
     
-    # Configure logging
-    logging.basicConfig(
-        level=getattr(logging, os.getenv("LOG_LEVEL", "INFO")),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler("logs/app.log"),
-            logging.StreamHandler()
-        ]
-    )
+    # In async ingest mode webhooks are persisted and acknowledged immediately,
+    # and a pool of background workers drains the queue through process_webhook.
+    # In sync mode the same queue doubles as the retry store for webhooks that
+    # arrive while the IntakeQ circuit is open.
+    ingest_config = context.config.get("ingest", {})
+    async_ingest = (os.getenv("INGEST_MODE") or ingest_config.get("mode")) == "async"
+    spill_on_open = context.config.get("circuit_breaker", {}).get("on_open", "spill") == "spill"
+    job_queue = None
+    worker_pools = []
+    app.config["WORKER_POOLS"] = worker_pools
+    if async_ingest or spill_on_open:
+        job_queue = SQLiteJobQueue(
+            ingest_config.get("queue_path", "data/webhook_jobs.sqlite3"),
+            max_attempts=ingest_config.get("max_attempts", 5),
+            retry_delay=ingest_config.get("retry_delay", 5)
+        )
+        worker_pool = WorkerPool(
+            job_queue,
+            lambda payload, idempotency_key: process_webhook(payload, context, idempotency_key),
+            workers=ingest_config.get("workers", 4)
+        )
+        worker_pools.append(worker_pool)
+        app.config["JOB_QUEUE"] = job_queue
+    
+    # GLP-1 form answers are submitted off the request path, coalesced per client
+    if context.form_queue is not None:
+        form_pool = WorkerPool(
+            context.form_queue,
+            lambda payload, idempotency_key: process_form_submission(payload, context),
+            workers=context.config.get("glp1_forms", {}).get("workers", 2),
+            name="form"
+        )
+        worker_pools.append(form_pool)
+    
+    # Queue depths are read from the queue stores when /metrics is scraped
+    queues = {"webhooks": job_queue, "glp1_forms": context.form_queue}
+    REGISTRY.register_collector("queues", lambda: collect_queue_depths(queues))
+    metrics_config = context.config.get("metrics", {})
+    app.config["METRICS_CONFIG"] = metrics_config
+    
+    if start_workers:
+        start_background_workers(app)
     
     @app.route("/health", methods=["GET"])
     def health_check():
         """Health check endpoint."""
-        return jsonify({"status": "healthy"})
+        breakers = circuit_breaker_states()
+        open_circuits = [host for host, state in breakers.items() if state["state"] == OPEN]
+        health = {"status": "degraded" if open_circuits else "healthy", "circuit_breakers": breakers}
+        if context.client_id_cache is not None:
+            health["client_id_cache"] = context.client_id_cache.stats()
+        if context.client_index is not None:
+            health["client_index"] = context.client_index.stats()
+        if context.contact_cache is not None:
+            health["contact_cache"] = context.contact_cache.stats()
+        if context.change_detector is not None:
+            health["change_detection"] = context.change_detector.stats()
+        if context.idempotency_store is not None:
+            health["idempotency"] = context.idempotency_store.stats()
+        health["single_flight"] = context.single_flight.stats()
+        if context.rate_limiter is not None:
+            health["rate_limiter"] = context.rate_limiter.stats()
+        if context.ghl_token_manager is not None:
+            health["ghl_oauth"] = context.ghl_token_manager.stats()
+        tracer = get_tracer()
+        if tracer is not None:
+            health["tracing"] = tracer.stats()
+        if profiler is not None:
+            health["profiling"] = profiler.stats()
+        return jsonify(health)
+    
+    @app.route("/oauth/callback", methods=["GET"])
+    def oauth_callback():
+        """Store the tokens of a location that just installed the GoHighLevel app."""
+        manager = context.ghl_token_manager
+        if manager is None:
+            return jsonify({"error": "GoHighLevel OAuth is not configured"}), 404
+        code = request.args.get("code")
+        if not code:
+            return jsonify({"error": "Missing authorization code"}), 400
+        try:
+            token = manager.exchange_code(code, os.getenv("GHL_REDIRECT_URI"))
+        except OAuthError as e:
+            logging.error("OAuth code exchange failed: %s", e)
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"status": "authorized", "location_id": token.location_id})
     
     @app.route("/webhook/gohighlevel", methods=["POST"])
     def gohighlevel_webhook():
         """Handle webhooks from GoHighLevel."""
+        start = time.perf_counter()
+        # The correlation id comes from the caller's traceparent/X-Correlation-ID or is generated
+        headers = request.headers
+        trace_id, parent_id = parse_incoming(headers.get("traceparent"), headers.get("X-Correlation-ID"))
+        with WEBHOOKS_IN_FLIGHT_SERIES, start_span(
+            "POST /webhook/gohighlevel", SERVER, {"http.method": "POST", "http.route": "/webhook/gohighlevel"},
+            trace_id, parent_id
+        ) as span:
+            if profiler is not None and profiler.should_profile():
+                response = app.make_response(profiler.run(handle_webhook, span.trace_id or new_trace_id()))
+            else:
+                response = app.make_response(handle_webhook())
+            span.set_attribute("http.status_code", response.status_code)
+        WEBHOOK_DURATION_SERIES.observe(time.perf_counter() - start)
+        count_webhook(response.status_code)
+        if span.trace_id is not None:
+            response.headers["X-Correlation-ID"] = span.trace_id
+        return response
+    
+    def handle_webhook():
+        """Answer a GoHighLevel webhook (timed and counted by gohighlevel_webhook)."""
         if not request.is_json:
             return jsonify({"error": "Request must be JSON"}), 400
         
-        data = request.json
-        logging.info(f"Received webhook: {json.dumps(data)}")
+        # Log the raw body instead of re-encoding the parsed payload
+        body = request.get_data(cache=True)
+        data = request.get_json()
+        log_body(logging.getLogger(), "Received webhook", body)
+        
+        if async_ingest:
+            if not isinstance(data, dict) or not data:
+                return jsonify({"error": "Invalid webhook payload"}), 400
+            try:
+                invalidate_cached_contact(data, context)
+                if not is_paid_webhook(data):
+                    return jsonify({"status": "ignored", "reason": "Not a paid tag"})
+                # Drop replays of deliveries already processed instead of queueing them again
+                idempotency_key = request.headers.get("X-Idempotency-Key")
+                store = context.idempotency_store
+                if store is not None:
+                    previous = store.get(derive_idempotency_key(data, idempotency_key))
+                    if previous is not None:
+                        return jsonify({**previous, "duplicate": True})
+                # The worker records the result under the same key
+                job_id = job_queue.enqueue(data, idempotency_key=idempotency_key)
+            except Exception as e:
+                # Not persisted: let GoHighLevel redeliver
+                logging.error("Error queueing webhook: %s", e)
+                return jsonify({"error": str(e)}), 503
+            return jsonify({"status": "queued", "job_id": job_id}), 202
         
         # Process the webhook
+        idempotency_key = request.headers.get("X-Idempotency-Key")
         try:
-            result = process_webhook(data)
+            result = process_webhook(data, context, idempotency_key)
+            if result.get("circuit_open"):
+                return circuit_open_response(data, result, idempotency_key)
             return jsonify(result)
         except Exception as e:
-            logging.error(f"Error processing webhook: {str(e)}")
+            logging.error("Error processing webhook: %s", e)
             return jsonify({"error": str(e)}), 500
     
+    def circuit_open_response(data, result, idempotency_key):
+        """Spill a webhook refused by an open circuit to the retry store, or fail fast."""
+        retry_after = result.get("retry_after", 0)
+        if job_queue is not None:
+            try:
+                job_id = job_queue.enqueue(data, delay=retry_after, idempotency_key=idempotency_key)
+                return jsonify({"status": "deferred", "reason": result["reason"], "job_id": job_id}), 202
+            except Exception as e:
+                logging.error("Error spilling webhook to retry store: %s", e)
+        # Let GoHighLevel redeliver once the circuit has had time to recover
+        return jsonify(result), 503, {"Retry-After": str(int(retry_after) + 1)}
+    
+    @app.route("/queue/metrics", methods=["GET"])
+    def queue_metrics():
+        """Queue depth and drain-rate metrics for the ingest queue / retry store."""
+        mode = "async" if async_ingest else "sync"
+        metrics = {"mode": mode}
+        if job_queue is not None:
+            metrics.update(job_queue.stats())
+        if context.form_queue is not None:
+            metrics["glp1_forms"] = context.form_queue.stats()
+        return jsonify(metrics)
+    
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        """Latency histograms, upstream counters and gauges in the Prometheus text format."""
+        if not metrics_config.get("enabled", True):
+            return jsonify({"error": "Metrics are disabled"}), 404
+        return render_metrics(), 200, {"Content-Type": CONTENT_TYPE}
+    
     return app
+
+def collect_queue_depths(queues):
+    """
+    Scrape-time gauge of the queue stores' depth by job status.
+    
+    Args:
+        queues (dict): Queue name -> SQLiteJobQueue (None if not in use)
+    """
+    samples = []
+    for name, queue in queues.items():
+        if queue is None:
+            continue
+        depth = queue.depth()
+        for status in (PENDING, PROCESSING, FAILED):
+            samples.append(((name, status), depth[status]))
+    return [("ghl_intakeq_queue_depth", GAUGE, "Jobs in each queue store by status", ("queue", "status"), samples)]
+
+def start_background_workers(app):
+    """
+    Start the app's queue workers, the log listener and the metrics snapshot
+    writer in this process.
+    
+    Threads do not survive fork, so pre-forking servers call this once in
+    each worker process after the app was preloaded in the master.
+    
+    Args:
+        app (Flask): An app built by create_app
+    """
+    restart_logging()
+    for pool in app.config["WORKER_POOLS"]:
+        pool.start()
+    metrics_config = app.config["METRICS_CONFIG"]
+    if metrics_config.get("enabled", True):
+        start_snapshot_writer(metrics_config.get("flush_interval", 5))
+    atexit.register(stop_background_workers, app)
+
+def stop_background_workers(app, timeout=30.0):
+    """
+    Stop the app's queue workers, letting in-flight jobs finish.
+    
+    Args:
+        app (Flask): An app built by create_app
+        timeout (float): Seconds to wait for each worker thread
+    """
+    for pool in app.config["WORKER_POOLS"]:
+        pool.stop(timeout)
+    stop_snapshot_writer()
+    shutdown_tracing()
@@ -0,0 +1,18 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn src.api.wsgi:app
+
+The app is built at import time so a pre-forking server can load it once in
+its master process (config parsing, mapping compilation and imports are then
+shared by every worker). Queue worker threads are started per worker process
+by the server's post-fork hook; see gunicorn.conf.py. Servers without such a
+hook should call start_background_workers(app) in each process.
+"""
+
+from dotenv import load_dotenv
+from src.api.webhook_server import create_app
+
+load_dotenv()
+
+app = create_app(start_workers=False)
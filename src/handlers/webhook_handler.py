@@ -3,154 +3,331 @@ Handler for processing webhooks from GoHighLevel.
 """
 
 import logging
-import json
-import os
-from dotenv import load_dotenv
-from src.api.gohighlevel_client import GoHighLevelClient
-from src.api.intakeq_client import IntakeQClient
-from src.utils.data_mapper import map_contact_to_client
-from src.utils.glp1_field_mapping import extract_glp1_custom_fields, map_glp1_fields_to_intakeq_form
+import time
+from src.api.circuit_breaker import CircuitOpenError
+from src.api.intakeq_client import DEFAULT_FORM_ENDPOINT
+from src.utils.app_context import get_app_context
+from src.utils.change_detector import compute_digest
+from src.utils.client_id_cache import normalize_email
+from src.utils.idempotency_store import derive_idempotency_key
+from src.utils.logging_setup import log_body
+from src.utils.metrics import STAGE_ENRICH, STAGE_MAPPING, STAGE_NORMALIZE
+from src.utils.tracing import start_span
+from src.utils.payload_normalizer import merge_contacts, normalize_contact, normalize_payload
 
-def process_webhook(data):
+def is_paid_webhook(data):
     """
-    Process a webhook from GoHighLevel.
-    Only processes contacts with the 'paid' tag and ignores empty fields.
+    Check whether a webhook payload is for a contact with the 'paid' tag.
     
     Args:
         data (dict): The webhook payload
         
     Returns:
-        dict: The result of processing the webhook
+        bool: True if the contact carries the 'paid' tag
     """
-    logging.info("Processing webhook")
-    
-    # Load environment variables
-    load_dotenv()
-    api_key = os.getenv("INTAKEQ_API_KEY")
-    if not api_key:
-        logging.error("IntakeQ API Key not found")
-        return {"status": "error", "reason": "IntakeQ API Key not found"}
-    logging.info("IntakeQ API Key found: " + api_key[:4] + "...")
-    
-    # Load configuration
-    with open("config/config.json", "r") as f:
-        config = json.load(f)
+    if not isinstance(data, dict):
+        return False
     
-    # Check if this is a contact with the 'paid' tag
     # First check if the tag is in the payload.tagName field (webhook format)
     if "payload" in data and "tagName" in data["payload"] and data["payload"]["tagName"].lower() == "paid":
         logging.info("Found 'paid' tag in payload.tagName")
-        is_paid = True
+        return True
+    
     # Then check if the tag is in the tags field (direct contact format)
-    elif "tags" in data:
+    if "tags" in data:
         tags = data.get("tags", "").split(",")
         is_paid = "paid" in [tag.strip().lower() for tag in tags]
         if is_paid:
             logging.info("Found 'paid' tag in tags field")
-    else:
-        is_paid = False
+        return is_paid
+    
+    return False
+
+def process_webhook(data, context=None, idempotency_key=None):
+    """
+    Process a webhook from GoHighLevel.
+    Only processes contacts with the 'paid' tag and ignores empty fields.
+    Replays of a delivery already processed within the idempotency window
+    return the original result without being processed again.
+    
+    Args:
+        data (dict): The webhook payload
+        context (AppContext): Application context (defaults to the process-wide one)
+        idempotency_key (str): Explicit idempotency key (e.g. from a request header)
+        
+    Returns:
+        dict: The result of processing the webhook
+    """
+    logging.info("Processing webhook")
+    
+    # Config, settings and clients are loaded once per process
+    context = context or get_app_context()
     
-    if not is_paid:
+    event_type = data.get("type") if isinstance(data, dict) else None
+    with start_span("process_webhook", attributes={"webhook.type": str(event_type)}) as span:
+        result = _process_webhook(data, context, idempotency_key)
+        span.set_attribute("result.status", str(result.get("status")))
+        return result
+
+def _process_webhook(data, context, idempotency_key):
+    """Process a webhook in process_webhook's span."""
+    invalidate_cached_contact(data, context)
+    
+    store = context.idempotency_store
+    if store is not None:
+        key = derive_idempotency_key(data, idempotency_key)
+        previous = store.get(key)
+        if previous is not None:
+            logging.info("Dropping replayed webhook already processed within the idempotency window")
+            return {**previous, "duplicate": True}
+    
+    result = _sync_contact(data, context)
+    
+    if store is not None and result.get("status") in ("success", "unchanged"):
+        store.set(key, result)
+    return result
+
+def _sync_contact(data, context):
+    """
+    Map a webhook's contact and create or update it in IntakeQ.
+    
+    Args:
+        data (dict): The webhook payload
+        context (AppContext): Application context
+        
+    Returns:
+        dict: The result of processing the webhook
+    """
+    intakeq_client = context.get_intakeq_client()
+    if intakeq_client is None:
+        logging.error("IntakeQ API Key not found")
+        return {"status": "error", "reason": "IntakeQ API Key not found"}
+    
+    if not is_paid_webhook(data):
         logging.info("Ignoring: 'paid' tag not found")
         return {"status": "ignored", "reason": "Not a paid tag"}
     
-    # Get contact data from the appropriate location in the payload
+    # Read either payload format into a compact contact record
+    start = time.perf_counter()
+    with start_span("normalize"):
+        contact = normalize_payload(data)
+    STAGE_NORMALIZE.observe(time.perf_counter() - start)
     if "payload" in data:
-        # Webhook format
-        payload = data["payload"]
-        contact = {
-            "id": payload.get("contactId"),
-            "firstName": payload.get("firstName"),
-            "lastName": payload.get("lastName"),
-            "email": payload.get("email"),
-            "phone": payload.get("phone"),
-            "city": payload.get("city"),
-            "state": payload.get("state"),
-            "country": payload.get("country", "USA"),
-            "postalCode": payload.get("postalCode"),
-            "customFields": []
-        }
+        start = time.perf_counter()
+        with start_span("enrich"):
+            contact = _enrich_contact(contact, data, context)
+        STAGE_ENRICH.observe(time.perf_counter() - start)
+    return sync_contact(contact, context, intakeq_client)
+
+def _event_contact_id(data):
+    """The contact a webhook is about, in either GoHighLevel's nested or flat event format."""
+    payload = data.get("payload")
+    if isinstance(payload, dict):
+        return payload.get("contactId") or payload.get("id")
+    return data.get("contactId") or data.get("id") or data.get("contact_id")
+
+def invalidate_cached_contact(data, context):
+    """
+    Drop the cached GoHighLevel contact a contact-update webhook refers to.
+    
+    Args:
+        data (dict): The webhook payload
+        context (AppContext): Application context
+    """
+    cache = context.contact_cache
+    if cache is None or not isinstance(data, dict):
+        return
+    invalidate_on = context.config.get("contact_enrichment", {}).get("invalidate_on", ())
+    if data.get("type") not in invalidate_on:
+        return
+    contact_id = _event_contact_id(data)
+    if contact_id:
+        cache.invalidate(contact_id)
+        logging.info("Invalidated cached contact %s on %s", contact_id, data.get("type"))
+
+def _enrich_contact(contact, data, context):
+    """
+    Fill in what a partial webhook payload lacks from the full GoHighLevel contact.
+    
+    Fetches go through the contact cache. Enrichment is best effort: if the
+    contact cannot be fetched, the payload is synced as it is.
+    
+    Args:
+        contact (ContactRecord): The contact read from the payload
+        data (dict): The webhook payload
+        context (AppContext): Application context
         
-        # Add custom fields from the payload
-        if "customFields" in payload:
-            for field in payload["customFields"]:
-                field_key = field.get("key", "")
-                field_value = field.get("field_value")
-                
-                # Map specific fields we care about
-                if field_key == "Height Feet":
-                    contact["Height Feet"] = field_value
-                elif field_key == "Height Inches":
-                    contact["Height Inches"] = field_value
-                elif field_key == "BMI":
-                    contact["BMI"] = field_value
-                elif field_key == "Current Weight?":
-                    contact["Current Weight?"] = field_value
-                elif field_key == "Target Weight":
-                    contact["Target Weight"] = field_value
-                
-                # Still add to customFields for general processing
-                contact["customFields"].append({
-                    "key": field_key,
-                    "field_value": str(field_value) if field_value is not None else ""
-                })
-    else:
-        # Direct contact format
-        contact = {
-            "id": data.get("contact_id"),
-            "firstName": data.get("first_name"),
-            "lastName": data.get("last_name"),
-            "email": data.get("email"),
-            "phone": data.get("phone"),
-            "city": data.get("city"),
-            "state": data.get("state"),
-            "country": data.get("country"),
-            "postalCode": data.get("postal_code"),
-            "customFields": []
-        }
+    Returns:
+        ContactRecord: The enriched contact
+    """
+    if not contact.id or not context.config.get("contact_enrichment", {}).get("enabled", False):
+        return contact
+    payload = data.get("payload")
+    location_id = data.get("locationId") or (payload.get("locationId") if isinstance(payload, dict) else None)
+    ghl_client = context.get_gohighlevel_client()
+    if not ghl_client.has_credentials(location_id):
+        logging.info("Not enriching contact %s: no GoHighLevel token for location %s", contact.id, location_id)
+        return contact
+    try:
+        full = ghl_client.get_contact(contact.id, location_id)
+        if not full or "error" in full:
+            logging.warning("Could not enrich contact %s: %s", contact.id, (full or {}).get("error"))
+            return contact
+        return merge_contacts(contact, normalize_contact(full, ghl_client.get_custom_field_keys(location_id)))
+    except Exception as e:
+        # Best effort: an open circuit or any other failure leaves the payload as it is
+        logging.warning("Not enriching contact %s: %s", contact.id, str(e))
+        return contact
+
+def sync_contact(contact, context, intakeq_client=None):
+    """
+    Map a normalized contact and create or update it in IntakeQ.
+    
+    Shared by the webhook path and the backfill command.
+    
+    Args:
+        contact (ContactRecord): The normalized GoHighLevel contact
+        context (AppContext): Application context
+        intakeq_client (IntakeQClient): Client to use (defaults to the context's)
         
-        # Add all form fields as custom fields
-        for key, value in data.items():
-            if key not in ["contact_id", "first_name", "last_name", "email", "phone", "tags", "city", "state", "country", "postal_code"]:
-                contact["customFields"].append({
-                    "key": key,
-                    "field_value": str(value) if value is not None else ""
-                })
-    
-    # Initialize clients
-    intakeq_client = IntakeQClient(api_key=api_key)
-    
-    # Map GoHighLevel contact to IntakeQ client
-    client_data = map_contact_to_client(contact, config["field_mapping"])
-    
-    # Extract and map GLP-1 custom fields
-    glp1_fields = extract_glp1_custom_fields(contact)
-    if glp1_fields:
-        # Filter out empty fields
-        glp1_fields = {k: v for k, v in glp1_fields.items() if v}
-        if glp1_fields:
-            logging.info(f"Found {len(glp1_fields)} GLP-1 custom fields with values")
-            form_data = map_glp1_fields_to_intakeq_form(glp1_fields)
-            client_data["form_data"] = form_data
-        else:
-            logging.info("No GLP-1 custom fields with values found")
+    Returns:
+        dict: The result of the sync
+    """
+    intakeq_client = intakeq_client or context.get_intakeq_client()
+    if intakeq_client is None:
+        logging.error("IntakeQ API Key not found")
+        return {"status": "error", "reason": "IntakeQ API Key not found"}
+    
+    # Map GoHighLevel contact to IntakeQ client, extracting GLP-1 fields in the same pass
+    start = time.perf_counter()
+    with start_span("mapping") as span:
+        mapped = context.mapping_plan.map_record(contact)
+        span.set_attribute("glp1_fields", len(mapped.glp1_fields))
+    STAGE_MAPPING.observe(time.perf_counter() - start)
+    client_data = mapped.client_data
+    glp1_fields = mapped.glp1_fields
+    form_data = mapped.form_data
+    if form_data:
+        logging.info("Found %d GLP-1 custom fields with values", len(glp1_fields))
     else:
-        logging.info("No GLP-1 custom fields found")
+        logging.info("No GLP-1 custom fields with values found")
+    
+    log_body(logging.getLogger(), "Mapped client data for contact %s", client_data, contact.id)
+    
+    # The form answers are submitted separately and tracked apart from the client (see _queue_form)
+    digest = compute_digest(client_data)
     
-    logging.info(f"Raw client data: {client_data}")
+    # Skip the upstream write if this contact was already synced with identical data
+    change_detector = context.change_detector
+    if change_detector is not None and contact.id:
+        client_id = change_detector.check(contact.id, digest)
+        if client_id is not None:
+            logging.info("Contact %s unchanged since last sync, skipping IntakeQ update", contact.id)
+            if form_data:
+                # A form that failed after the client was synced is queued again
+                _queue_form(context, client_id, contact.id, form_data)
+            return {
+                "status": "unchanged",
+                "gohighlevel_contact_id": contact.id,
+                "intakeq_client_id": client_id,
+                "glp1_fields_mapped": len(glp1_fields) if glp1_fields else 0
+            }
     
     # Create client in IntakeQ
     try:
-        result = intakeq_client.create_client(client_data)
+        # Concurrent deliveries for the same email share one search+write;
+        # different payloads for the same email are serialized
+        email_key = normalize_email(client_data.get("Email"))
+        if email_key:
+            result = context.single_flight.do(
+                email_key, lambda: intakeq_client.create_client(client_data), fingerprint=digest
+            )
+        else:
+            result = intakeq_client.create_client(client_data)
+        if change_detector is not None and contact.id and result and "error" not in result:
+            change_detector.record(contact.id, digest, result.get("ClientId"))
+        if form_data and result and "error" not in result:
+            _queue_form(context, result.get("ClientId"), contact.id, form_data)
+        if result and "error" in result:
+            # Surface upstream failures so they are retried rather than remembered as processed
+            return {
+                "status": "error",
+                "reason": f"Failed to create client in IntakeQ: {result['error']}",
+                "gohighlevel_contact_id": contact.id
+            }
         return {
             "status": "success",
-            "gohighlevel_contact_id": contact["id"],
+            "gohighlevel_contact_id": contact.id,
             "intakeq_client_id": result.get("ClientId") if result else None,
             "glp1_fields_mapped": len(glp1_fields) if glp1_fields else 0
         }
+    except CircuitOpenError as e:
+        # Fail fast: the caller decides whether to spill the webhook to the retry store
+        logging.warning("Not syncing contact %s: %s", contact.id, e)
+        return {
+            "status": "error",
+            "reason": str(e),
+            "circuit_open": True,
+            "retry_after": round(e.retry_after, 1)
+        }
     except Exception as e:
-        logging.error(f"Error creating client in IntakeQ: {str(e)}")
+        logging.error("Error creating client in IntakeQ: %s", e)
         return {
             "status": "error",
             "reason": f"Failed to create client in IntakeQ: {str(e)}"
         }
+
+def _queue_form(context, client_id, contact_id, form_data):
+    """Hand a client's GLP-1 answers to the form submission queue (coalesced per client) unless already submitted."""
+    form_queue = context.form_queue
+    if form_queue is None or not client_id:
+        return
+    change_detector = context.change_detector
+    if change_detector is not None and change_detector.check_form(contact_id, compute_digest(form_data), client_id):
+        logging.info("GLP-1 form of contact %s already submitted, not queueing it", contact_id)
+        return
+    try:
+        form_queue.enqueue(str(client_id), {
+            "client_id": client_id,
+            "gohighlevel_contact_id": contact_id,
+            "form_data": form_data
+        })
+    except Exception as e:
+        # The client itself was synced; a lost form write must not fail the webhook
+        logging.error("Error queueing GLP-1 form for client %s: %s", client_id, e)
+
+def process_form_submission(payload, context=None):
+    """
+    Submit queued GLP-1 form answers to IntakeQ (run by the form queue's workers).
+    
+    Args:
+        payload (dict): The queued submission (client_id, gohighlevel_contact_id, form_data)
+        context (AppContext): Application context (defaults to the process-wide one)
+        
+    Returns:
+        dict: The result, in the same shape as process_webhook's
+    """
+    context = context or get_app_context()
+    intakeq_client = context.get_intakeq_client()
+    if intakeq_client is None:
+        return {"status": "error", "reason": "IntakeQ API Key not found"}
+    
+    endpoint = context.config.get("glp1_forms", {}).get("endpoint", DEFAULT_FORM_ENDPOINT)
+    client_id = payload["client_id"]
+    try:
+        result = intakeq_client.submit_form(client_id, payload["form_data"], endpoint)
+    except CircuitOpenError as e:
+        return {"status": "error", "reason": str(e), "circuit_open": True, "retry_after": round(e.retry_after, 1)}
+    if result is None or "error" in result:
+        return {
+            "status": "error",
+            "reason": f"Failed to submit GLP-1 form: {(result or {}).get('error')}",
+            "intakeq_client_id": client_id
+        }
+    logging.info("Submitted GLP-1 form for client %s", client_id)
+    # Only now are these answers done; until then identical re-deliveries queue the form again
+    if context.change_detector is not None:
+        context.change_detector.record_form(
+            payload.get("gohighlevel_contact_id"), compute_digest(payload["form_data"]), client_id
+        )
+    return {"status": "success", "intakeq_client_id": client_id}
@@ -0,0 +1,405 @@
+"""
+Bulk backfill of GoHighLevel contacts into IntakeQ.
+
+Streams contacts page by page from the GoHighLevel contacts API or from a
+local export (.json, .jsonl or .csv), keeps those with the "paid" tag and
+syncs them through the same mapping, change-detection and create/update path
+the webhook uses, with a bounded number of contacts in flight.
+
+Progress is checkpointed after every page whose contacts have all finished,
+so an interrupted run resumes from the last completed page; contacts of a
+partly finished page are sent again and skipped by change detection.
+
+Usage:
+    python -m src.jobs.backfill --location-id LOC123 --concurrency 8
+    python -m src.jobs.backfill --file export.csv --dry-run
+"""
+
+import argparse
+import collections
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.api.pagination import PaginationError
+from src.handlers.webhook_handler import process_form_submission, sync_contact
+from src.jobs.worker_pool import WorkerPool
+from src.utils.app_context import init_app_context
+from src.utils.logging_setup import configure_logging
+from src.utils.payload_normalizer import normalize_contact, normalize_payload
+
+DEFAULT_CHECKPOINT_PATH = "data/backfill.checkpoint.json"
+
+# How many times a contact is retried while the IntakeQ circuit is open
+MAX_CIRCUIT_WAITS = 5
+
+
+class BackfillError(Exception):
+    """Raised when a backfill cannot start or a source page cannot be read."""
+
+
+def has_tag(tags, tag):
+    """
+    Check a contact's tags for a tag.
+
+    Args:
+        tags: List of tags or a comma-separated string
+        tag (str): Lower-cased tag to look for (None matches every contact)
+
+    Returns:
+        bool: True if the tag is present
+    """
+    if not tag:
+        return True
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return tag in [str(t).strip().lower() for t in tags or ()]
+
+
+def ghl_pages(client, location_id, page_size=100, cursor=None):
+    """
+    Stream a location's contacts from the GoHighLevel API, one page at a time.
+
+    The next page is fetched while the current one is being synced.
+
+    Args:
+        client (GoHighLevelClient): The GoHighLevel client
+        location_id (str): The GoHighLevel location ID
+        page_size (int): Contacts per page
+        cursor (dict): Resume point ({"start_after_id", "start_after"}) from a checkpoint
+
+    Yields:
+        tuple: (records, next_cursor) where records are (ContactRecord, tags) pairs
+            and next_cursor is None after the last page
+
+    Raises:
+        BackfillError: If a page cannot be fetched
+    """
+    # The API returns custom fields by id; resolve them to the keys the mappings use
+    field_keys = client.get_custom_field_keys(location_id)
+    try:
+        for page in client.iter_contact_pages(location_id, page_size, cursor=cursor or None):
+            yield [(normalize_contact(c, field_keys), c.get("tags")) for c in page.items], page.next_cursor
+    except PaginationError as e:
+        raise BackfillError(str(e))
+
+
+def _export_rows(path):
+    """Yield (contact, normalizer) pairs from an export file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        # Rows use the direct form format: snake_case contact columns, every other column a custom field
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield row, normalize_payload
+    elif extension == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line), normalize_contact
+    elif extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for contact in data.get("contacts", []) if isinstance(data, dict) else data:
+            yield contact, normalize_contact
+    else:
+        raise BackfillError(f"Unsupported export format: {path} (expected .json, .jsonl or .csv)")
+
+
+def file_pages(path, page_size=100, cursor=None):
+    """
+    Stream contacts from a local export, one page at a time.
+
+    JSON arrays are parsed whole; use .jsonl or .csv for very large exports.
+
+    Args:
+        path (str): Path to a .json, .jsonl or .csv export
+        page_size (int): Contacts per page
+        cursor (dict): Resume point ({"offset"}) from a checkpoint
+
+    Yields:
+        tuple: (records, next_cursor) where records are (ContactRecord, tags) pairs
+            and next_cursor is None after the last page
+    """
+    offset = (cursor or {}).get("offset", 0)
+    records = []
+    position = 0
+    for contact, normalizer in _export_rows(path):
+        position += 1
+        if position <= offset:
+            continue
+        records.append((normalizer(contact), contact.get("tags")))
+        if len(records) == page_size:
+            yield records, {"offset": position}
+            records = []
+    # A final (possibly empty) page marks the end of the export
+    yield records, None
+
+
+class BackfillStats:
+    """Counters for a backfill run, updated from worker threads."""
+
+    def __init__(self, previous=None):
+        self._lock = threading.Lock()
+        self.counts = collections.Counter((previous or {}).get("counts", {}))
+        self.errors = collections.Counter((previous or {}).get("errors", {}))
+        self.failed_contacts = list((previous or {}).get("failed_contacts", []))
+        self.started = time.monotonic()
+        # Throughput covers this run only, not contacts synced before a resume
+        self._synced_before = self._synced()
+
+    def _synced(self):
+        return sum(self.counts[k] for k in ("success", "unchanged", "mapped", "error"))
+
+    def record(self, outcome, contact_id=None, reason=None):
+        with self._lock:
+            self.counts[outcome] += 1
+            if reason:
+                self.errors[reason] += 1
+                if contact_id:
+                    self.failed_contacts.append(contact_id)
+
+    def summary(self):
+        """
+        Build the run summary.
+
+        Returns:
+            dict: Counts, error reasons, elapsed time and throughput
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            synced = self._synced() - self._synced_before
+            return {
+                "counts": dict(self.counts),
+                "errors": dict(self.errors.most_common(20)),
+                "failed_contacts": self.failed_contacts[-1000:],
+                "elapsed_seconds": round(elapsed, 2),
+                "contacts_per_second": round(synced / elapsed, 1) if elapsed > 0 else 0.0
+            }
+
+
+def _load_checkpoint(path, source):
+    """Read a checkpoint, refusing one written for a different source."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != source:
+        raise BackfillError(f"Checkpoint {path} is for {checkpoint.get('source')}, not {source}; use --restart")
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    """Write a checkpoint atomically."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+class Backfill:
+    """Syncs pages of contacts into IntakeQ with bounded concurrency and page checkpoints."""
+
+    def __init__(self, context, concurrency=4, dry_run=False, tag="paid", checkpoint_path=None):
+        """
+        Initialize the backfill.
+
+        Args:
+            context (AppContext): Application context (clients, mapping, change detection)
+            concurrency (int): Maximum contacts in flight
+            dry_run (bool): Map and validate contacts without writing to IntakeQ
+            tag (str): Only contacts carrying this tag are synced (None syncs every contact)
+            checkpoint_path (str): Where to record progress (None disables checkpoints)
+        """
+        self.context = context
+        self.concurrency = concurrency
+        self.dry_run = dry_run
+        self.tag = tag.lower() if tag else None
+        self.checkpoint_path = checkpoint_path
+        self.intakeq_client = None if dry_run else context.get_intakeq_client()
+        if not dry_run and self.intakeq_client is None:
+            raise BackfillError("IntakeQ API Key not found")
+
+    def _sync(self, contact):
+        """Sync one contact, waiting out open circuits; returns (outcome, reason)."""
+        if self.dry_run:
+            client_data = self.context.mapping_plan.map_record(contact).client_data
+            if not client_data.get("Email"):
+                return "error", "Email is required"
+            return "mapped", None
+
+        for _ in range(MAX_CIRCUIT_WAITS):
+            result = sync_contact(contact, self.context, self.intakeq_client)
+            if not result.get("circuit_open"):
+                break
+            time.sleep(result["retry_after"])
+        status = result.get("status", "error")
+        return status, result.get("reason") if status == "error" else None
+
+    def run(self, pages, source, resume=True):
+        """
+        Run the backfill over a page source.
+
+        Args:
+            pages (callable): Called with the resume cursor; returns an iterator of
+                (records, next_cursor) pages, as ghl_pages and file_pages do
+            source (str): Identifies the source in the checkpoint
+            resume (bool): Continue from an existing checkpoint
+
+        Returns:
+            dict: The run summary (see BackfillStats.summary)
+        """
+        checkpoint = _load_checkpoint(self.checkpoint_path, source) if resume else None
+        if checkpoint and checkpoint.get("done"):
+            logging.info("Backfill of %s already complete", source)
+            return {**checkpoint["stats"], "resumed": True}
+        stats = BackfillStats(checkpoint.get("stats") if checkpoint else None)
+        slots = threading.BoundedSemaphore(self.concurrency)
+        # Pages in submission order: [contacts still in flight, cursor after the page]
+        pending = collections.OrderedDict()
+        lock = threading.Lock()
+
+        def finish(page_no, contact, outcome_reason):
+            outcome, reason = outcome_reason
+            stats.record(outcome, contact.id, reason)
+            with lock:
+                pending[page_no][0] -= 1
+            slots.release()
+
+        def advance():
+            # Checkpoint the cursor after the newest page whose predecessors are all done
+            cursor = None
+            with lock:
+                while pending and next(iter(pending.values()))[0] == 0:
+                    _, (_, cursor) = pending.popitem(last=False)
+            if cursor is not None and self.checkpoint_path:
+                _save_checkpoint(self.checkpoint_path, {
+                    "source": source, "cursor": cursor, "done": False, "stats": stats.summary()
+                })
+
+        def process(page_no, contact):
+            try:
+                outcome_reason = self._sync(contact)
+            except Exception as e:
+                logging.error("Backfill failed for contact %s: %s", contact.id, e)
+                outcome_reason = ("error", str(e))
+            finish(page_no, contact, outcome_reason)
+
+        logging.info("Starting backfill of %s%s", source, " (dry run)" if self.dry_run else "")
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="backfill") as executor:
+                for page_no, (records, next_cursor) in enumerate(pages(checkpoint["cursor"] if checkpoint else None)):
+                    with lock:
+                        # A sentinel count keeps the page open until every contact is submitted
+                        pending[page_no] = [1, next_cursor or {}]
+                    for contact, tags in records:
+                        stats.record("read")
+                        if not has_tag(tags, self.tag):
+                            stats.record("skipped")
+                            continue
+                        slots.acquire()
+                        with lock:
+                            pending[page_no][0] += 1
+                        executor.submit(process, page_no, contact)
+                    with lock:
+                        pending[page_no][0] -= 1
+                    advance()
+        finally:
+            # Record the pages that finished, also when a page fetch failed part way
+            advance()
+
+        summary = stats.summary()
+        if self.checkpoint_path:
+            _save_checkpoint(self.checkpoint_path, {"source": source, "cursor": None, "done": True, "stats": summary})
+        logging.info("Backfill of %s finished: %s", source, summary["counts"])
+        return summary
+
+
+def drain_forms(context, timeout):
+    """
+    Submit the GLP-1 forms a backfill queued before exiting.
+
+    Args:
+        context (AppContext): Application context
+        timeout (float): Seconds to wait for the form queue to empty
+
+    Returns:
+        dict: The form queue's stats after draining (None if forms are disabled)
+    """
+    form_queue = context.form_queue
+    if form_queue is None:
+        return None
+    pool = WorkerPool(
+        form_queue,
+        lambda payload, idempotency_key: process_form_submission(payload, context),
+        workers=context.config.get("glp1_forms", {}).get("workers", 2),
+        name="form"
+    )
+    pool.start()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and form_queue.stats()["depth"]:
+        time.sleep(0.5)
+    pool.stop()
+    return form_queue.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill GoHighLevel contacts into IntakeQ")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--location-id", help="GoHighLevel location to read contacts from")
+    source.add_argument("--file", help="Local export to read contacts from (.json, .jsonl or .csv)")
+    parser.add_argument("--config", default="config/config.json")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum contacts in flight")
+    parser.add_argument("--tag", default="paid", help="Only sync contacts with this tag ('' for all)")
+    parser.add_argument("--dry-run", action="store_true", help="Map and validate without writing to IntakeQ")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--summary-json", help="Also write the summary to this file")
+    parser.add_argument("--form-drain-timeout", type=float, default=120.0,
+                        help="Seconds to wait for queued GLP-1 forms to be submitted")
+    args = parser.parse_args(argv)
+
+    context = init_app_context(args.config)
+    configure_logging({**context.config.get("logging", {}), "console": False})
+
+    if args.location_id:
+        client = context.get_gohighlevel_client()
+        source_name = f"ghl:{args.location_id}"
+        pages = lambda cursor: ghl_pages(client, args.location_id, args.page_size, cursor)  # noqa: E731
+    else:
+        source_name = f"file:{os.path.abspath(args.file)}"
+        pages = lambda cursor: file_pages(args.file, args.page_size, cursor)  # noqa: E731
+
+    # Dry runs never touch the checkpoint of a real run
+    checkpoint_path = None if args.dry_run else args.checkpoint
+    try:
+        backfill = Backfill(
+            context, concurrency=args.concurrency, dry_run=args.dry_run,
+            tag=args.tag or None, checkpoint_path=checkpoint_path
+        )
+        summary = backfill.run(pages, source_name, resume=not args.restart)
+        if not args.dry_run:
+            # Forms left in the queue are picked up by the server's form workers
+            summary["glp1_forms"] = drain_forms(context, args.form_drain_timeout)
+    except BackfillError as e:
+        print(f"Backfill failed: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(summary, indent=2))
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["counts"].get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Coalescing queue of GLP-1 form submissions, backed by SQLite.
+
+The webhook path only records the latest mapped answers for a client; a
+worker pool submits them to IntakeQ later, so form writes add nothing to
+webhook latency. A submission waits ``window`` seconds before it becomes
+available, and any update for the same client arriving in the meantime
+replaces its answers instead of queueing another submission. An update that
+arrives while the client's submission is being sent is queued behind it, and
+submissions for one client are never sent concurrently.
+
+The queue exposes the same claim/complete/fail/defer interface as
+SQLiteJobQueue, so it is drained by the same WorkerPool.
+"""
+
+import logging
+import threading
+import time
+from src.jobs.job_queue import FAILED, PENDING, PROCESSING, QueueMetrics
+from src.utils import json_codec
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS form_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updates INTEGER NOT NULL DEFAULT 1,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_form_jobs_key_status ON form_jobs (key, status);
+CREATE INDEX IF NOT EXISTS idx_form_jobs_status_available ON form_jobs (status, available_at);
+"""
+
+
+class SQLiteFormQueue:
+    """A durable queue holding at most one pending form submission per client."""
+
+    def __init__(self, path, window=5.0, max_attempts=5, retry_delay=5.0, visibility_timeout=300.0):
+        """
+        Initialize the queue, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            window (float): Seconds updates for one client are coalesced before submitting
+            max_attempts (int): Attempts before a submission is marked failed
+            retry_delay (float): Base delay (seconds) before a failed submission is retried; doubles per attempt
+            visibility_timeout (float): Seconds after which a claimed but unfinished submission is re-queued
+        """
+        self.path = path
+        self.window = window
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.visibility_timeout = visibility_timeout
+        self.metrics = QueueMetrics()
+        self.coalesced = 0
+        self._db = ThreadLocalSQLite(path)
+        self._available = threading.Condition()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        """Get this thread's connection."""
+        return self._db.connection()
+
+    def enqueue(self, key, payload):
+        """
+        Queue a submission, or replace the answers of one already waiting for the same key.
+
+        Args:
+            key (str): Coalescing key (the IntakeQ ClientId)
+            payload (dict): The submission
+
+        Returns:
+            bool: True if the payload was coalesced into a waiting submission
+        """
+        conn = self._connection()
+        body = json_codec.dumps_text(payload)
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            updated = conn.execute(
+                "UPDATE form_jobs SET payload = ?, updates = updates + 1 WHERE key = ? AND status = ?",
+                (body, key, PENDING)
+            ).rowcount
+            if not updated:
+                conn.execute(
+                    "INSERT INTO form_jobs (key, payload, status, enqueued_at, available_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, body, PENDING, now, now + self.window)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if updated:
+            self.coalesced += 1
+        else:
+            self.metrics.record_enqueue()
+        return bool(updated)
+
+    def claim(self):
+        """
+        Claim the oldest due submission whose key has no submission in flight.
+
+        Returns:
+            tuple: (job_id, payload, attempts) or None if nothing is due
+        """
+        conn = self._connection()
+        now = time.time()
+        stale = now - self.visibility_timeout
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM form_jobs AS j "
+                "WHERE ((status = ? AND available_at <= ?) OR (status = ? AND claimed_at <= ?)) "
+                "AND NOT EXISTS (SELECT 1 FROM form_jobs AS o WHERE o.key = j.key AND o.id != j.id "
+                "AND o.status = ? AND o.claimed_at > ?) "
+                "ORDER BY available_at LIMIT 1",
+                (PENDING, now, PROCESSING, stale, PROCESSING, stale)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE form_jobs SET status = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (PROCESSING, now, row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row[0], json_codec.loads(row[1]), row[2] + 1
+
+    def complete(self, job_id):
+        """Remove a submitted job."""
+        self._connection().execute("DELETE FROM form_jobs WHERE id = ?", (job_id,))
+        self.metrics.record_completion()
+
+    def fail(self, job_id, attempts, error):
+        """
+        Record a failed attempt, scheduling a retry with exponential backoff.
+
+        Args:
+            job_id (int): The job ID
+            attempts (int): Attempts made so far, including this one
+            error (str): Description of the failure
+        """
+        if attempts >= self.max_attempts:
+            self._connection().execute(
+                "UPDATE form_jobs SET status = ?, last_error = ? WHERE id = ?", (FAILED, error, job_id)
+            )
+            self.metrics.record_failure()
+            logging.error("Form submission %s failed permanently after %s attempts: %s", job_id, attempts, error)
+            return
+
+        delay = self.retry_delay * (2 ** (attempts - 1))
+        self._requeue(job_id, delay, error, 0)
+        self.metrics.record_retry()
+        logging.warning("Form submission %s attempt %s failed, retrying in %.1fs: %s", job_id, attempts, delay, error)
+
+    def defer(self, job_id, delay, reason):
+        """
+        Put a claimed submission back without counting the attempt (e.g. the circuit is open).
+
+        Args:
+            job_id (int): The job ID
+            delay (float): Seconds before the submission becomes available again
+            reason (str): Why it was deferred
+        """
+        self._requeue(job_id, delay, reason, 1)
+        self.metrics.record_retry()
+        logging.warning("Form submission %s deferred for %.1fs: %s", job_id, delay, reason)
+
+    def _requeue(self, job_id, delay, error, refund):
+        """
+        Return a claimed job to pending.
+
+        If a newer submission for the same key was queued meanwhile, it already
+        carries the latest answers, so the older job is dropped instead.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            newer = conn.execute(
+                "SELECT 1 FROM form_jobs WHERE key = (SELECT key FROM form_jobs WHERE id = ?) "
+                "AND status = ? AND id != ?",
+                (job_id, PENDING, job_id)
+            ).fetchone()
+            if newer:
+                conn.execute("DELETE FROM form_jobs WHERE id = ?", (job_id,))
+            else:
+                conn.execute(
+                    "UPDATE form_jobs SET status = ?, available_at = ?, attempts = attempts - ?, last_error = ? "
+                    "WHERE id = ?",
+                    (PENDING, time.time() + delay, refund, error, job_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def wait(self, timeout):
+        """Block until woken or the timeout expires (submissions only become due after the window)."""
+        with self._available:
+            self._available.wait(timeout)
+
+    def wake_all(self):
+        """Wake every waiting worker (used on shutdown)."""
+        with self._available:
+            self._available.notify_all()
+
+    def depth(self):
+        """
+        Count submissions not yet finished.
+
+        Returns:
+            dict: Number of pending, processing and failed submissions
+        """
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM form_jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, PROCESSING: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def stats(self):
+        """
+        Queue depth, coalescing and throughput metrics.
+
+        Returns:
+            dict: Depth by status plus counters and drain rate
+        """
+        depth = self.depth()
+        return {
+            "depth": depth[PENDING] + depth[PROCESSING],
+            "pending": depth[PENDING],
+            "processing": depth[PROCESSING],
+            "failed": depth[FAILED],
+            "enqueued_total": self.metrics.enqueued,
+            "coalesced_total": self.coalesced,
+            "completed_total": self.metrics.completed,
+            "retried_total": self.metrics.retried,
+            "failed_total": self.metrics.failed,
+            "drain_rate_per_sec": round(self.metrics.drain_rate(), 3)
+        }
+
+
+def create_form_queue(forms_config):
+    """
+    Build the queue described by the "glp1_forms" block of config.json.
+
+    Args:
+        forms_config (dict): Settings (enabled, queue_path, window, max_attempts, retry_delay)
+
+    Returns:
+        SQLiteFormQueue: The queue, or None if disabled
+    """
+    if not forms_config or not forms_config.get("enabled", True):
+        return None
+    path = forms_config.get("queue_path", "data/form_jobs.sqlite3")
+    logging.info("Using GLP-1 form submission queue at %s", path)
+    return SQLiteFormQueue(
+        path,
+        window=forms_config.get("window", 5.0),
+        max_attempts=forms_config.get("max_attempts", 5),
+        retry_delay=forms_config.get("retry_delay", 5.0)
+    )
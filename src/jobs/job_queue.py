@@ -0,0 +1,263 @@
+"""
+Durable local job queue for webhook ingestion, backed by SQLite.
+
+Webhooks are persisted before the server acknowledges them, so a crash or
+restart never loses an accepted delivery. Any number of threads and processes
+(e.g. gunicorn workers) can share one queue file; claims are serialized with
+``BEGIN IMMEDIATE`` transactions.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from src.utils import json_codec
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+PENDING = "pending"
+PROCESSING = "processing"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at);
+"""
+
+
+class QueueMetrics:
+    """In-process counters for queue throughput."""
+
+    def __init__(self, window=60.0):
+        """
+        Initialize the metrics.
+
+        Args:
+            window (float): Seconds over which the drain rate is averaged
+        """
+        self.window = window
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self._completions = deque()
+        self._lock = threading.Lock()
+
+    def record_enqueue(self):
+        with self._lock:
+            self.enqueued += 1
+
+    def record_completion(self):
+        now = time.monotonic()
+        with self._lock:
+            self.completed += 1
+            self._completions.append(now)
+            self._trim(now)
+
+    def record_retry(self):
+        with self._lock:
+            self.retried += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def _trim(self, now):
+        cutoff = now - self.window
+        while self._completions and self._completions[0] < cutoff:
+            self._completions.popleft()
+
+    def drain_rate(self):
+        """Jobs completed per second over the last window."""
+        with self._lock:
+            self._trim(time.monotonic())
+            return len(self._completions) / self.window
+
+
+class SQLiteJobQueue:
+    """A durable FIFO queue of webhook payloads stored in SQLite."""
+
+    def __init__(self, path, max_attempts=5, retry_delay=5.0, visibility_timeout=300.0):
+        """
+        Initialize the queue, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            max_attempts (int): Attempts before a job is marked failed
+            retry_delay (float): Base delay (seconds) before a failed job is retried; doubles per attempt
+            visibility_timeout (float): Seconds after which a claimed but unfinished job is re-queued
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.visibility_timeout = visibility_timeout
+        self.metrics = QueueMetrics()
+        self._db = ThreadLocalSQLite(path)
+        self._available = threading.Condition()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        # Queue files created before jobs carried their delivery's idempotency key
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if "idempotency_key" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN idempotency_key TEXT")
+
+    def _connection(self):
+        """Get this thread's connection."""
+        return self._db.connection()
+
+    def enqueue(self, payload, delay=0.0, idempotency_key=None):
+        """
+        Persist a payload and wake a waiting worker.
+
+        Args:
+            payload (dict): The webhook payload
+            delay (float): Seconds before the job becomes available
+            idempotency_key (str): The delivery's explicit idempotency key (e.g. X-Idempotency-Key)
+
+        Returns:
+            int: The job ID
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO jobs (payload, idempotency_key, status, enqueued_at, available_at) VALUES (?, ?, ?, ?, ?)",
+            (json_codec.dumps_text(payload), idempotency_key, PENDING, now, now + delay)
+        )
+        self.metrics.record_enqueue()
+        with self._available:
+            self._available.notify()
+        return cursor.lastrowid
+
+    def claim(self):
+        """
+        Claim the oldest available job.
+
+        Jobs left in the processing state past the visibility timeout (e.g. by
+        a crashed worker) are claimable again.
+
+        Returns:
+            tuple: (job_id, payload, attempts, idempotency_key) or None if the queue is empty
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload, attempts, idempotency_key FROM jobs "
+                "WHERE (status = ? AND available_at <= ?) OR (status = ? AND claimed_at <= ?) "
+                "ORDER BY id LIMIT 1",
+                (PENDING, now, PROCESSING, now - self.visibility_timeout)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (PROCESSING, now, row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row[0], json_codec.loads(row[1]), row[2] + 1, row[3]
+
+    def complete(self, job_id):
+        """Remove a successfully processed job."""
+        self._connection().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self.metrics.record_completion()
+
+    def fail(self, job_id, attempts, error):
+        """
+        Record a failed attempt, scheduling a retry with exponential backoff.
+
+        Args:
+            job_id (int): The job ID
+            attempts (int): Attempts made so far, including this one
+            error (str): Description of the failure
+        """
+        if attempts >= self.max_attempts:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, last_error = ? WHERE id = ?",
+                (FAILED, error, job_id)
+            )
+            self.metrics.record_failure()
+            logging.error("Job %s failed permanently after %s attempts: %s", job_id, attempts, error)
+            return
+
+        delay = self.retry_delay * (2 ** (attempts - 1))
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, available_at = ?, last_error = ? WHERE id = ?",
+            (PENDING, time.time() + delay, error, job_id)
+        )
+        self.metrics.record_retry()
+        logging.warning("Job %s attempt %s failed, retrying in %.1fs: %s", job_id, attempts, delay, error)
+
+    def defer(self, job_id, delay, reason):
+        """
+        Put a claimed job back without counting the attempt.
+
+        Used when the job never reached the upstream (e.g. its circuit is
+        open), so an outage longer than the retry schedule does not exhaust
+        max_attempts.
+
+        Args:
+            job_id (int): The job ID
+            delay (float): Seconds before the job becomes available again
+            reason (str): Why the job was deferred
+        """
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, available_at = ?, attempts = attempts - 1, last_error = ? WHERE id = ?",
+            (PENDING, time.time() + delay, reason, job_id)
+        )
+        self.metrics.record_retry()
+        logging.warning("Job %s deferred for %.1fs: %s", job_id, delay, reason)
+
+    def wait(self, timeout):
+        """Block until a job is enqueued in this process or the timeout expires."""
+        with self._available:
+            self._available.wait(timeout)
+
+    def wake_all(self):
+        """Wake every waiting worker (used on shutdown)."""
+        with self._available:
+            self._available.notify_all()
+
+    def depth(self):
+        """
+        Count jobs not yet finished.
+
+        Returns:
+            dict: Number of pending, processing and failed jobs
+        """
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, PROCESSING: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def stats(self):
+        """
+        Queue depth and throughput metrics.
+
+        Returns:
+            dict: Depth by status plus enqueue/completion counters and drain rate
+        """
+        depth = self.depth()
+        return {
+            "depth": depth[PENDING] + depth[PROCESSING],
+            "pending": depth[PENDING],
+            "processing": depth[PROCESSING],
+            "failed": depth[FAILED],
+            "enqueued_total": self.metrics.enqueued,
+            "completed_total": self.metrics.completed,
+            "retried_total": self.metrics.retried,
+            "failed_total": self.metrics.failed,
+            "drain_rate_per_sec": round(self.metrics.drain_rate(), 3)
+        }
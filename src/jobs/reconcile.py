@@ -0,0 +1,140 @@
+"""
+Reconcile GoHighLevel contacts against IntakeQ.
+
+Diffs a GoHighLevel location (or export) against the local IntakeQ client
+index instead of searching IntakeQ once per contact. Each contact is matched
+through the index and reported as in sync, mismatched (with the differing
+fields) or missing from IntakeQ. Indexed clients that no contact matched are
+reported as IntakeQ-only. Pass --refresh-index to rebuild the index from a
+full scan of IntakeQ first.
+
+Usage:
+    python -m src.jobs.reconcile --location-id LOC123 --refresh-index
+    python -m src.jobs.reconcile --file export.jsonl --report reconcile.json
+"""
+
+import argparse
+import collections
+import json
+import sys
+
+from src.api.pagination import PaginationError
+from src.jobs.backfill import BackfillError, has_tag, file_pages, ghl_pages
+from src.utils.app_context import init_app_context
+from src.utils.client_id_cache import normalize_email
+from src.utils.client_index import normalize_dob, normalize_phone
+from src.utils.logging_setup import configure_logging
+
+# Detailed entries kept per category in the report
+DEFAULT_DETAIL_LIMIT = 200
+
+
+def _differences(contact, indexed):
+    """Fields where a GoHighLevel contact and its indexed IntakeQ client disagree."""
+    pairs = (
+        ("email", normalize_email(contact.email), indexed["email"] or ""),
+        ("phone", normalize_phone(contact.phone), indexed["phone"] or ""),
+        ("first_name", (contact.first_name or "").strip().lower(), indexed["first_name"] or ""),
+        ("last_name", (contact.last_name or "").strip().lower(), indexed["last_name"] or ""),
+        ("dob", normalize_dob(contact.dob), indexed["dob"] or "")
+    )
+    # A field missing on either side is not a conflict
+    return [field for field, ghl, intakeq in pairs if ghl and intakeq and ghl != intakeq]
+
+
+def reconcile(index, pages, tag="paid", detail_limit=DEFAULT_DETAIL_LIMIT):
+    """
+    Diff contacts against the client index.
+
+    Args:
+        index (ClientIndex): The IntakeQ client index
+        pages: Iterator of (records, next_cursor) pages, as backfill.ghl_pages and file_pages yield
+        tag (str): Only contacts with this tag are reconciled (None for all)
+        detail_limit (int): Maximum detailed entries kept per category
+
+    Returns:
+        dict: Counts per category and up to detail_limit entries for each
+    """
+    counts = collections.Counter()
+    details = {"mismatched": [], "missing_in_intakeq": [], "intakeq_only": []}
+    matched = set()
+
+    def note(category, entry):
+        counts[category] += 1
+        if len(details[category]) < detail_limit:
+            details[category].append(entry)
+
+    for records, _ in pages:
+        for contact, tags in records:
+            counts["ghl_contacts"] += 1
+            if not has_tag(tags, tag):
+                counts["skipped"] += 1
+                continue
+            client_id = index.match(contact.email, contact.phone, contact.first_name, contact.last_name, contact.dob)
+            if client_id is None:
+                note("missing_in_intakeq", contact.id)
+                continue
+            matched.add(client_id)
+            fields = _differences(contact, index.get(client_id) or {})
+            if fields:
+                note("mismatched", {"gohighlevel_contact_id": contact.id, "intakeq_client_id": client_id,
+                                    "fields": fields})
+            else:
+                counts["in_sync"] += 1
+
+    for row in index.iter_rows():
+        counts["intakeq_clients"] += 1
+        if row[0] not in matched:
+            note("intakeq_only", row[0])
+
+    return {"counts": dict(counts), **details}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff GoHighLevel contacts against IntakeQ clients")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--location-id", help="GoHighLevel location to read contacts from")
+    source.add_argument("--file", help="Local export to read contacts from (.json, .jsonl or .csv)")
+    parser.add_argument("--config", default="config/config.json")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--tag", default="paid", help="Only reconcile contacts with this tag ('' for all)")
+    parser.add_argument("--refresh-index", action="store_true", help="Rebuild the index from IntakeQ first")
+    parser.add_argument("--detail-limit", type=int, default=DEFAULT_DETAIL_LIMIT)
+    parser.add_argument("--report", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    context = init_app_context(args.config)
+    configure_logging({**context.config.get("logging", {}), "console": False})
+    index = context.client_index
+    if index is None:
+        print("The client index is disabled (client_index.enabled in config.json)", file=sys.stderr)
+        return 1
+
+    try:
+        if args.refresh_index:
+            intakeq_client = context.get_intakeq_client()
+            if intakeq_client is None:
+                print("IntakeQ API Key not found", file=sys.stderr)
+                return 1
+            # Only full profiles carry DateOfBirth, which name+DOB matching needs
+            index.rebuild(intakeq_client.iter_clients(include_profile=True))
+        if args.location_id:
+            client = context.get_gohighlevel_client()
+            pages = ghl_pages(client, args.location_id, args.page_size)
+        else:
+            pages = file_pages(args.file, args.page_size)
+        report = reconcile(index, pages, args.tag or None, args.detail_limit)
+    except (BackfillError, PaginationError) as e:
+        print(f"Reconcile failed: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    counts = report["counts"]
+    return 1 if counts.get("mismatched") or counts.get("missing_in_intakeq") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
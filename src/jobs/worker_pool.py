@@ -0,0 +1,92 @@
+"""
+Background workers that drain the webhook job queue through process_webhook.
+"""
+
+import logging
+import threading
+
+# How long an idle worker sleeps before polling the queue again. Jobs
+# enqueued in this process wake workers immediately; the poll picks up jobs
+# enqueued by other processes sharing the queue file and delayed retries.
+IDLE_POLL_INTERVAL = 0.5
+
+
+class WorkerPool:
+    """A fixed pool of threads processing queued webhooks."""
+
+    def __init__(self, job_queue, handler, workers=4, name="webhook"):
+        """
+        Initialize the pool.
+
+        Args:
+            job_queue (SQLiteJobQueue): The queue to drain
+            handler (callable): Called with each payload and its idempotency key (None if the
+                queue does not keep one); returns a process_webhook-style result dict
+            workers (int): Number of worker threads
+            name (str): Prefix for thread names and log messages
+        """
+        self.job_queue = job_queue
+        self.handler = handler
+        self.workers = workers
+        self.name = name
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads (once)."""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info("Started %s %s queue workers", self.workers, self.name)
+
+    def stop(self, timeout=30.0):
+        """
+        Stop the workers, letting in-flight jobs finish.
+
+        Args:
+            timeout (float): Seconds to wait for each worker to exit
+        """
+        self._stop.set()
+        self.job_queue.wake_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        """Worker loop: claim, process, acknowledge."""
+        while not self._stop.is_set():
+            try:
+                job = self.job_queue.claim()
+            except Exception as e:
+                logging.error("Failed to claim job: %s", e)
+                self._stop.wait(IDLE_POLL_INTERVAL)
+                continue
+
+            if job is None:
+                self.job_queue.wait(IDLE_POLL_INTERVAL)
+                continue
+
+            self._process(*job)
+
+    def _process(self, job_id, payload, attempts, idempotency_key=None):
+        """Run one job and record its outcome."""
+        try:
+            result = self.handler(payload, idempotency_key)
+        except Exception as e:
+            logging.error("Error processing job %s: %s", job_id, e)
+            self.job_queue.fail(job_id, attempts, str(e))
+            return
+
+        if result and result.get("circuit_open"):
+            self.job_queue.defer(job_id, result.get("retry_after", 0), result.get("reason", "circuit open"))
+            return
+
+        if result and result.get("status") == "error":
+            self.job_queue.fail(job_id, attempts, result.get("reason", "unknown error"))
+            return
+
+        self.job_queue.complete(job_id)
@@ -0,0 +1,211 @@
+"""
+Process-wide application context.
+
+Holds the parsed configuration, environment settings and warm API clients so
+the webhook hot path does not re-read .env, re-parse config.json or rebuild
+clients on every request. The config file is re-read only when its mtime
+changes.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from src.api.gohighlevel_client import GoHighLevelClient
+from src.api.intakeq_client import IntakeQClient
+from src.api.oauth import create_token_manager
+from src.api.rate_limiter import create_rate_limiter
+from src.jobs.form_queue import create_form_queue
+from src.utils.change_detector import create_change_detector
+from src.utils.client_id_cache import create_client_id_cache
+from src.utils.client_index import create_client_index
+from src.utils.contact_cache import create_contact_cache
+from src.utils.idempotency_store import create_idempotency_store
+from src.utils.mapping_engine import DEFAULT_MAPPINGS_PATH, MappingLoader
+from src.utils.single_flight import SingleFlight
+
+DEFAULT_CONFIG_PATH = "config/config.json"
+
+# How often (seconds) the config file's mtime is checked for hot reload
+CONFIG_CHECK_INTERVAL = 1.0
+
+
+def load_settings():
+    """
+    Load environment settings once.
+
+    Returns:
+        dict: Settings read from the environment / .env file
+    """
+    load_dotenv()
+    return {
+        "intakeq_api_key": os.getenv("INTAKEQ_API_KEY"),
+        "intakeq_base_url": os.getenv("INTAKEQ_BASE_URL") or None,
+        "ghl_base_url": os.getenv("GHL_BASE_URL") or None,
+        "log_level": os.getenv("LOG_LEVEL", "INFO")
+    }
+
+
+class AppContext:
+    """Parsed config, settings and API clients shared by every request."""
+
+    def __init__(self, config_path=DEFAULT_CONFIG_PATH, settings=None):
+        """
+        Initialize the application context.
+
+        Args:
+            config_path (str): Path to config.json
+            settings (dict): Pre-loaded settings (defaults to load_settings())
+        """
+        self.config_path = config_path
+        self.settings = settings if settings is not None else load_settings()
+        self._lock = threading.Lock()
+        self._config = None
+        self._config_mtime = None
+        self._next_check = 0.0
+        self._intakeq_client = None
+        self._gohighlevel_client = None
+        self._load_config()
+        # Survive config reloads so cached IDs and digests are not thrown away
+        self.client_id_cache = create_client_id_cache(self._config.get("client_id_cache"))
+        self.client_index = create_client_index(self._config.get("client_index"))
+        self.change_detector = create_change_detector(self._config.get("change_detection"))
+        self.idempotency_store = create_idempotency_store(self._config.get("idempotency"))
+        self.form_queue = create_form_queue(self._config.get("glp1_forms"))
+        self.contact_cache = create_contact_cache(self._config.get("contact_enrichment", {}).get("cache"))
+        self.single_flight = SingleFlight()
+        self.rate_limiter = create_rate_limiter(self._config.get("rate_limits"))
+        self.ghl_token_manager = create_token_manager(
+            self._config.get("ghl_oauth"), self.settings.get("ghl_base_url"), self._config.get("http")
+        )
+        mappings_config = self._config.get("mappings", {})
+        self.mapping_loader = MappingLoader(
+            mappings_config.get("path", DEFAULT_MAPPINGS_PATH),
+            cache_path=mappings_config.get("cache_path")
+        )
+
+    def _load_config(self):
+        """Read and parse the config file, dropping clients built from the old config."""
+        mtime = os.stat(self.config_path).st_mtime
+        with open(self.config_path, "r") as f:
+            config = json.load(f)
+
+        self._config = config
+        self._config_mtime = mtime
+        self._intakeq_client = None
+        self._gohighlevel_client = None
+        logging.info("Loaded configuration from %s", self.config_path)
+
+    @property
+    def config(self):
+        """The parsed config, reloaded if the file changed on disk."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._config
+
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + CONFIG_CHECK_INTERVAL
+                try:
+                    if os.stat(self.config_path).st_mtime != self._config_mtime:
+                        self._load_config()
+                except (OSError, ValueError) as e:
+                    # Keep serving the last good config if the new one is unreadable
+                    logging.error("Failed to reload configuration: %s", e)
+        return self._config
+
+    @property
+    def mapping_plan(self):
+        """The compiled field mappings, reloaded if the mapping file changed on disk."""
+        return self.mapping_loader.plan
+
+    def get_intakeq_client(self):
+        """
+        Get the shared IntakeQ client.
+
+        Returns:
+            IntakeQClient: The client, or None if no API key is configured
+        """
+        config = self.config
+        client = self._intakeq_client
+        if client is not None:
+            return client
+
+        api_key = self.settings.get("intakeq_api_key")
+        if not api_key:
+            return None
+
+        with self._lock:
+            if self._intakeq_client is None:
+                self._intakeq_client = IntakeQClient(
+                    api_key=api_key,
+                    base_url=self.settings.get("intakeq_base_url"),
+                    http_config=config.get("http"),
+                    client_id_cache=self.client_id_cache,
+                    retry_config=config.get("retry"),
+                    rate_limiter=self.rate_limiter,
+                    breaker_config=config.get("circuit_breaker"),
+                    client_index=self.client_index
+                )
+            return self._intakeq_client
+
+    def get_gohighlevel_client(self):
+        """
+        Get the shared GoHighLevel client.
+
+        Returns:
+            GoHighLevelClient: The client, authorized by the OAuth token manager if configured
+        """
+        config = self.config
+        client = self._gohighlevel_client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self._gohighlevel_client is None:
+                self._gohighlevel_client = GoHighLevelClient(
+                    base_url=self.settings.get("ghl_base_url"),
+                    http_config=config.get("http"),
+                    retry_config=config.get("retry"),
+                    rate_limiter=self.rate_limiter,
+                    breaker_config=config.get("circuit_breaker"),
+                    token_manager=self.ghl_token_manager,
+                    contact_cache=self.contact_cache
+                )
+            return self._gohighlevel_client
+
+
+_context = None
+_context_lock = threading.RLock()
+
+
+def init_app_context(config_path=None):
+    """
+    Create the process-wide context. Called once from create_app.
+
+    Args:
+        config_path (str): Path to config.json (defaults to CONFIG_PATH or config/config.json)
+
+    Returns:
+        AppContext: The new context
+    """
+    global _context
+    with _context_lock:
+        _context = AppContext(config_path or os.getenv("CONFIG_PATH") or DEFAULT_CONFIG_PATH)
+    return _context
+
+
+def get_app_context():
+    """
+    Get the process-wide context, creating it on first use.
+
+    Returns:
+        AppContext: The shared context
+    """
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                init_app_context()
+    return _context
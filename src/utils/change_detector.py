@@ -0,0 +1,227 @@
+"""
+Change detection for contact syncs.
+
+GoHighLevel re-fires ``contact.tag.added`` for contacts that have not changed.
+The detector remembers a stable digest of the last payload successfully sent
+to IntakeQ for each GoHighLevel contact, so identical re-deliveries can skip
+the upstream write entirely. The GLP-1 form answers are submitted separately
+by the form queue, so their digest is kept apart and only recorded once the
+form was submitted; a re-delivery whose form never made it queues it again.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+# Form digests share the store with client digests under prefixed keys
+FORM_KEY_PREFIX = "form:"
+
+# Digests recorded between prunes of expired SQLite rows
+PRUNE_EVERY = 1000
+
+
+def compute_digest(client_data):
+    """
+    Compute a stable digest of a mapped IntakeQ payload.
+
+    Keys are sorted so the digest does not depend on dict ordering.
+
+    Args:
+        client_data (dict): A mapped IntakeQ client or GLP-1 form payload
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    canonical = json.dumps(client_data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ChangeDetector:
+    """Base class for digest stores; backends implement _get/_set."""
+
+    def __init__(self, ttl):
+        """
+        Initialize the counters.
+
+        Args:
+            ttl (float): Seconds a digest is trusted before a full sync is forced again
+        """
+        self.ttl = ttl
+        self.unchanged = 0
+        self.changed = 0
+
+    def check(self, contact_id, digest):
+        """
+        Check whether a contact's payload matches the last synced one.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+            digest (str): Digest of the payload about to be sent
+
+        Returns:
+            int: The IntakeQ ClientId recorded with the matching digest, or
+            None if the payload changed (or was never synced)
+        """
+        entry = self._get(contact_id) if contact_id else None
+        if entry is not None and entry[0] == digest:
+            self.unchanged += 1
+            return entry[1]
+        self.changed += 1
+        return None
+
+    def record(self, contact_id, digest, client_id):
+        """
+        Remember the digest of a payload that was synced successfully.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+            digest (str): Digest of the payload sent
+            client_id (int): IntakeQ ClientId it was written to
+        """
+        if contact_id and client_id:
+            self._set(contact_id, digest, client_id)
+
+    def check_form(self, contact_id, digest, client_id):
+        """
+        Check whether a contact's GLP-1 form answers were already submitted.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+            digest (str): Digest of the form answers
+            client_id (int): IntakeQ ClientId the form belongs to
+
+        Returns:
+            bool: True if these answers were submitted for this client
+        """
+        entry = self._get(FORM_KEY_PREFIX + contact_id) if contact_id else None
+        return entry is not None and entry[0] == digest and str(entry[1]) == str(client_id)
+
+    def record_form(self, contact_id, digest, client_id):
+        """
+        Remember the digest of GLP-1 form answers that were submitted successfully.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+            digest (str): Digest of the form answers
+            client_id (int): IntakeQ ClientId they were submitted for
+        """
+        if contact_id and client_id:
+            self._set(FORM_KEY_PREFIX + contact_id, digest, client_id)
+
+    def stats(self):
+        """
+        Counters for skipped and performed writes.
+
+        Returns:
+            dict: Unchanged (skipped) and changed counts
+        """
+        return {"unchanged": self.unchanged, "changed": self.changed}
+
+    def _get(self, contact_id):
+        raise NotImplementedError
+
+    def _set(self, contact_id, digest, client_id):
+        raise NotImplementedError
+
+
+class InMemoryChangeDetector(ChangeDetector):
+    """Process-local digest store with TTL and LRU eviction."""
+
+    def __init__(self, ttl=86400.0, max_entries=50000):
+        """
+        Initialize the store.
+
+        Args:
+            ttl (float): Seconds a digest is trusted
+            max_entries (int): Entries kept before the least recently used is evicted
+        """
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, contact_id):
+        with self._lock:
+            entry = self._entries.get(contact_id)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[contact_id]
+                return None
+            self._entries.move_to_end(contact_id)
+            return entry
+
+    def _set(self, contact_id, digest, client_id):
+        with self._lock:
+            self._entries[contact_id] = (digest, client_id, time.monotonic() + self.ttl)
+            self._entries.move_to_end(contact_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteChangeDetector(ChangeDetector):
+    """Digest store in a SQLite file shared by all worker processes.
+
+    Rows past the TTL are never read again; every PRUNE_EVERY writes they are deleted.
+    """
+
+    def __init__(self, path, ttl=86400.0):
+        """
+        Initialize the store, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            ttl (float): Seconds a digest is trusted
+        """
+        super().__init__(ttl)
+        self.path = path
+        self._db = ThreadLocalSQLite(path)
+        conn = self._db.connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS contact_digests ("
+            "contact_id TEXT PRIMARY KEY, digest TEXT NOT NULL, client_id INTEGER NOT NULL, synced_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS contact_digests_synced_at ON contact_digests (synced_at)")
+        self._writes = 0
+
+    def _get(self, contact_id):
+        return self._db.connection().execute(
+            "SELECT digest, client_id FROM contact_digests WHERE contact_id = ? AND synced_at > ?",
+            (contact_id, time.time() - self.ttl)
+        ).fetchone()
+
+    def _set(self, contact_id, digest, client_id):
+        now = time.time()
+        conn = self._db.connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO contact_digests (contact_id, digest, client_id, synced_at) VALUES (?, ?, ?, ?)",
+            (contact_id, digest, client_id, now)
+        )
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM contact_digests WHERE synced_at <= ?", (now - self.ttl,))
+
+
+def create_change_detector(detection_config):
+    """
+    Build the detector described by the "change_detection" block of config.json.
+
+    Args:
+        detection_config (dict): Settings (enabled, backend, ttl, max_entries, path)
+
+    Returns:
+        ChangeDetector: The detector, or None if disabled
+    """
+    if not detection_config or not detection_config.get("enabled", True):
+        return None
+
+    ttl = detection_config.get("ttl", 86400)
+    if detection_config.get("backend", "memory") == "sqlite":
+        path = detection_config.get("path", "data/contact_digests.sqlite3")
+        logging.info("Using SQLite change detection store at %s", path)
+        return SQLiteChangeDetector(path, ttl=ttl)
+    return InMemoryChangeDetector(ttl=ttl, max_entries=detection_config.get("max_entries", 50000))
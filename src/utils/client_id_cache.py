@@ -0,0 +1,236 @@
+"""
+Cache of normalized email -> IntakeQ ClientId.
+
+Lets IntakeQClient.create_client skip the ``/clients/search`` round-trip for
+contacts it has already seen. The in-memory backend is a TTL+LRU map private
+to one process; the SQLite backend is shared by every worker process pointing
+at the same file.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+
+def normalize_email(email):
+    """
+    Normalize an email address for use as a cache key.
+
+    Args:
+        email (str): Email address
+
+    Returns:
+        str: Lower-cased, stripped email ("" if missing)
+    """
+    return (email or "").strip().lower()
+
+
+class ClientIdCache:
+    """Base class tracking hit/miss counters; backends implement _get/_set/_delete."""
+
+    def __init__(self, ttl):
+        """
+        Initialize the counters.
+
+        Args:
+            ttl (float): Seconds an entry stays valid
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email):
+        """
+        Look up the ClientId for an email.
+
+        Args:
+            email (str): Email address
+
+        Returns:
+            int: The cached ClientId, or None on a miss
+        """
+        key = normalize_email(email)
+        client_id = self._get(key) if key else None
+        if client_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return client_id
+
+    def set(self, email, client_id):
+        """
+        Remember the ClientId for an email.
+
+        Args:
+            email (str): Email address
+            client_id (int): IntakeQ ClientId
+        """
+        key = normalize_email(email)
+        if key and client_id:
+            self._set(key, client_id)
+
+    def invalidate(self, email):
+        """
+        Forget an email (e.g. after the cached client returned 404).
+
+        Args:
+            email (str): Email address
+        """
+        key = normalize_email(email)
+        if key:
+            self._delete(key)
+
+    def stats(self):
+        """
+        Hit/miss counters.
+
+        Returns:
+            dict: Hits, misses, hit ratio and entry count
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": self._size()
+        }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, client_id):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def _size(self):
+        raise NotImplementedError
+
+
+class InMemoryClientIdCache(ClientIdCache):
+    """Process-local TTL+LRU cache."""
+
+    def __init__(self, ttl=3600.0, max_entries=10000):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl (float): Seconds an entry stays valid
+            max_entries (int): Entries kept before the least recently used is evicted
+        """
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            client_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return client_id
+
+    def _set(self, key, client_id):
+        with self._lock:
+            self._entries[key] = (client_id, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _size(self):
+        return len(self._entries)
+
+
+class SQLiteClientIdCache(ClientIdCache):
+    """TTL cache in a SQLite file shared by all worker processes."""
+
+    # Expired/overflow entries are pruned once every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl=3600.0, max_entries=100000):
+        """
+        Initialize the cache, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            ttl (float): Seconds an entry stays valid
+            max_entries (int): Entries kept before the oldest are pruned
+        """
+        super().__init__(ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self._db = ThreadLocalSQLite(path)
+        self._writes = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS client_ids ("
+            "email TEXT PRIMARY KEY, client_id INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        """Get this thread's connection."""
+        return self._db.connection()
+
+    def _get(self, key):
+        row = self._connection().execute(
+            "SELECT client_id FROM client_ids WHERE email = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, client_id):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO client_ids (email, client_id, expires_at) VALUES (?, ?, ?)",
+            (key, client_id, time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        """Drop expired entries and, past max_entries, those closest to expiry."""
+        conn.execute("DELETE FROM client_ids WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM client_ids WHERE email IN ("
+            "SELECT email FROM client_ids ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def _delete(self, key):
+        self._connection().execute("DELETE FROM client_ids WHERE email = ?", (key,))
+
+    def _size(self):
+        return self._connection().execute("SELECT COUNT(*) FROM client_ids").fetchone()[0]
+
+
+def create_client_id_cache(cache_config):
+    """
+    Build the cache described by the "client_id_cache" block of config.json.
+
+    Args:
+        cache_config (dict): Cache settings (enabled, backend, ttl, max_entries, path)
+
+    Returns:
+        ClientIdCache: The cache, or None if disabled
+    """
+    if not cache_config or not cache_config.get("enabled", True):
+        return None
+
+    ttl = cache_config.get("ttl", 3600)
+    backend = cache_config.get("backend", "memory")
+    if backend == "sqlite":
+        path = cache_config.get("path", "data/client_ids.sqlite3")
+        logging.info("Using SQLite ClientId cache at %s", path)
+        return SQLiteClientIdCache(path, ttl=ttl, max_entries=cache_config.get("max_entries", 100000))
+    return InMemoryClientIdCache(ttl=ttl, max_entries=cache_config.get("max_entries", 10000))
@@ -0,0 +1,358 @@
+"""
+Local mirror index of IntakeQ clients.
+
+A SQLite table of every IntakeQ client's identifying fields, indexed on
+normalized email, phone and name+date of birth. It is built by a full scan of
+IntakeQ's client list and kept fresh from the integration's own writes, so
+create_client can match a contact to an existing client without a remote
+search, and reconciliation can diff GoHighLevel against IntakeQ without
+per-record API calls.
+
+Matching prefers email. Without an email match, a unique name+DOB match is
+accepted, and then a unique phone match whose last name agrees; ambiguous
+phone or name+DOB matches are treated as misses. Those fuzzy matches are for
+reconciliation only: create_client updates a client only on an exact email
+match (match_email).
+"""
+
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from src.utils.client_id_cache import normalize_email
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+_NON_DIGITS = re.compile(r"\D+")
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%Y/%m/%d")
+
+
+def normalize_phone(phone):
+    """
+    Normalize a phone number for matching.
+
+    Args:
+        phone (str): Phone number in any format
+
+    Returns:
+        str: The last 10 digits ("" if fewer than 7 digits)
+    """
+    digits = _NON_DIGITS.sub("", str(phone or ""))
+    return digits[-10:] if len(digits) >= 7 else ""
+
+
+def normalize_dob(dob):
+    """
+    Normalize a date of birth to YYYY-MM-DD.
+
+    Args:
+        dob: A date string, or a Unix timestamp in milliseconds (as IntakeQ returns it)
+
+    Returns:
+        str: The ISO date ("" if missing or unparseable)
+    """
+    if dob is None or dob == "":
+        return ""
+    if isinstance(dob, (int, float)):
+        return datetime.fromtimestamp(dob / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+    text = str(dob).strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text[:10], date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return ""
+
+
+def name_dob_key(first_name, last_name, dob):
+    """
+    Build the name+DOB match key.
+
+    Args:
+        first_name (str): First name
+        last_name (str): Last name
+        dob: Date of birth (see normalize_dob)
+
+    Returns:
+        str: The key ("" unless both names and the DOB are present)
+    """
+    first = (first_name or "").strip().lower()
+    last = (last_name or "").strip().lower()
+    date = normalize_dob(dob)
+    if not (first and last and date):
+        return ""
+    return f"{first}|{last}|{date}"
+
+
+def _split_name(client):
+    """First and last name of an IntakeQ client, falling back to splitting Name."""
+    first = client.get("FirstName")
+    last = client.get("LastName")
+    if not (first or last) and client.get("Name"):
+        first, _, last = client["Name"].strip().partition(" ")
+    return (first or "").strip(), (last or "").strip()
+
+
+class ClientIndex:
+    """SQLite mirror of IntakeQ clients' identifying fields."""
+
+    def __init__(self, path):
+        """
+        Initialize the index, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self._db = ThreadLocalSQLite(path)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS clients ("
+            "client_id INTEGER PRIMARY KEY, email TEXT, phone TEXT, name_dob TEXT, "
+            "first_name TEXT, last_name TEXT, dob TEXT, generation INTEGER NOT NULL DEFAULT 0, "
+            "updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS clients_email ON clients (email)")
+        conn.execute("CREATE INDEX IF NOT EXISTS clients_phone ON clients (phone)")
+        conn.execute("CREATE INDEX IF NOT EXISTS clients_name_dob ON clients (name_dob)")
+        conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connection(self):
+        """Get this thread's connection."""
+        return self._db.connection()
+
+    def _row(self, client, generation=0):
+        """Index row for an IntakeQ client dict, or None without a ClientId."""
+        client_id = client.get("ClientId")
+        if not client_id:
+            return None
+        first, last = _split_name(client)
+        dob = client.get("DateOfBirth")
+        return (
+            int(client_id),
+            normalize_email(client.get("Email")) or None,
+            normalize_phone(client.get("Phone") or client.get("MobilePhone")) or None,
+            name_dob_key(first, last, dob) or None,
+            first.lower(),
+            last.lower(),
+            normalize_dob(dob),
+            generation,
+            time.time()
+        )
+
+    def upsert(self, client):
+        """
+        Add or refresh one client (e.g. after our own POST/PATCH).
+
+        Args:
+            client (dict): IntakeQ client fields, including ClientId
+        """
+        row = self._row(client)
+        if row is None:
+            return
+        self._connection().execute(
+            "INSERT OR REPLACE INTO clients "
+            "(client_id, email, phone, name_dob, first_name, last_name, dob, generation, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, "
+            "COALESCE((SELECT generation FROM clients WHERE client_id = ?), 0), ?)",
+            row[:7] + (row[0], row[8])
+        )
+
+    def remove(self, client_id):
+        """
+        Drop a client (e.g. after it returned 404).
+
+        Args:
+            client_id (int): IntakeQ ClientId
+        """
+        self._connection().execute("DELETE FROM clients WHERE client_id = ?", (client_id,))
+
+    def _unique(self, column, value):
+        """Client IDs with column == value, at most two (enough to detect ambiguity)."""
+        rows = self._connection().execute(
+            f"SELECT client_id, last_name FROM clients WHERE {column} = ? LIMIT 2", (value,)
+        ).fetchall()
+        return rows
+
+    def match(self, email=None, phone=None, first_name=None, last_name=None, dob=None):
+        """
+        Find the IntakeQ client for a contact.
+
+        Args:
+            email (str): Email address
+            phone (str): Phone number
+            first_name (str): First name
+            last_name (str): Last name
+            dob: Date of birth
+
+        Returns:
+            int: The matching ClientId, or None if there is no unambiguous match
+        """
+        client_id = self._match(email, phone, first_name, last_name, dob)
+        with self._lock:
+            if client_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return client_id
+
+    def _match(self, email, phone, first_name, last_name, dob):
+        key = normalize_email(email)
+        if key:
+            rows = self._unique("email", key)
+            if rows:
+                return rows[0][0]
+        key = name_dob_key(first_name, last_name, dob)
+        if key:
+            rows = self._unique("name_dob", key)
+            if len(rows) == 1:
+                return rows[0][0]
+        key = normalize_phone(phone)
+        if key:
+            rows = self._unique("phone", key)
+            if len(rows) == 1 and rows[0][1] == (last_name or "").strip().lower():
+                return rows[0][0]
+        return None
+
+    def match_email(self, email):
+        """
+        Find the IntakeQ client with exactly this email.
+
+        This is the only match create_client acts on: phone and name+DOB
+        matches can belong to another person (e.g. a shared household phone),
+        so they are used for reconciliation reports, never for writes.
+
+        Args:
+            email (str): Email address
+
+        Returns:
+            int: The matching ClientId, or None
+        """
+        key = normalize_email(email)
+        rows = self._unique("email", key) if key else []
+        with self._lock:
+            if rows:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return rows[0][0] if rows else None
+
+    def rebuild(self, clients):
+        """
+        Replace the index contents with a full scan of IntakeQ.
+
+        Clients written by us during the scan are kept; only clients that
+        were in the index before the scan and not seen by it are dropped.
+
+        Args:
+            clients: Iterable of IntakeQ client dicts (e.g. IntakeQClient.iter_clients())
+
+        Returns:
+            int: Number of clients indexed by the scan
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+        generation = int(row[0]) + 1 if row else 1
+        started = time.time()
+        count = 0
+        batch = []
+        for client in clients:
+            indexed = self._row(client, generation)
+            if indexed is None:
+                continue
+            batch.append(indexed)
+            if len(batch) >= 500:
+                count += self._write_batch(conn, batch)
+                batch = []
+        count += self._write_batch(conn, batch)
+        conn.execute(
+            "DELETE FROM clients WHERE generation < ? AND updated_at < ?", (generation, started)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('generation', ?)", (str(generation),)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('built_at', ?)", (str(time.time()),)
+        )
+        logging.info("Rebuilt IntakeQ client index with %d clients", count)
+        return count
+
+    def _write_batch(self, conn, batch):
+        if not batch:
+            return 0
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO clients "
+            "(client_id, email, phone, name_dob, first_name, last_name, dob, generation, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+        conn.execute("COMMIT")
+        return len(batch)
+
+    def iter_rows(self):
+        """
+        Iterate every indexed client.
+
+        Yields:
+            tuple: (client_id, email, phone, first_name, last_name, dob)
+        """
+        cursor = self._connection().execute(
+            "SELECT client_id, email, phone, first_name, last_name, dob FROM clients ORDER BY client_id"
+        )
+        yield from cursor
+
+    def get(self, client_id):
+        """
+        Look up one indexed client.
+
+        Args:
+            client_id (int): IntakeQ ClientId
+
+        Returns:
+            dict: email, phone, first_name, last_name and dob, or None if not indexed
+        """
+        row = self._connection().execute(
+            "SELECT email, phone, first_name, last_name, dob FROM clients WHERE client_id = ?", (client_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("email", "phone", "first_name", "last_name", "dob"), row))
+
+    def stats(self):
+        """
+        Hit/miss counters and size.
+
+        Returns:
+            dict: Hits, misses, hit ratio, entry count and when the last full scan finished
+        """
+        conn = self._connection()
+        built_at = conn.execute("SELECT value FROM index_meta WHERE key = 'built_at'").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0],
+            "built_at": float(built_at[0]) if built_at else None
+        }
+
+
+def create_client_index(index_config):
+    """
+    Build the index described by the "client_index" block of config.json.
+
+    Args:
+        index_config (dict): Index settings (enabled, path)
+
+    Returns:
+        ClientIndex: The index, or None if disabled
+    """
+    if not index_config or not index_config.get("enabled", True):
+        return None
+    path = index_config.get("path", "data/client_index.sqlite3")
+    logging.info("Using IntakeQ client index at %s", path)
+    return ClientIndex(path)
@@ -0,0 +1,317 @@
+"""
+Read-through cache of GoHighLevel contacts for GoHighLevelClient.get_contact.
+
+A contact is fetched for enrichment on each of its tag, form and update
+events, so contacts are cached for ``ttl`` seconds. An expired entry is not
+simply dropped: it is revalidated with the ETag/Last-Modified it was served
+with, and a 304 extends it without transferring the contact again. Contacts
+that do not exist (404) are cached for ``negative_ttl`` seconds so repeated
+deliveries for a deleted contact do not each cost a round-trip.
+Contact-update webhooks invalidate the entry explicitly.
+
+Concurrent misses for one contact share one fetch. A fetch that was in
+flight when its contact was invalidated is returned to its callers but not
+cached. Contacts hold PHI, so entries are kept in process memory only and
+never written to disk.
+
+Each gunicorn worker has its own cache, so an invalidation in one worker
+would not reach the others. With an invalidation log, invalidations are also
+recorded in a SQLite file shared by the workers (contact IDs and times only),
+and a cached contact fetched before its latest invalidation is treated as a
+miss in every worker.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from src.utils.single_flight import SingleFlight
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+NOT_FOUND = {"error": "Resource not found", "status_code": 404}
+
+
+# Marks recorded between prunes of the invalidation log
+PRUNE_EVERY = 1000
+
+
+class _Entry:
+    """A cached contact, or a cached 404 when contact is None."""
+
+    __slots__ = ("contact", "etag", "last_modified", "expires_at", "fetched_at")
+
+    def __init__(self, contact, etag, last_modified, expires_at, fetched_at):
+        self.contact = contact
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        # Wall-clock time the fetch started, compared with shared invalidations
+        self.fetched_at = fetched_at
+
+
+class SQLiteInvalidationLog:
+    """Contact invalidation times in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path, retention):
+        """
+        Initialize the log, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            retention (float): Seconds an invalidation is kept (no cached entry outlives it)
+        """
+        self.path = path
+        self.retention = retention
+        self._db = ThreadLocalSQLite(path)
+        self._db.connection().execute(
+            "CREATE TABLE IF NOT EXISTS contact_invalidations ("
+            "contact_id TEXT PRIMARY KEY, invalidated_at REAL NOT NULL)"
+        )
+        self._marks = 0
+
+    def mark(self, contact_id):
+        """
+        Record that a contact changed.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+        """
+        now = time.time()
+        conn = self._db.connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO contact_invalidations (contact_id, invalidated_at) VALUES (?, ?)",
+            (contact_id, now)
+        )
+        self._marks += 1
+        if self._marks % PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM contact_invalidations WHERE invalidated_at < ?", (now - self.retention,))
+
+    def invalidated_at(self, contact_id):
+        """
+        When a contact was last invalidated by any worker.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+
+        Returns:
+            float: Unix timestamp, or None if not recently invalidated
+        """
+        row = self._db.connection().execute(
+            "SELECT invalidated_at FROM contact_invalidations WHERE contact_id = ?", (contact_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+
+class ContactCache:
+    """Process-local TTL+LRU contact cache with conditional revalidation."""
+
+    def __init__(self, ttl=300.0, negative_ttl=60.0, max_entries=10000, invalidation_log=None):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl (float): Seconds a fetched contact is served without revalidation
+            negative_ttl (float): Seconds a 404 is remembered
+            max_entries (int): Entries kept before the least recently used is evicted
+            invalidation_log (SQLiteInvalidationLog): Optional log sharing invalidations between workers
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.invalidation_log = invalidation_log
+        self.single_flight = SingleFlight()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Invalidation bookkeeping: fetches started at or before a contact's
+        # invalidation (or before _floor) must not be cached
+        self._generation = 0
+        self._floor = 0
+        self._invalidated = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.invalidations = 0
+        self.shared_invalidations = 0
+        self.evictions = 0
+
+    def get(self, contact_id, fetch):
+        """
+        Look up a contact, fetching it on a miss.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+            fetch (callable): ``fetch(headers)`` performs the GET with the given
+                conditional request headers and returns ``(result, meta)``: the
+                client's result dict and a dict with status_code, etag and
+                last_modified
+
+        Returns:
+            dict: The contact, or a dict with "error" and "status_code" (a 404
+            may come from the cache)
+        """
+        with self._lock:
+            entry = self._fresh(contact_id)
+        if entry is not None and self._invalidated_elsewhere(contact_id, entry):
+            entry = None
+        if entry is not None:
+            with self._lock:
+                if entry.contact is None:
+                    self.negative_hits += 1
+                    return dict(NOT_FOUND)
+                self.hits += 1
+                return entry.contact
+        return self.single_flight.do(contact_id, lambda: self._load(contact_id, fetch))
+
+    def _invalidated_elsewhere(self, contact_id, entry):
+        """Drop an entry if any worker invalidated its contact after it was fetched; returns True if dropped."""
+        if self.invalidation_log is None:
+            return False
+        invalidated_at = self.invalidation_log.invalidated_at(contact_id)
+        if invalidated_at is None or invalidated_at < entry.fetched_at:
+            return False
+        with self._lock:
+            if self._entries.get(contact_id) is entry:
+                # Not kept for revalidation either: the contact is known to have changed
+                del self._entries[contact_id]
+            self.shared_invalidations += 1
+        return True
+
+    def _fresh(self, contact_id):
+        """The unexpired entry for a contact (call with the lock held)."""
+        entry = self._entries.get(contact_id)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        self._entries.move_to_end(contact_id)
+        return entry
+
+    def _load(self, contact_id, fetch):
+        """Fetch or revalidate one contact (run once per contact among concurrent callers)."""
+        with self._lock:
+            entry = self._fresh(contact_id)
+            if entry is not None:
+                # Loaded by a caller that finished just before this one started
+                self.hits += 1
+                return entry.contact if entry.contact is not None else dict(NOT_FOUND)
+            stale = self._entries.get(contact_id)
+            started = self._generation
+            self.misses += 1
+        fetched_at = time.time()
+
+        headers = {}
+        if stale is not None and stale.contact is not None:
+            if stale.etag:
+                headers["If-None-Match"] = stale.etag
+            if stale.last_modified:
+                headers["If-Modified-Since"] = stale.last_modified
+        result, meta = fetch(headers)
+        status_code = meta.get("status_code")
+
+        if status_code == 304 and headers:
+            with self._lock:
+                self.revalidated += 1
+                if self._cacheable(contact_id, started):
+                    stale.expires_at = time.monotonic() + self.ttl
+                    stale.fetched_at = fetched_at
+            return stale.contact
+
+        if status_code == 404:
+            self._store(
+                contact_id, _Entry(None, None, None, time.monotonic() + self.negative_ttl, fetched_at), started
+            )
+            return result
+
+        if not result or "error" in result or not 200 <= (status_code or 0) < 300:
+            # Failures are never cached; an expired entry stays for later revalidation
+            return result or {"error": "Empty response", "status_code": status_code}
+
+        contact = result.get("contact", result)
+        self._store(
+            contact_id,
+            _Entry(contact, meta.get("etag"), meta.get("last_modified"), time.monotonic() + self.ttl, fetched_at),
+            started
+        )
+        return contact
+
+    def _cacheable(self, contact_id, started):
+        """Whether a fetch started at generation ``started`` may still be cached (call with the lock held)."""
+        return started >= self._floor and self._invalidated.get(contact_id, -1) < started
+
+    def _store(self, contact_id, entry, started):
+        with self._lock:
+            if not self._cacheable(contact_id, started):
+                return
+            self._entries[contact_id] = entry
+            self._entries.move_to_end(contact_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, contact_id):
+        """
+        Forget a contact (e.g. on a contact-update webhook), in every worker if an invalidation log is set.
+
+        Args:
+            contact_id (str): GoHighLevel contact ID
+        """
+        if self.invalidation_log is not None:
+            self.invalidation_log.mark(contact_id)
+        with self._lock:
+            self._entries.pop(contact_id, None)
+            self._invalidated[contact_id] = self._generation
+            self._generation += 1
+            self.invalidations += 1
+            if len(self._invalidated) > self.max_entries:
+                # Bound the bookkeeping: no fetch started before now is cached
+                self._invalidated.clear()
+                self._floor = self._generation
+
+    def stats(self):
+        """
+        Cache counters.
+
+        Returns:
+            dict: Hits (positive and 404), misses, hit ratio, revalidations,
+            invalidations (local and seen from other workers), evictions and entry count
+        """
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 3) if lookups else 0.0,
+            "revalidated": self.revalidated,
+            "invalidations": self.invalidations,
+            "shared_invalidations": self.shared_invalidations,
+            "evictions": self.evictions,
+            "entries": len(self._entries)
+        }
+
+
+def create_contact_cache(cache_config):
+    """
+    Build the cache described by the "cache" block of "contact_enrichment" in config.json.
+
+    Args:
+        cache_config (dict): Cache settings (enabled, ttl, negative_ttl, max_entries, invalidation_path)
+
+    Returns:
+        ContactCache: The cache, or None if disabled
+    """
+    if not cache_config or not cache_config.get("enabled", True):
+        return None
+    ttl = cache_config.get("ttl", 300)
+    negative_ttl = cache_config.get("negative_ttl", 60)
+    invalidation_log = None
+    path = cache_config.get("invalidation_path")
+    if path:
+        logging.info("Using in-memory GoHighLevel contact cache with shared invalidations at %s", path)
+        invalidation_log = SQLiteInvalidationLog(path, retention=max(ttl, negative_ttl))
+    else:
+        logging.info("Using in-memory GoHighLevel contact cache (invalidations stay in this process)")
+    return ContactCache(
+        ttl=ttl,
+        negative_ttl=negative_ttl,
+        max_entries=cache_config.get("max_entries", 10000),
+        invalidation_log=invalidation_log
+    )
@@ -0,0 +1,193 @@
+"""
+Idempotency store for webhook deliveries.
+
+Remembers the result of each processed delivery for a configurable window so
+that replays (GoHighLevel retries, duplicate sends) return the original
+result instead of being processed again.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from src.utils import json_codec
+from src.utils.sqlite_store import ThreadLocalSQLite
+
+
+def derive_idempotency_key(data, header_key=None):
+    """
+    Derive the idempotency key for a webhook delivery.
+
+    An explicit key (request header) wins, then GoHighLevel's webhookId, then
+    a digest of the payload itself.
+
+    Args:
+        data: The webhook payload (normally a dict)
+        header_key (str): Value of the X-Idempotency-Key header, if any
+
+    Returns:
+        str: The idempotency key
+    """
+    if header_key:
+        return f"header:{header_key}"
+    # Any JSON value can arrive; only objects carry a webhookId
+    webhook_id = data.get("webhookId") if isinstance(data, dict) else None
+    if webhook_id:
+        return f"webhook:{webhook_id}"
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return "payload:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Base class for idempotency stores; backends implement _get/_set."""
+
+    def __init__(self, window):
+        """
+        Initialize the counters.
+
+        Args:
+            window (float): Seconds a processed delivery is remembered
+        """
+        self.window = window
+        self.replays = 0
+
+    def get(self, key):
+        """
+        Look up the result of an earlier delivery.
+
+        Args:
+            key (str): Idempotency key
+
+        Returns:
+            dict: The stored result, or None if the key was not seen within the window
+        """
+        result = self._get(key)
+        if result is not None:
+            self.replays += 1
+        return result
+
+    def set(self, key, result):
+        """
+        Remember the result of a processed delivery.
+
+        Args:
+            key (str): Idempotency key
+            result (dict): The process_webhook result
+        """
+        self._set(key, result)
+
+    def stats(self):
+        """
+        Replay counter.
+
+        Returns:
+            dict: Number of replays dropped
+        """
+        return {"replays_dropped": self.replays}
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, result):
+        raise NotImplementedError
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Process-local store; expired keys are swept as new ones are added."""
+
+    def __init__(self, window=300.0, max_entries=50000):
+        """
+        Initialize the store.
+
+        Args:
+            window (float): Seconds a processed delivery is remembered
+            max_entries (int): Keys kept before the oldest are dropped
+        """
+        super().__init__(window)
+        self.max_entries = max_entries
+        # An OrderedDict finds its oldest key in O(1), however many were deleted before it
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+
+    def _set(self, key, result):
+        now = time.monotonic()
+        with self._lock:
+            # Keys are kept in insertion order, so expired keys are at the front
+            entries = self._entries
+            entries.pop(key, None)
+            entries[key] = (result, now + self.window)
+            while entries:
+                old_key = next(iter(entries))
+                if entries[old_key][1] > now and len(entries) <= self.max_entries:
+                    break
+                del entries[old_key]
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """Store in a SQLite file shared by all worker processes."""
+
+    # Expired keys are pruned once every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, window=300.0):
+        """
+        Initialize the store, creating the database file if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            window (float): Seconds a processed delivery is remembered
+        """
+        super().__init__(window)
+        self.path = path
+        self._db = ThreadLocalSQLite(path)
+        self._writes = 0
+        self._db.connection().execute(
+            "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _get(self, key):
+        row = self._db.connection().execute(
+            "SELECT result FROM idempotency_keys WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json_codec.loads(row[0]) if row else None
+
+    def _set(self, key, result):
+        conn = self._db.connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO idempotency_keys (key, result, expires_at) VALUES (?, ?, ?)",
+            (key, json_codec.dumps_text(result), time.time() + self.window)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+
+
+def create_idempotency_store(idempotency_config):
+    """
+    Build the store described by the "idempotency" block of config.json.
+
+    Args:
+        idempotency_config (dict): Settings (enabled, backend, window, max_entries, path)
+
+    Returns:
+        IdempotencyStore: The store, or None if disabled
+    """
+    if not idempotency_config or not idempotency_config.get("enabled", True):
+        return None
+
+    window = idempotency_config.get("window", 300)
+    if idempotency_config.get("backend", "memory") == "sqlite":
+        path = idempotency_config.get("path", "data/idempotency.sqlite3")
+        logging.info("Using SQLite idempotency store at %s", path)
+        return SQLiteIdempotencyStore(path, window=window)
+    return InMemoryIdempotencyStore(window=window, max_entries=idempotency_config.get("max_entries", 50000))
@@ -0,0 +1,92 @@
+"""
+JSON encoding for request and response bodies.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise; set JSON_BACKEND=json to force the standard library. Both backends
+produce compact UTF-8 bytes, so a body can be encoded once and the same bytes
+sent, logged and persisted.
+
+Digests and idempotency keys keep using the standard library's sorted output
+so they stay identical across processes whichever backend is installed.
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None and os.getenv("JSON_BACKEND", "").lower() != "json":
+    BACKEND = "orjson"
+
+    def dumps(obj):
+        """
+        Encode an object as JSON.
+
+        Args:
+            obj: JSON-serializable object
+
+        Returns:
+            bytes: Compact UTF-8 JSON
+        """
+        return orjson.dumps(obj)
+
+    def loads(data):
+        """
+        Decode JSON.
+
+        Args:
+            data (bytes or str): JSON document
+
+        Returns:
+            The decoded object
+
+        Raises:
+            ValueError: If the document is not valid JSON
+        """
+        return orjson.loads(data)
+else:
+    BACKEND = "json"
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj):
+        """
+        Encode an object as JSON.
+
+        Args:
+            obj: JSON-serializable object
+
+        Returns:
+            bytes: Compact UTF-8 JSON
+        """
+        return _encoder.encode(obj).encode("utf-8")
+
+    def loads(data):
+        """
+        Decode JSON.
+
+        Args:
+            data (bytes or str): JSON document
+
+        Returns:
+            The decoded object
+
+        Raises:
+            ValueError: If the document is not valid JSON
+        """
+        return json.loads(data)
+
+
+def dumps_text(obj):
+    """
+    Encode an object as a JSON string (e.g. for TEXT columns).
+
+    Args:
+        obj: JSON-serializable object
+
+    Returns:
+        str: Compact JSON
+    """
+    return dumps(obj).decode("utf-8")
@@ -0,0 +1,308 @@
+"""
+Logging subsystem.
+
+Request threads only put records on an in-process queue; a QueueListener
+thread formats them and writes to a size-rotated file (and the console).
+Size rotation is only safe with one writer: pre-forked worker processes
+(gunicorn) write through a WatchedFileHandler instead and leave rotation to an
+external tool such as logrotate (``rotation: "external"`` does the same in
+every process).
+Records are emitted as JSON lines with the message formatted lazily in the
+listener. Request/response bodies are logged through log_body, which samples
+them at a configurable rate and redacts PHI and credentials by field name
+before anything reaches disk.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+
+from src.utils import json_codec
+from src.utils.tracing import current_trace_id
+
+DEFAULT_LOGGING_CONFIG = {
+    "level": "INFO",
+    "path": "logs/app.log",
+    "format": "json",
+    "console": True,
+    "rotation": "size",
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "body_sample_rate": 0.0,
+    "redact_fields": [
+        "x-auth-key", "authorization", "api_key", "access_token", "refresh_token", "client_secret",
+        "email", "phone", "mobilephone", "homephone", "firstname", "lastname", "name", "first_name", "last_name",
+        "dateofbirth", "date_of_birth", "address", "address1", "streetaddress", "postalcode", "postal_code",
+        "field_value", "value", "customfields", "fields"
+    ]
+}
+
+REDACTED = "[REDACTED]"
+
+QUIET_LOGGERS = ("urllib3", "httpx", "httpcore")
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_redact_fields = frozenset(DEFAULT_LOGGING_CONFIG["redact_fields"])
+_body_sample_rate = 0.0
+_listener = None
+_listener_pid = None
+
+
+def redact(value, fields=None):
+    """
+    Replace the values of sensitive fields, recursively.
+
+    Args:
+        value: Decoded JSON value (dict, list or scalar)
+        fields (frozenset): Lower-cased field names to redact (defaults to the configured set)
+
+    Returns:
+        A copy of value with sensitive fields replaced by "[REDACTED]"
+    """
+    fields = _redact_fields if fields is None else fields
+    if isinstance(value, dict):
+        return {k: REDACTED if str(k).lower() in fields else redact(v, fields) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, fields) for v in value]
+    return value
+
+
+def _decode_body(body):
+    """Decode a raw body for logging; undecodable bodies are summarized, never written raw."""
+    if isinstance(body, (bytes, bytearray, str)):
+        if not body:
+            return ""
+        try:
+            return json_codec.loads(body)
+        except ValueError:
+            return f"<{len(body)} bytes of non-JSON body>"
+    return body
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON with extras and redacted bodies."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key in _RECORD_ATTRIBUTES or key.startswith("_"):
+                continue
+            if key == "body":
+                value = redact(_decode_body(value))
+            elif str(key).lower() in _redact_fields:
+                value = REDACTED
+            entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        try:
+            return json_codec.dumps_text(entry)
+        except TypeError:
+            return json_codec.dumps_text({k: v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+                                          for k, v in entry.items()})
+
+
+class TextFormatter(logging.Formatter):
+    """Classic text lines; a redacted body is appended as JSON."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        body = record.__dict__.get("body")
+        if body is not None:
+            line = f"{line} {json_codec.dumps_text(redact(_decode_body(body)))}"
+        return line
+
+
+class StartupBufferHandler(logging.handlers.MemoryHandler):
+    """
+    MemoryHandler that keeps only the newest records while it has no target.
+
+    The stock handler tries to flush when full and, without a target, keeps
+    everything, so the buffer would grow without bound.
+    """
+
+    def __init__(self, capacity):
+        super().__init__(capacity, flushLevel=logging.CRITICAL + 1, flushOnClose=True)
+        self.dropped = 0
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.target is None:
+                excess = len(self.buffer) - self.capacity
+                if excess > 0:
+                    del self.buffer[:excess]
+                    self.dropped += excess
+                return
+        finally:
+            self.release()
+        super().flush()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message in the calling thread; the queue is
+    in-process, so the record can be passed as-is. The correlation id of the
+    request being traced is read here, in the calling thread, and added as
+    ``trace_id``.
+    """
+
+    def prepare(self, record):
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            record.trace_id = trace_id
+        return record
+
+
+def log_body(logger, message, body, *args):
+    """
+    Log a request/response body, subject to sampling and redaction.
+
+    Args:
+        logger (logging.Logger): Logger to use (e.g. the root logger module ``logging``)
+        message (str): %-style message
+        body: Body as a decoded object or raw bytes/str; redacted when formatted
+        *args: Arguments for message
+    """
+    rate = _body_sample_rate
+    if rate <= 0 or not logger.isEnabledFor(logging.INFO):
+        return
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.info(message, *args, extra={"body": body})
+
+
+def configure_logging(logging_config=None):
+    """
+    Install the queue-based handlers on the root logger.
+
+    Args:
+        logging_config (dict): The "logging" block from config.json
+
+    Returns:
+        logging.handlers.QueueListener: The started listener
+    """
+    global _listener, _listener_pid, _redact_fields, _body_sample_rate
+    settings = dict(DEFAULT_LOGGING_CONFIG)
+    settings.update(logging_config or {})
+
+    _redact_fields = frozenset(field.lower() for field in settings["redact_fields"])
+    _body_sample_rate = float(settings["body_sample_rate"])
+
+    formatter = JsonFormatter() if settings["format"] == "json" else TextFormatter()
+    handlers = []
+    path = settings["path"]
+    if path:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if settings["rotation"] == "external":
+            file_handler = logging.handlers.WatchedFileHandler(path, encoding="utf-8")
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=settings["max_bytes"], backupCount=settings["backup_count"], encoding="utf-8"
+            )
+        handlers.append(file_handler)
+    if settings["console"]:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(stop_logging)
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+    root = logging.getLogger()
+    queue_handler = DeferredQueueHandler(log_queue)
+    buffered = []
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        if isinstance(handler, logging.handlers.MemoryHandler):
+            buffered.append(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, os.getenv("LOG_LEVEL") or settings["level"]))
+    # The HTTP libraries log full request URLs, query strings (PHI) included; keep only their warnings
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    # Hand over records logged before the config was read
+    for handler in buffered:
+        handler.setTarget(queue_handler)
+        handler.close()
+        if getattr(handler, "dropped", 0):
+            logging.warning("Dropped %d startup log records over the buffer's capacity", handler.dropped)
+    return _listener
+
+
+def buffer_startup_logging(capacity=10000):
+    """
+    Hold records in memory until configure_logging knows where to write them.
+
+    Used while the config file (which holds the logging settings) is loaded.
+
+    Args:
+        capacity (int): Records kept; beyond it the oldest are dropped
+    """
+    root = logging.getLogger()
+    root.addHandler(StartupBufferHandler(capacity))
+    root.setLevel(getattr(logging, os.getenv("LOG_LEVEL") or DEFAULT_LOGGING_CONFIG["level"]))
+
+
+def restart_logging():
+    """
+    Start a new listener thread in a forked child process.
+
+    The listener thread does not survive fork, so records queued in a
+    pre-forked worker would never be written. Several processes rotating one
+    file would rename it under each other, so the worker's size-rotated file
+    handler is replaced by a WatchedFileHandler on the same path: it appends
+    and reopens the file after an external rotation. Does nothing in the
+    process that configured logging.
+    """
+    global _listener, _listener_pid
+    if _listener is None or _listener_pid == os.getpid():
+        return
+    handlers = [_single_writer(handler) for handler in _listener.handlers]
+    _listener = logging.handlers.QueueListener(_listener.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def _single_writer(handler):
+    """A forked worker's replacement for a size-rotated file handler (other handlers are kept)."""
+    if not isinstance(handler, logging.handlers.RotatingFileHandler):
+        return handler
+    watched = logging.handlers.WatchedFileHandler(handler.baseFilename, encoding=handler.encoding)
+    watched.setFormatter(handler.formatter)
+    watched.setLevel(handler.level)
+    # Only this process's copy of the inherited descriptor is closed
+    handler.close()
+    return watched
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,520 @@
+"""
+Compiled mapping engine for GoHighLevel contacts.
+
+Field mappings live in a versioned mapping file (config/mappings.json): the
+IntakeQ client custom fields with their FieldIds, the GLP-1 form fields, the
+tag fields and the BMI inputs, each with a converter type ("text", "number",
+"enum" or "raw"). The file is compiled once into a MappingPlan: a single
+lookup table from GoHighLevel custom field key to the outputs it feeds, with a
+converter per field. Mapping a contact is then one pass over its custom
+fields, producing the IntakeQ client data, the GLP-1 form answers and the tag
+values together.
+
+MappingLoader keeps the plan in step with the file: an edited file is
+compiled on the next lookup and swapped in atomically, and compiled plans are
+cached on disk keyed by the file's hash so restarts skip compilation. The
+cache is plain JSON, so a tampered or foreign cache file can at worst yield a
+wrong plan, never run code.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from src.utils.metrics import STAGE_GLP1_MAPPING
+
+DEFAULT_MAPPINGS_PATH = "config/mappings.json"
+
+# Mapping file versions this compiler understands
+SUPPORTED_VERSIONS = (1,)
+
+# Bumped whenever the compiled plan's layout changes, invalidating disk caches
+COMPILER_VERSION = 2
+
+# How often (seconds) the mapping file's mtime is checked for hot reload
+CHECK_INTERVAL = 1.0
+
+# What a custom field key feeds
+_CLIENT_FIELD = 0
+_GLP1_FIELD = 1
+_TAG_FIELD = 2
+
+
+class MappingError(ValueError):
+    """Raised when a mapping file is invalid."""
+
+
+def parse_number(value):
+    """
+    Parse a numeric field value.
+
+    Args:
+        value: Raw field value (str, int, float or None)
+
+    Returns:
+        float: The number, or None if the value is empty or not numeric
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace(",", "")
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class TextConverter:
+    """Trims surrounding whitespace."""
+
+    __slots__ = ()
+    kind = "text"
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        return str(value).strip()
+
+
+class RawConverter:
+    """Passes the value through as a string."""
+
+    __slots__ = ()
+    kind = "raw"
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        return str(value)
+
+
+class NumberConverter:
+    """Trims numbers and drops thousands separators ("1,250 " -> "1250"); non-numeric text is kept trimmed."""
+
+    __slots__ = ()
+    kind = "number"
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        text = str(value).strip()
+        return text.replace(",", "") if parse_number(text) is not None else text
+
+
+class EnumConverter:
+    """Maps case-insensitive variants onto canonical values; unknown values are kept trimmed."""
+
+    __slots__ = ("values",)
+    kind = "enum"
+
+    def __init__(self, values):
+        self.values = {str(k).strip().lower(): v for k, v in values.items()}
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        text = str(value).strip()
+        return self.values.get(text.lower(), text)
+
+
+def _dump_converter(converter):
+    """Cache form of a converter: [kind] or ["enum", values]."""
+    if converter.kind == "enum":
+        return [converter.kind, converter.values]
+    return [converter.kind]
+
+
+def _load_converter(state):
+    """Rebuild a converter from _dump_converter's output."""
+    kind = state[0]
+    if kind == "enum":
+        return EnumConverter(state[1])
+    return {"text": TextConverter, "raw": RawConverter, "number": NumberConverter}[kind]()
+
+
+def _build_converter(entry, enums):
+    """Build the converter for one field entry of a mapping file."""
+    kind = entry.get("type", "text")
+    if kind == "text":
+        return TextConverter()
+    if kind == "raw":
+        return RawConverter()
+    if kind == "number":
+        return NumberConverter()
+    if kind == "enum":
+        values = entry.get("values")
+        if values is None:
+            name = entry.get("enum")
+            if name not in enums:
+                raise MappingError(f"Field {entry.get('key')!r} references unknown enum {name!r}")
+            values = enums[name]
+        return EnumConverter(values)
+    raise MappingError(f"Field {entry.get('key')!r} has unknown type {kind!r}")
+
+
+class MappedContact:
+    """Everything mapped from one contact."""
+
+    __slots__ = ("client_data", "glp1_fields", "form_data", "tags")
+
+    def __init__(self, client_data, glp1_fields, form_data, tags):
+        self.client_data = client_data
+        self.glp1_fields = glp1_fields
+        self.form_data = form_data
+        self.tags = tags
+
+
+class MappingPlan:
+    """Lookup plan compiled from a mapping file."""
+
+    def __init__(self, spec):
+        """
+        Compile the plan.
+
+        Args:
+            spec (dict): Parsed mapping file
+
+        Raises:
+            MappingError: If the mapping file is invalid
+        """
+        version = spec.get("version")
+        if version not in SUPPORTED_VERSIONS:
+            raise MappingError(f"Unsupported mapping version {version!r}")
+        self.version = version
+        enums = spec.get("enums", {})
+
+        try:
+            client_fields = spec.get("client_fields", [])
+            glp1_form = spec.get("glp1_form", {})
+
+            keys = [entry["key"] for entry in client_fields]
+            self.field_ids = tuple(entry["field_id"] for entry in client_fields)
+            self.field_converters = tuple(_build_converter(entry, enums) for entry in client_fields)
+
+            self.glp1_form_name = glp1_form.get("name")
+            self.glp1_field_ids = {}
+            self.glp1_converters = {}
+            for entry in glp1_form.get("fields", []):
+                self.glp1_field_ids[entry["key"]] = entry["field_id"]
+                self.glp1_converters[entry["key"]] = _build_converter(entry, enums)
+
+            self.tag_converters = {}
+            actions = {}
+            for index, key in enumerate(keys):
+                actions.setdefault(key, []).append((_CLIENT_FIELD, index))
+            for key in self.glp1_field_ids:
+                actions.setdefault(key, []).append((_GLP1_FIELD, key))
+            for entry in spec.get("tags", []):
+                actions.setdefault(entry["key"], []).append((_TAG_FIELD, entry["tag"]))
+                self.tag_converters[entry["tag"]] = _build_converter(entry, enums)
+        except KeyError as e:
+            raise MappingError(f"Mapping entry is missing {e.args[0]!r}")
+        self.lookup = {key: tuple(key_actions) for key, key_actions in actions.items()}
+
+        # BMI is derived from height and weight when all inputs are mapped client fields
+        bmi = spec.get("bmi") or {}
+        slots = [bmi.get(name) for name in ("height_feet", "height_inches", "weight", "field")]
+        if bmi and all(key in keys for key in slots):
+            self.bmi_slots = tuple(keys.index(key) for key in slots)
+        else:
+            self.bmi_slots = None
+
+    def dump(self):
+        """
+        The compiled tables as JSON-serializable data (for the disk cache).
+
+        Returns:
+            dict: State that load() turns back into an equivalent plan
+        """
+        return {
+            "version": self.version,
+            "field_ids": self.field_ids,
+            "field_converters": [_dump_converter(c) for c in self.field_converters],
+            "glp1_form_name": self.glp1_form_name,
+            "glp1_field_ids": self.glp1_field_ids,
+            "glp1_converters": {key: _dump_converter(c) for key, c in self.glp1_converters.items()},
+            "tag_converters": {tag: _dump_converter(c) for tag, c in self.tag_converters.items()},
+            "lookup": self.lookup,
+            "bmi_slots": self.bmi_slots
+        }
+
+    @classmethod
+    def load(cls, state):
+        """
+        Rebuild a plan from dump() output without recompiling the mapping file.
+
+        Args:
+            state (dict): Output of dump(), e.g. read back from the disk cache
+
+        Returns:
+            MappingPlan: The plan
+        """
+        plan = cls.__new__(cls)
+        plan.version = state["version"]
+        plan.field_ids = tuple(state["field_ids"])
+        plan.field_converters = tuple(_load_converter(c) for c in state["field_converters"])
+        plan.glp1_form_name = state["glp1_form_name"]
+        plan.glp1_field_ids = state["glp1_field_ids"]
+        plan.glp1_converters = {key: _load_converter(c) for key, c in state["glp1_converters"].items()}
+        plan.tag_converters = {tag: _load_converter(c) for tag, c in state["tag_converters"].items()}
+        plan.lookup = {
+            key: tuple((kind, target) for kind, target in actions) for key, actions in state["lookup"].items()
+        }
+        plan.bmi_slots = tuple(state["bmi_slots"]) if state["bmi_slots"] is not None else None
+        return plan
+
+    def map_contact(self, contact):
+        """
+        Map a GoHighLevel contact dict in a single pass over its custom fields.
+
+        Only non-empty fields are kept, and BMI is calculated when height and
+        weight are present.
+
+        Args:
+            contact (dict): The GoHighLevel contact
+
+        Returns:
+            MappedContact: IntakeQ client data, non-empty GLP-1 fields, the GLP-1
+            form (or None) and tag values
+        """
+        get = contact.get
+        # Handle both camelCase (webhook) and snake_case (direct) formats
+        return self._map(
+            get("firstName") or get("first_name"),
+            get("lastName") or get("last_name"),
+            get("email") or get("Email"),
+            get("phone") or get("Phone"),
+            get("city") or get("City"),
+            get("state") or get("State"),
+            get("postalCode") or get("postal_code"),
+            get("country") or get("Country"),
+            [(field.get("key"), field.get("field_value")) for field in get("customFields", [])],
+            get("location")
+        )
+
+    def map_record(self, record):
+        """
+        Map a normalized ContactRecord (see payload_normalizer).
+
+        Args:
+            record (ContactRecord): The normalized contact
+
+        Returns:
+            MappedContact: IntakeQ client data, non-empty GLP-1 fields, the GLP-1
+            form (or None) and tag values
+        """
+        return self._map(
+            record.first_name, record.last_name, record.email, record.phone, record.city,
+            record.state, record.postal_code, record.country, record.custom_fields, None
+        )
+
+    def _map(self, first_name, last_name, email, phone, city, state, postal_code, country, custom_field_items, location):
+        """Map contact fields and (key, value) custom field pairs."""
+        first_name = first_name or ""
+        last_name = last_name or ""
+        client_data = {
+            "FirstName": first_name,
+            "LastName": last_name,
+            "Name": f"{first_name} {last_name}".strip(),
+            "Email": (email or "").strip(),
+            "Phone": (phone or "").strip(),
+            "City": (city or "").strip(),
+            "StateShort": (state or "").strip(),
+            "PostalCode": (postal_code or "").strip(),
+            "Country": (country or "USA").strip(),
+            "CustomFields": []
+        }
+
+        # Collect raw values (last occurrence wins); conversion happens once per field below
+        slots = [None] * len(self.field_ids)
+        glp1_values = {}
+        tag_values = {}
+        lookup = self.lookup
+        for key, value in custom_field_items:
+            key_actions = lookup.get(key)
+            if key_actions is None:
+                continue
+            for kind, target in key_actions:
+                if kind == _CLIENT_FIELD:
+                    slots[target] = value
+                elif kind == _GLP1_FIELD:
+                    glp1_values[target] = value
+                else:
+                    tag_values[target] = value
+
+        if self.bmi_slots is not None:
+            feet_slot, inches_slot, weight_slot, bmi_slot = self.bmi_slots
+            height_feet = parse_number(slots[feet_slot])
+            height_inches = parse_number(slots[inches_slot])
+            weight = parse_number(slots[weight_slot])
+            if height_feet is not None and height_inches is not None and weight is not None:
+                total_inches = (height_feet * 12) + height_inches
+                if total_inches > 0:
+                    # BMI formula: (weight in pounds * 703) / (height in inches)²
+                    slots[bmi_slot] = round((weight * 703) / (total_inches * total_inches), 1)
+
+        custom_fields = client_data["CustomFields"]
+        for field_id, convert, value in zip(self.field_ids, self.field_converters, slots):
+            if value:
+                value = convert(value)
+                if value:
+                    custom_fields.append({"FieldId": field_id, "Value": value})
+
+        # Map location data
+        if location:
+            client_data["City"] = location.get("city", "").strip()
+            client_data["StateShort"] = location.get("state", "").strip()
+            client_data["PostalCode"] = location.get("postalCode", "").strip()
+            client_data["Country"] = location.get("country", "USA").strip()
+
+        # Remove any empty values
+        client_data = {k: v for k, v in client_data.items() if v}
+
+        glp1_start = time.perf_counter()
+        glp1_fields = {}
+        glp1_converters = self.glp1_converters
+        for key, value in glp1_values.items():
+            if value:
+                value = glp1_converters[key](value)
+                if value:
+                    glp1_fields[key] = value
+        form_data = None
+        if glp1_fields:
+            field_ids = self.glp1_field_ids
+            form_data = {
+                "formName": self.glp1_form_name,
+                "fields": [{"id": field_ids[k], "value": v} for k, v in glp1_fields.items()]
+            }
+        STAGE_GLP1_MAPPING.observe(time.perf_counter() - glp1_start)
+
+        tags = {}
+        for tag, value in tag_values.items():
+            value = self.tag_converters[tag](value)
+            if value:
+                tags[tag] = value
+
+        return MappedContact(client_data, glp1_fields, form_data, tags)
+
+
+def compile_mapping_file(path, cache_path=None):
+    """
+    Compile a mapping file, reusing a cached plan when the file is unchanged.
+
+    Args:
+        path (str): Path to the mapping file
+        cache_path (str): Where compiled plans are cached (no caching if None)
+
+    Returns:
+        MappingPlan: The compiled plan
+
+    Raises:
+        MappingError: If the mapping file is invalid
+        OSError: If the mapping file cannot be read
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached = json.loads(f.read())
+            if cached.get("compiler_version") == COMPILER_VERSION and cached.get("sha256") == digest:
+                return MappingPlan.load(cached["plan"])
+        except Exception as e:
+            logging.warning("Ignoring unreadable mapping cache %s: %s", cache_path, e)
+
+    try:
+        spec = json.loads(source)
+    except ValueError as e:
+        raise MappingError(f"Invalid JSON in {path}: {str(e)}")
+    plan = MappingPlan(spec)
+
+    if cache_path:
+        try:
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"compiler_version": COMPILER_VERSION, "sha256": digest, "plan": plan.dump()}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.warning("Failed to write mapping cache %s: %s", cache_path, e)
+    return plan
+
+
+class MappingLoader:
+    """Serves the compiled plan for a mapping file, reloading it when the file changes."""
+
+    def __init__(self, path=DEFAULT_MAPPINGS_PATH, cache_path=None):
+        """
+        Load and compile the mapping file.
+
+        Args:
+            path (str): Path to the mapping file
+            cache_path (str): Where compiled plans are cached (no caching if None)
+
+        Raises:
+            MappingError: If the mapping file is invalid
+        """
+        self.path = path
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._mtime = os.stat(path).st_mtime
+        self._plan = compile_mapping_file(path, cache_path)
+        logging.info("Loaded mapping version %s from %s", self._plan.version, path)
+
+    @property
+    def plan(self):
+        """The compiled plan, recompiled and swapped in if the file changed on disk."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._plan
+
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + CHECK_INTERVAL
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                    if mtime != self._mtime:
+                        plan = compile_mapping_file(self.path, self.cache_path)
+                        # Readers see either the old plan or the new one, never a mix
+                        self._plan, self._mtime = plan, mtime
+                        logging.info("Reloaded mapping version %s from %s", plan.version, self.path)
+                except (OSError, MappingError) as e:
+                    # Keep serving the last good plan if the new file is unreadable
+                    logging.error("Failed to reload mappings: %s", e)
+        return self._plan
+
+
+_loaders = {}
+_loaders_lock = threading.Lock()
+
+
+def get_mapping_plan(path=DEFAULT_MAPPINGS_PATH):
+    """
+    Get the current plan for a mapping file, loading it on first use.
+
+    Args:
+        path (str): Path to the mapping file
+
+    Returns:
+        MappingPlan: The compiled plan
+    """
+    loader = _loaders.get(path)
+    if loader is None:
+        with _loaders_lock:
+            loader = _loaders.get(path)
+            if loader is None:
+                loader = _loaders[path] = MappingLoader(path)
+    return loader.plan
@@ -0,0 +1,506 @@
+"""
+Prometheus-style metrics, rendered in the text exposition format by /metrics.
+
+Instrumentation stays on at full load:
+- Every series keeps one small array of numbers per thread. An update only
+  touches the calling thread's array, so counters and histograms need no
+  lock. Scrapes sum the arrays.
+- Label children are resolved once, when a client or policy is built, so
+  hot paths do not build label tuples per call.
+- Histogram buckets are found by bisecting a fixed tuple.
+- Values that are only meaningful at scrape time (circuit breaker state,
+  queue depth) come from collectors called during the scrape.
+
+Each gunicorn worker process has its own registry. With METRICS_MULTIPROC_DIR
+set (gunicorn.conf.py sets it), every process writes a snapshot of its values
+to that directory every few seconds. A scrape adds up the snapshots of all
+processes, so /metrics reports the whole server whichever worker answers.
+Counters and histograms of exited workers keep counting. Gauges only count
+live processes.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+class _ThreadArray(threading.local):
+    """The calling thread's array of a series (``__init__`` runs once per thread, on first use)."""
+
+    def __init__(self, values):
+        self.array = values.register_thread()
+
+
+class _Values:
+    """Per-thread value arrays of one series; updates touch only the calling thread's array."""
+
+    __slots__ = ("size", "local", "_arrays", "_retired", "_lock")
+
+    def __init__(self, size):
+        self.size = size
+        self._arrays = []
+        # Totals of threads that have exited
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+        self.local = _ThreadArray(self)
+
+    def register_thread(self):
+        """Create the calling thread's array."""
+        array = [0] * self.size
+        with self._lock:
+            self._arrays.append((threading.current_thread(), array))
+        return array
+
+    def totals(self):
+        """Sum over all threads, folding the arrays of exited threads into the retired totals."""
+        with self._lock:
+            live = []
+            for thread, array in self._arrays:
+                if thread.is_alive():
+                    live.append((thread, array))
+                else:
+                    self._retired = [a + b for a, b in zip(self._retired, array)]
+            self._arrays = live
+            totals = list(self._retired)
+            for _, array in live:
+                totals = [a + b for a, b in zip(totals, array)]
+        return totals
+
+
+class _CounterChild:
+    __slots__ = ("_values", "_local")
+
+    def __init__(self):
+        self._values = _Values(1)
+        self._local = self._values.local
+
+    def inc(self, amount=1):
+        """Add to the counter."""
+        self._local.array[0] += amount
+
+
+class _GaugeChild:
+    """Gauge series; ``with gauge:`` counts the block as in flight."""
+
+    __slots__ = ("_values", "_local")
+
+    def __init__(self):
+        self._values = _Values(1)
+        self._local = self._values.local
+
+    def inc(self, amount=1):
+        """Raise the gauge (e.g. a request started)."""
+        self._local.array[0] += amount
+
+    def dec(self, amount=1):
+        """Lower the gauge (e.g. a request finished)."""
+        self._local.array[0] -= amount
+
+    def __enter__(self):
+        self._local.array[0] += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._local.array[0] -= 1
+
+
+class _HistogramChild:
+    __slots__ = ("_values", "_local", "_bounds")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        # One slot per bucket (the last is +Inf), then the sum
+        self._values = _Values(len(bounds) + 1)
+        self._local = self._values.local
+
+    def observe(self, value):
+        """Record one observation (e.g. a duration in seconds)."""
+        array = self._local.array
+        array[bisect_left(self._bounds, value)] += 1
+        array[-1] += value
+
+
+class Metric:
+    """A named metric family; ``labels`` returns the series for one set of label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        """
+        Initialize and register the metric.
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (tuple): Label names
+            registry (Registry): Where to register (defaults to the process-wide registry)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values):
+        """
+        Get the series for label values, creating it on first use.
+
+        Resolve series once (e.g. in a constructor) and keep them; this call
+        builds a tuple and takes a lock when the series is new.
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """Label values and totals of every series."""
+        return [(key, child._values.totals()) for key, child in list(self._children.items())]
+
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+
+    kind = COUNTER
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        """Add to the unlabelled counter."""
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """A value that goes up and down (e.g. requests in flight)."""
+
+    kind = GAUGE
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum."""
+
+    kind = HISTOGRAM
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        """
+        Initialize and register the histogram.
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (tuple): Label names
+            buckets (tuple): Upper bounds of the buckets (+Inf is added)
+            registry (Registry): Where to register (defaults to the process-wide registry)
+        """
+        self.bounds = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Registry:
+    """The metrics of a process, and collectors evaluated at scrape time."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric (names must be unique)."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def register_collector(self, name, collector):
+        """
+        Add a scrape-time collector, replacing any earlier one of the same name.
+
+        Args:
+            name (str): Collector name
+            collector (callable): Returns a list of (name, kind, documentation, labelnames, samples),
+                where samples is a list of (label_values, value)
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self):
+        """
+        Totals of every series, as written to the multiprocess directory.
+
+        Returns:
+            dict: {metric name: [[label values, totals], ...]}
+        """
+        return {name: [[list(key), totals] for key, totals in metric.samples()]
+                for name, metric in list(self._metrics.items())}
+
+    def render(self, multiprocess_dir=None):
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+        Args:
+            multiprocess_dir (str): Directory of other processes' snapshots to add in
+
+        Returns:
+            str: The exposition
+        """
+        merged = {name: dict(metric.samples()) for name, metric in list(self._metrics.items())}
+        if multiprocess_dir:
+            self._merge_snapshots(merged, multiprocess_dir)
+
+        lines = []
+        for name, metric in list(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, totals in sorted(merged[name].items()):
+                if metric.kind == HISTOGRAM:
+                    cumulative = 0
+                    for bound, count in zip(metric.bounds, totals):
+                        cumulative += count
+                        labels = _format_labels(metric.labelnames, key, f'le="{_format_value(bound)}"')
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{name}_sum{labels} {_format_value(totals[-1])}")
+                    lines.append(f"{name}_count{labels} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(metric.labelnames, key)} {_format_value(totals[0])}")
+
+        for collector in list(self._collectors.values()):
+            try:
+                families = collector()
+            except Exception as e:
+                logging.error("Metrics collector failed: %s", e)
+                continue
+            for name, kind, documentation, labelnames, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for values, value in samples:
+                    lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _merge_snapshots(self, merged, directory):
+        """Add the snapshots other processes wrote to directory."""
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        own = f"metrics-{os.getpid()}.json"
+        for filename in names:
+            if not filename.startswith("metrics-") or not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(directory, filename), "r") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(snapshot.get("pid"))
+            for name, series in snapshot.get("metrics", {}).items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == GAUGE and not alive):
+                    continue
+                target = merged[name]
+                for values, totals in series:
+                    key = tuple(values)
+                    current = target.get(key)
+                    target[key] = totals if current is None else [a + b for a, b in zip(current, totals)]
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+REGISTRY = Registry()
+
+MULTIPROC_DIR_ENV = "METRICS_MULTIPROC_DIR"
+
+_flusher_pid = None
+_flusher_stop = threading.Event()
+
+
+def multiprocess_dir():
+    """The snapshot directory shared by worker processes, or None for a single process."""
+    return os.getenv(MULTIPROC_DIR_ENV) or None
+
+
+def write_snapshot(registry=REGISTRY):
+    """Write this process's totals to the multiprocess directory (atomically)."""
+    directory = multiprocess_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"pid": os.getpid(), "metrics": registry.snapshot()}, f)
+    os.replace(tmp_path, path)
+
+
+def start_snapshot_writer(interval=5.0):
+    """
+    Periodically write this process's snapshot (once per process; threads do not survive fork).
+
+    Args:
+        interval (float): Seconds between snapshots
+    """
+    global _flusher_pid
+    if not multiprocess_dir() or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    _flusher_stop.clear()
+
+    def run():
+        while not _flusher_stop.wait(interval):
+            try:
+                write_snapshot()
+            except OSError as e:
+                logging.error("Failed to write metrics snapshot: %s", e)
+
+    threading.Thread(target=run, name="metrics-snapshot", daemon=True).start()
+    atexit.register(stop_snapshot_writer)
+
+
+def stop_snapshot_writer():
+    """Stop the snapshot thread and write a final snapshot."""
+    global _flusher_pid
+    if _flusher_pid != os.getpid():
+        return
+    _flusher_stop.set()
+    _flusher_pid = None
+    try:
+        write_snapshot()
+    except OSError as e:
+        logging.error("Failed to write metrics snapshot: %s", e)
+
+
+def clear_multiprocess_dir():
+    """Remove snapshots left by a previous server run (call before workers start)."""
+    directory = multiprocess_dir()
+    if not directory or not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.startswith("metrics-"):
+            os.remove(os.path.join(directory, filename))
+
+
+def render_metrics(registry=REGISTRY):
+    """Render the process-wide registry, including other workers' snapshots when configured."""
+    return registry.render(multiprocess_dir())
+
+
+# Metrics of the integration
+
+WEBHOOKS = Counter("ghl_intakeq_webhooks_total", "Webhooks answered, by HTTP status code", ("code",))
+WEBHOOK_DURATION = Histogram("ghl_intakeq_webhook_duration_seconds", "Time to answer a webhook")
+WEBHOOKS_IN_FLIGHT = Gauge("ghl_intakeq_webhooks_in_flight", "Webhooks being handled")
+STAGE_DURATION = Histogram(
+    "ghl_intakeq_stage_duration_seconds",
+    "Time spent in each pipeline stage (intakeq_* stages include retries)",
+    ("stage",)
+)
+UPSTREAM_RESPONSES = Counter(
+    "ghl_intakeq_upstream_responses_total",
+    "Upstream HTTP responses by status code (\"error\" when no response was received)",
+    ("upstream", "status")
+)
+UPSTREAM_IN_FLIGHT = Gauge("ghl_intakeq_upstream_requests_in_flight", "Upstream requests in flight", ("upstream",))
+UPSTREAM_RETRIES = Counter("ghl_intakeq_upstream_retries_total", "Upstream requests retried", ("upstream",))
+BREAKER_OPENED = Counter("ghl_intakeq_circuit_breaker_opened_total", "Times a circuit opened", ("upstream",))
+BREAKER_REJECTED = Counter(
+    "ghl_intakeq_circuit_breaker_rejected_total", "Requests refused by an open circuit", ("upstream",)
+)
+
+# Unlabelled series, resolved once
+WEBHOOK_DURATION_SERIES = WEBHOOK_DURATION.labels()
+WEBHOOKS_IN_FLIGHT_SERIES = WEBHOOKS_IN_FLIGHT.labels()
+
+# Pipeline stage series, resolved once
+STAGE_NORMALIZE = STAGE_DURATION.labels("normalize")
+STAGE_ENRICH = STAGE_DURATION.labels("enrich")
+STAGE_MAPPING = STAGE_DURATION.labels("mapping")
+STAGE_GLP1_MAPPING = STAGE_DURATION.labels("glp1_mapping")
+STAGE_INTAKEQ_SEARCH = STAGE_DURATION.labels("intakeq_search")
+STAGE_INTAKEQ_WRITE = STAGE_DURATION.labels("intakeq_write")
+STAGE_INTAKEQ_READ = STAGE_DURATION.labels("intakeq_read")
+
+
+_webhook_codes = {}
+
+
+def count_webhook(status_code):
+    """Count an answered webhook by its HTTP status code."""
+    child = _webhook_codes.get(status_code)
+    if child is None:
+        child = _webhook_codes[status_code] = WEBHOOKS.labels(status_code)
+    child.inc()
+
+
+class UpstreamMetrics:
+    """The series of one upstream host, resolved once per client."""
+
+    __slots__ = ("host", "in_flight", "_statuses")
+
+    def __init__(self, host):
+        self.host = host
+        self.in_flight = UPSTREAM_IN_FLIGHT.labels(host)
+        self._statuses = {}
+
+    def record_status(self, status_code):
+        """Count a response (None when no response was received)."""
+        child = self._statuses.get(status_code)
+        if child is None:
+            child = self._statuses[status_code] = UPSTREAM_RESPONSES.labels(
+                self.host, "error" if status_code is None else status_code
+            )
+        child.inc()
@@ -0,0 +1,181 @@
+"""
+Normalizes GoHighLevel webhook payloads into compact contact records.
+
+Two payload shapes reach the webhook: GoHighLevel's webhook format (contact
+fields under "payload", custom fields as a list of key/field_value dicts) and
+the direct form format (flat snake_case fields, every other key a custom
+field). Both are read in one pass into a ContactRecord whose custom fields are
+(key, value) tuples, which is what the mapping engine consumes. Contacts read
+from the GoHighLevel API (e.g. by the backfill) are normalized the same way.
+"""
+
+# Direct-format keys that are contact fields rather than custom fields
+DIRECT_CONTACT_KEYS = frozenset([
+    "contact_id", "first_name", "last_name", "email", "phone", "tags", "city", "state", "country", "postal_code",
+    "date_of_birth"
+])
+
+
+class ContactRecord:
+    """A GoHighLevel contact normalized from either payload format."""
+
+    __slots__ = (
+        "id", "first_name", "last_name", "email", "phone",
+        "city", "state", "country", "postal_code", "dob", "custom_fields"
+    )
+
+    def __init__(self, id, first_name, last_name, email, phone, city, state, country, postal_code, custom_fields,
+                 dob=None):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+        self.phone = phone
+        self.city = city
+        self.state = state
+        self.country = country
+        self.postal_code = postal_code
+        # Date of birth as sent (see client_index.normalize_dob); used for matching only
+        self.dob = dob
+        # List of (key, value) tuples; values are strings ("" for missing)
+        self.custom_fields = custom_fields
+
+
+def _text(value):
+    """Stringify a custom field value, leaving strings untouched."""
+    if value.__class__ is str:
+        return value
+    return "" if value is None else str(value)
+
+
+def _from_webhook(payload):
+    """Read GoHighLevel's webhook format."""
+    get = payload.get
+    custom_fields = get("customFields")
+    return ContactRecord(
+        get("contactId"),
+        get("firstName"),
+        get("lastName"),
+        get("email"),
+        get("phone"),
+        get("city"),
+        get("state"),
+        get("country", "USA"),
+        get("postalCode"),
+        [(field.get("key", ""), _text(field.get("field_value"))) for field in custom_fields] if custom_fields else [],
+        get("dateOfBirth")
+    )
+
+
+def _from_direct(data):
+    """Read the direct form format."""
+    get = data.get
+    reserved = DIRECT_CONTACT_KEYS
+    return ContactRecord(
+        get("contact_id"),
+        get("first_name"),
+        get("last_name"),
+        get("email"),
+        get("phone"),
+        get("city"),
+        get("state"),
+        get("country"),
+        get("postal_code"),
+        [(key, _text(value)) for key, value in data.items() if key not in reserved],
+        get("date_of_birth")
+    )
+
+
+def normalize_contact(contact, field_keys=None):
+    """
+    Normalize a contact as returned by the GoHighLevel contacts API.
+    
+    Custom fields may carry key/field_value (as in webhooks) or id/value. The
+    API's field ids mean nothing to the mappings, so field_keys (see
+    GoHighLevelClient.get_custom_field_keys) translates them; a field whose
+    id is not in it is kept under its id and matches no mapping.
+    
+    Args:
+        contact (dict): The contact
+        field_keys (dict): Custom field id -> keys (name and/or field key)
+        
+    Returns:
+        ContactRecord: The normalized contact
+    """
+    get = contact.get
+    custom_fields = []
+    for field in get("customFields") or ():
+        value = _text(field["field_value"] if "field_value" in field else field.get("value"))
+        key = field.get("key")
+        if key:
+            custom_fields.append((key, value))
+            continue
+        field_id = field.get("id") or ""
+        for key in (field_keys or {}).get(field_id) or (field_id,):
+            custom_fields.append((key, value))
+    return ContactRecord(
+        get("id"),
+        get("firstName"),
+        get("lastName"),
+        get("email"),
+        get("phone"),
+        get("city"),
+        get("state"),
+        get("country", "USA"),
+        get("postalCode"),
+        custom_fields,
+        get("dateOfBirth")
+    )
+
+
+def merge_contacts(primary, fallback):
+    """
+    Fill the gaps of a contact record from another record of the same contact.
+
+    Used to enrich a partial webhook payload with the contact fetched from the
+    API. Non-empty values of the primary record win; custom fields only the
+    fallback has are appended.
+
+    Args:
+        primary (ContactRecord): The record to complete (e.g. from the webhook)
+        fallback (ContactRecord): The record supplying missing values
+
+    Returns:
+        ContactRecord: The merged record
+    """
+    fallback_fields = dict(fallback.custom_fields)
+    seen = set()
+    custom_fields = []
+    for key, value in primary.custom_fields:
+        seen.add(key)
+        custom_fields.append((key, value or fallback_fields.get(key, "")))
+    custom_fields.extend((key, value) for key, value in fallback.custom_fields if key not in seen)
+    return ContactRecord(
+        primary.id or fallback.id,
+        primary.first_name or fallback.first_name,
+        primary.last_name or fallback.last_name,
+        primary.email or fallback.email,
+        primary.phone or fallback.phone,
+        primary.city or fallback.city,
+        primary.state or fallback.state,
+        primary.country or fallback.country,
+        primary.postal_code or fallback.postal_code,
+        custom_fields,
+        primary.dob or fallback.dob
+    )
+
+
+def normalize_payload(data):
+    """
+    Normalize a webhook payload in either format.
+
+    Args:
+        data (dict): The webhook payload
+
+    Returns:
+        ContactRecord: The normalized contact
+    """
+    payload = data.get("payload")
+    if payload is not None:
+        return _from_webhook(payload)
+    return _from_direct(data)
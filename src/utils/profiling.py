@@ -0,0 +1,222 @@
+"""
+Opt-in profiling of sampled webhook requests.
+
+With the "profiling" block enabled, every ``every_n``-th webhook is handled
+under a profiler. Each profile is written to ``output_dir``, named after the
+request's correlation id so it can be matched with its trace and logs. There
+are two modes:
+
+- ``sample`` (default): a thread records the request thread's stack every
+  ``interval`` seconds. The result is written in the folded format
+  (``frame;frame;frame count``) that flamegraph.pl, speedscope and inferno
+  read directly.
+- ``cprofile``: the request runs under cProfile, and the stats are written
+  as ``.prof`` for snakeviz, flameprof or pstats. From Python 3.12 cProfile
+  also records the other threads running at the time.
+
+Only one request per process is profiled at a time, and the rest run
+normally. Only the newest ``max_files`` profiles are kept.
+"""
+
+import cProfile
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+
+DEFAULT_PROFILING_CONFIG = {
+    "enabled": False,
+    "every_n": 100,
+    "mode": "sample",
+    "interval": 0.001,
+    "output_dir": "logs/profiles",
+    "max_files": 200
+}
+
+SAMPLE = "sample"
+CPROFILE = "cprofile"
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled from a background thread."""
+
+    def __init__(self, thread_id, interval=0.001):
+        """
+        Initialize the sampler.
+
+        Args:
+            thread_id (int): threading.get_ident() of the thread to sample
+            interval (float): Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def folded(self):
+        """The samples in the folded-stack format, one ``stack count`` line per distinct stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class RequestProfiler:
+    """Profiles every N-th request and writes flamegraph-ready output."""
+
+    def __init__(self, every_n=100, mode=SAMPLE, interval=0.001, output_dir="logs/profiles", max_files=200):
+        """
+        Initialize the profiler.
+
+        Args:
+            every_n (int): Profile one request in this many
+            mode (str): SAMPLE (folded stacks) or CPROFILE (.prof stats)
+            interval (float): Seconds between stack samples in SAMPLE mode
+            output_dir (str): Directory profiles are written to
+            max_files (int): Profiles kept before the oldest are deleted
+        """
+        if mode not in (SAMPLE, CPROFILE):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.every_n = max(1, int(every_n))
+        self.mode = mode
+        self.interval = interval
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self._counter = itertools.count(1)
+        self._busy = threading.Lock()
+        self.profiled = 0
+        self.skipped_busy = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def should_profile(self):
+        """Whether the request being started is one to profile."""
+        return next(self._counter) % self.every_n == 0
+
+    def run(self, fn, name):
+        """
+        Call fn under the profiler and write its profile.
+
+        Args:
+            fn (callable): The request handler (no arguments)
+            name (str): Included in the file name (e.g. the correlation id)
+
+        Returns:
+            fn's return value
+        """
+        if not self._busy.acquire(blocking=False):
+            # cProfile cannot run twice at once; sampled profiles are rare anyway
+            self.skipped_busy += 1
+            return fn()
+        try:
+            start = time.perf_counter()
+            if self.mode == CPROFILE:
+                profile = cProfile.Profile()
+                result = profile.runcall(fn)
+                path = self._path(name, "prof")
+                profile.dump_stats(path)
+            else:
+                sampler = StackSampler(threading.get_ident(), self.interval)
+                sampler.start()
+                try:
+                    result = fn()
+                finally:
+                    sampler.stop()
+                path = self._path(name, "folded")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(sampler.folded())
+            self.profiled += 1
+            logging.info("Profiled request %s (%.1f ms) to %s", name, (time.perf_counter() - start) * 1000, path)
+            self._prune()
+            return result
+        finally:
+            self._busy.release()
+
+    def _path(self, name, extension):
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        return os.path.join(self.output_dir, f"{stamp}-{os.getpid()}-{name}.{extension}")
+
+    def _prune(self):
+        """Delete the oldest profiles beyond max_files."""
+        try:
+            entries = [os.path.join(self.output_dir, n) for n in os.listdir(self.output_dir)]
+            entries = [p for p in entries if p.endswith((".prof", ".folded"))]
+            if len(entries) <= self.max_files:
+                return
+            entries.sort(key=os.path.getmtime)
+            for path in entries[:len(entries) - self.max_files]:
+                os.remove(path)
+        except OSError as e:
+            logging.warning("Failed to prune profiles: %s", e)
+
+    def stats(self):
+        """
+        Profiler counters.
+
+        Returns:
+            dict: Mode, sampling period and requests profiled or skipped
+        """
+        return {
+            "mode": self.mode,
+            "every_n": self.every_n,
+            "profiled": self.profiled,
+            "skipped_busy": self.skipped_busy
+        }
+
+
+def create_profiler(profiling_config):
+    """
+    Build the profiler described by the "profiling" block of config.json.
+
+    PROFILE_EVERY_N enables profiling and overrides ``every_n``.
+
+    Args:
+        profiling_config (dict): Profiling settings (enabled, every_n, mode, interval, output_dir, max_files)
+
+    Returns:
+        RequestProfiler: The profiler, or None if disabled
+    """
+    settings = dict(DEFAULT_PROFILING_CONFIG)
+    settings.update(profiling_config or {})
+    every_n = os.getenv("PROFILE_EVERY_N")
+    if every_n:
+        settings.update(enabled=True, every_n=int(every_n))
+    if not settings["enabled"]:
+        return None
+    logging.info("Profiling 1 in %s webhooks (%s) to %s", settings['every_n'], settings['mode'], settings['output_dir'])
+    return RequestProfiler(
+        every_n=settings["every_n"],
+        mode=settings["mode"],
+        interval=settings["interval"],
+        output_dir=settings["output_dir"],
+        max_files=settings["max_files"]
+    )
@@ -0,0 +1,166 @@
+"""
+In-process single-flight coalescing.
+
+When several threads ask for the same operation at once, only the first runs
+it and the others wait for and share its result. Used to stop concurrent
+deliveries for the same contact from each searching IntakeQ, finding nothing,
+and each creating a duplicate client. AsyncSingleFlight does the same for
+coroutines on one event loop.
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    """An operation in flight and the outcome waiters will share."""
+
+    __slots__ = ("fingerprint", "done", "result", "error")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key."""
+
+    def __init__(self):
+        """Initialize the in-flight table and counters."""
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, fingerprint=None):
+        """
+        Run fn once per key among concurrent callers.
+
+        Callers with the same key and fingerprint share one execution. A caller
+        whose fingerprint differs (e.g. a different payload for the same
+        contact) waits for the in-flight call to finish and then runs its own,
+        so operations on one key are serialized rather than racing.
+
+        Args:
+            key (hashable): Coalescing key, e.g. a normalized email
+            fn (callable): The operation to run
+            fingerprint (hashable): Identifies the operation's input
+
+        Returns:
+            The result of fn (possibly from another caller's execution)
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call(fingerprint)
+                    self._calls[key] = call
+
+            if leader:
+                return self._execute(key, call, fn)
+
+            call.done.wait()
+            if call.fingerprint == fingerprint:
+                self.shared += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+    def _execute(self, key, call, fn):
+        """Run fn as the leader and publish the outcome to waiters."""
+        self.executed += 1
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """
+        Coalescing counters.
+
+        Returns:
+            dict: Executions performed, calls that shared a result, and calls in flight
+        """
+        return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class _AsyncCall:
+    """A coroutine in flight and the outcome waiters will share."""
+
+    __slots__ = ("fingerprint", "done", "result", "error", "cancelled")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = asyncio.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop."""
+
+    def __init__(self):
+        """Initialize the in-flight table and counters."""
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, fn, fingerprint=None):
+        """
+        Await fn() once per key among concurrent callers.
+
+        Same semantics as SingleFlight.do: identical fingerprints share one
+        execution, different ones are serialized.
+
+        Args:
+            key (hashable): Coalescing key, e.g. a normalized email
+            fn (callable): Returns the awaitable to run
+            fingerprint (hashable): Identifies the operation's input
+
+        Returns:
+            The result of fn (possibly from another caller's execution)
+        """
+        while True:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _AsyncCall(fingerprint)
+                self.executed += 1
+                try:
+                    call.result = await fn()
+                    return call.result
+                except asyncio.CancelledError:
+                    call.cancelled = True
+                    raise
+                except Exception as e:
+                    call.error = e
+                    raise
+                finally:
+                    del self._calls[key]
+                    call.done.set()
+
+            await call.done.wait()
+            # A cancelled leader has no outcome to share; the next caller runs fn itself
+            if call.fingerprint == fingerprint and not call.cancelled:
+                self.shared += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+    def stats(self):
+        """
+        Coalescing counters.
+
+        Returns:
+            dict: Executions performed, calls that shared a result, and calls in flight
+        """
+        return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._calls)}
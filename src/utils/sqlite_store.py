@@ -0,0 +1,56 @@
+"""
+Shared helpers for the small SQLite-backed stores (job queue, caches).
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+
+# Every connection holder, so connections inherited across fork can be dropped
+_instances = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    """SQLite connections must not be used across fork; children open their own."""
+    for instance in list(_instances):
+        instance._local = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class ThreadLocalSQLite:
+    """
+    Hands each thread its own connection to one SQLite file.
+
+    sqlite3 connections cannot be shared across threads, and opening one per
+    call is wasteful, so connections are kept per thread. Connections run in
+    autocommit mode with WAL journaling so readers never block the writer and
+    several processes can share the file.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the connection holder, creating the parent directory if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        _instances.add(self)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def connection(self):
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,501 @@
+"""
+Request tracing for the webhook path.
+
+A webhook gets a root span in gohighlevel_webhook. process_webhook, the
+pipeline stages and every upstream request (each _make_request, retries
+included) open child spans. All spans of a request share its trace id, which
+is also the request's correlation id:
+- it is returned in the X-Correlation-ID response header;
+- it is added to log records as ``trace_id``;
+- a caller can supply it in a W3C ``traceparent`` or an X-Correlation-ID
+  header.
+
+The current span lives in a contextvar, so spans nest across function calls
+and asyncio tasks without being passed around. Finished spans are batched and
+written by a background thread, either as JSON lines to a local file or to an
+OTLP/HTTP collector (JSON encoding, e.g. http://collector:4318/v1/traces).
+Request threads only append to a bounded queue. When the exporter falls
+behind, spans are dropped and counted.
+
+Only a ``sample_rate`` fraction of traces is recorded. Unsampled requests
+still get a correlation id but record no spans. With tracing disabled,
+start_span returns a shared no-op span.
+
+Span attributes never hold payload contents or query strings (IntakeQ
+searches carry the email in the query string), only paths, methods, status
+codes and counts.
+"""
+
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+import requests
+
+from src.utils import json_codec
+
+DEFAULT_TRACING_CONFIG = {
+    "enabled": False,
+    "exporter": "file",
+    "path": "logs/traces.jsonl",
+    "otlp_endpoint": "http://127.0.0.1:4318/v1/traces",
+    "otlp_headers": {},
+    "service_name": "gohighlevel-intakeq-integration",
+    "sample_rate": 1.0,
+    "batch_size": 256,
+    "flush_interval": 2.0,
+    "max_queue": 10000
+}
+
+# Span kinds (values of the OTLP SpanKind enum)
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+def new_trace_id():
+    """A random 128-bit trace id as 32 hex digits."""
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id():
+    """A random 64-bit span id as 16 hex digits."""
+    return f"{random.getrandbits(64):016x}"
+
+
+def parse_incoming(traceparent=None, correlation_id=None):
+    """
+    Read the trace context a caller sent.
+
+    Args:
+        traceparent (str): W3C traceparent header
+        correlation_id (str): X-Correlation-ID header
+
+    Returns:
+        tuple: (trace_id, parent_span_id); either may be None
+    """
+    if traceparent:
+        match = _TRACEPARENT.match(traceparent.strip().lower())
+        if match and match.group(1) != "0" * 32:
+            return match.group(1), match.group(2)
+    if correlation_id:
+        correlation_id = correlation_id.strip().lower().replace("-", "")
+        if _TRACE_ID.match(correlation_id):
+            return correlation_id, None
+    return None, None
+
+
+class Span:
+    """A timed operation; use as a context manager to make it the current span."""
+
+    __slots__ = (
+        "tracer", "name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "status", "status_message", "_token"
+    )
+
+    def __init__(self, tracer, name, kind, trace_id, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.status = None
+        self.status_message = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        """Attach a string, number or boolean to the span."""
+        self.attributes[key] = value
+
+    def set_error(self, message):
+        """Mark the span as failed."""
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        _current.reset(self._token)
+        self.tracer.finish(self)
+
+    def to_dict(self):
+        """The span as written to the trace file."""
+        entry = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes
+        }
+        if self.status == STATUS_ERROR:
+            entry["error"] = self.status_message
+        return entry
+
+
+class _UnsampledSpan:
+    """Root of a trace that is not recorded: it only carries the correlation id."""
+
+    __slots__ = ("trace_id", "_token")
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self._token = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+
+
+class _NoopSpan:
+    """Stands in for spans that are not recorded (tracing disabled or trace unsampled)."""
+
+    __slots__ = ()
+
+    trace_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span):
+    entry = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": span.status or STATUS_UNSET}
+    }
+    if span.parent_id:
+        entry["parentSpanId"] = span.parent_id
+    if span.status_message:
+        entry["status"]["message"] = span.status_message
+    return entry
+
+
+class FileSpanSink:
+    """Appends spans to a local file as JSON lines (one span per line)."""
+
+    def __init__(self, path):
+        """
+        Initialize the sink.
+
+        Args:
+            path (str): File to append to
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, spans):
+        """Append a batch of finished spans."""
+        data = "".join(json_codec.dumps_text(span.to_dict()) + "\n" for span in spans).encode("utf-8")
+        # One O_APPEND write per batch so lines from several worker processes do not interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+class OtlpHttpSpanSink:
+    """Posts spans to an OpenTelemetry collector's OTLP/HTTP endpoint (JSON encoding)."""
+
+    def __init__(self, endpoint, service_name, headers=None, timeout=5.0):
+        """
+        Initialize the sink.
+
+        Args:
+            endpoint (str): Traces URL, e.g. http://127.0.0.1:4318/v1/traces
+            service_name (str): service.name resource attribute
+            headers (dict): Extra request headers (e.g. collector auth)
+            timeout (float): Seconds to wait for the collector
+        """
+        self.endpoint = endpoint
+        self.resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def write(self, spans):
+        """Send a batch of finished spans."""
+        body = {
+            "resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{"scope": {"name": "src.utils.tracing"}, "spans": [_otlp_span(s) for s in spans]}]
+            }]
+        }
+        response = self.session.post(
+            self.endpoint, data=json_codec.dumps(body), headers=self.headers, timeout=self.timeout
+        )
+        if response.status_code >= 400:
+            raise IOError(f"Collector answered {response.status_code}")
+
+
+class Tracer:
+    """Creates spans and exports the finished ones in batches from a background thread."""
+
+    def __init__(self, sink, sample_rate=1.0, batch_size=256, flush_interval=2.0, max_queue=10000):
+        """
+        Initialize the tracer.
+
+        Args:
+            sink (FileSpanSink): Where batches of finished spans are written
+            sample_rate (float): Fraction of traces recorded
+            batch_size (int): Spans written at once
+            flush_interval (float): Seconds a partial batch may wait
+            max_queue (int): Finished spans held before new ones are dropped
+        """
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_queue)
+        self._exporter_pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.started = 0
+        self.exported = 0
+        self.dropped = 0
+        self.export_failures = 0
+
+    def start_span(self, name, kind=INTERNAL, attributes=None, trace_id=None, parent_id=None):
+        """
+        Start a span as a child of the current span, or as the root of a new trace.
+
+        Args:
+            name (str): Operation name
+            kind (int): INTERNAL, SERVER or CLIENT
+            attributes (dict): Initial attributes
+            trace_id (str): Trace id for a root span (e.g. from the caller's traceparent)
+            parent_id (str): The caller's span id for a root span
+
+        Returns:
+            Span: The span (not yet current; use it with ``with``)
+        """
+        parent = _current.get()
+        if parent is None:
+            trace_id = trace_id or new_trace_id()
+            if self.sample_rate < 1 and random.random() >= self.sample_rate:
+                return _UnsampledSpan(trace_id)
+        elif isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            return NOOP_SPAN
+        self.started += 1
+        return Span(self, name, kind, trace_id, parent_id, attributes)
+
+    def finish(self, span):
+        """Queue a finished span for export."""
+        self._ensure_exporter()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_exporter(self):
+        """Start the export thread in this process (threads do not survive fork)."""
+        if self._exporter_pid == os.getpid():
+            return
+        with self._lock:
+            if self._exporter_pid == os.getpid():
+                return
+            if self._exporter_pid is None:
+                atexit.register(self.shutdown)
+            self._exporter_pid = os.getpid()
+            self._stop.clear()
+            threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True).start()
+
+    def _export_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _export_batch(self):
+        """Write up to batch_size queued spans; returns how many were taken off the queue."""
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return 0
+        try:
+            self.sink.write(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.export_failures += 1
+            logging.warning("Failed to export %s spans: %s", len(batch), e)
+        return len(batch)
+
+    def flush(self):
+        """Write every queued span now."""
+        while self._export_batch():
+            pass
+
+    def shutdown(self):
+        """Stop the export thread and write what is left."""
+        self._stop.set()
+        self.flush()
+
+    def stats(self):
+        """
+        Tracer counters.
+
+        Returns:
+            dict: Spans started, exported, dropped and queued, and failed exports
+        """
+        return {
+            "sample_rate": self.sample_rate,
+            "spans_started": self.started,
+            "spans_exported": self.exported,
+            "spans_dropped": self.dropped,
+            "spans_queued": self._queue.qsize(),
+            "export_failures": self.export_failures
+        }
+
+
+_tracer = None
+
+
+def configure_tracing(tracing_config=None):
+    """
+    Install the process-wide tracer described by the "tracing" block of config.json.
+
+    TRACING_ENABLED and OTEL_EXPORTER_OTLP_TRACES_ENDPOINT override the config.
+
+    Args:
+        tracing_config (dict): Tracing settings
+
+    Returns:
+        Tracer: The tracer, or None if tracing is disabled
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.shutdown()
+        _tracer = None
+    settings = dict(DEFAULT_TRACING_CONFIG)
+    settings.update(tracing_config or {})
+    otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+    if otlp_endpoint:
+        settings.update(exporter="otlp", otlp_endpoint=otlp_endpoint)
+    enabled = os.getenv("TRACING_ENABLED")
+    if not (enabled.lower() == "true" if enabled else settings["enabled"]):
+        return None
+
+    if settings["exporter"] == "otlp":
+        sink = OtlpHttpSpanSink(settings["otlp_endpoint"], settings["service_name"], settings["otlp_headers"])
+        logging.info("Exporting traces to %s", settings['otlp_endpoint'])
+    else:
+        sink = FileSpanSink(settings["path"])
+        logging.info("Writing traces to %s", settings['path'])
+    _tracer = Tracer(
+        sink,
+        sample_rate=float(settings["sample_rate"]),
+        batch_size=settings["batch_size"],
+        flush_interval=settings["flush_interval"],
+        max_queue=settings["max_queue"]
+    )
+    return _tracer
+
+
+def get_tracer():
+    """The process-wide tracer, or None if tracing is disabled."""
+    return _tracer
+
+
+def start_span(name, kind=INTERNAL, attributes=None, trace_id=None, parent_id=None):
+    """
+    Start a span with the process-wide tracer (see Tracer.start_span).
+
+    Returns:
+        Span: The span, or a no-op span if tracing is disabled
+    """
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_span(name, kind, attributes, trace_id, parent_id)
+
+
+def current_span():
+    """
+    The span open in this thread or task, for adding attributes to it.
+
+    Returns:
+        Span: The span, or a no-op span if none is being recorded
+    """
+    span = _current.get()
+    return span if span is not None else NOOP_SPAN
+
+
+def current_trace_id():
+    """The correlation id of the request being handled by this thread or task, if any."""
+    span = _current.get()
+    return span.trace_id if span is not None else None
+
+
+def shutdown_tracing():
+    """Write the spans still queued (e.g. when a worker process exits)."""
+    if _tracer is not None:
+        _tracer.shutdown()
@@ -44,10 +44,10 @@ def simulate_webhook_event():
     # Process the webhook
     try:
         result = process_webhook(webhook_payload)
-        logging.info(f"Webhook processing result: {result}")
+        logging.info("Webhook processing result: %s", result)
         return result
     except Exception as e:
-        logging.error(f"Error processing webhook: {str(e)}")
+        logging.error("Error processing webhook: %s", e)
         raise
 
 def test_intakeq_api():
@@ -75,10 +75,10 @@ def test_intakeq_api():
             logging.info("Successfully connected to IntakeQ API")
             return True
         else:
-            logging.error(f"Failed to connect to IntakeQ API: {response.status_code} - {response.text}")
+            logging.error("Failed to connect to IntakeQ API: %s - %s", response.status_code, response.text)
             return False
     except Exception as e:
-        logging.error(f"Error connecting to IntakeQ API: {str(e)}")
+        logging.error("Error connecting to IntakeQ API: %s", e)
         return False
 
 def main():
@@ -0,0 +1,36 @@
+"""
+Shared fixtures: a fault-injecting stub upstream per test.
+"""
+
+import pytest
+
+from benchmarks.stub_server import start_stub_server
+from src.api import circuit_breaker, retry
+
+
+@pytest.fixture
+def stub():
+    """A fresh stub server; its ``base_url`` points at the IntakeQ API root."""
+    server = start_stub_server(retry_after=0)
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_upstream_state():
+    """Give each test its own retry budgets and circuit breakers."""
+    retry._budgets.clear()
+    circuit_breaker._breakers.clear()
+    yield
+    retry._budgets.clear()
+    circuit_breaker._breakers.clear()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff sleeps instead of waiting them out."""
+    recorded = []
+    monkeypatch.setattr("src.api.intakeq_client.time.sleep", recorded.append)
+    return recorded
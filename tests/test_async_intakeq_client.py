@@ -0,0 +1,44 @@
+"""
+Tests for the async IntakeQ client against the stub.
+"""
+
+import asyncio
+
+from src.api.async_intakeq_client import AsyncIntakeQClient
+
+
+def run(stub, coroutine_fn, **options):
+    """Run coroutine_fn(client) with a client for the stub, closing it afterwards."""
+    async def main():
+        async with AsyncIntakeQClient(api_key="test-key", base_url=stub.base_url, **options) as client:
+            return await coroutine_fn(client)
+    return asyncio.run(main())
+
+
+def test_create_clients_keeps_order(stub):
+    batch = [{"FirstName": f"User{i}", "Email": f"user{i}@example.com"} for i in range(10)]
+
+    results = run(stub, lambda client: client.create_clients(batch), max_concurrency=3)
+
+    assert [result["Email"] for result in results] == [data["Email"] for data in batch]
+    assert len(stub.state.clients) == 10
+
+
+def test_duplicate_emails_create_one_client(stub):
+    stub.state.request_latency = 0.05
+    batch = [{"FirstName": "Dup", "Email": "dup@example.com"}] * 5
+
+    results = run(stub, lambda client: client.create_clients(batch))
+
+    assert len(stub.state.clients) == 1
+    assert len({result["ClientId"] for result in results}) == 1
+
+
+def test_differing_payloads_for_one_email_update_the_same_client(stub):
+    stub.state.request_latency = 0.05
+    batch = [{"FirstName": f"Take{i}", "Email": "same@example.com"} for i in range(3)]
+
+    results = run(stub, lambda client: client.create_clients(batch))
+
+    assert len(stub.state.clients) == 1
+    assert len({result["ClientId"] for result in results}) == 1
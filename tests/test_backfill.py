@@ -0,0 +1,88 @@
+"""
+Tests that an interrupted backfill resumes from its last checkpointed page.
+"""
+
+import json
+
+import pytest
+
+from benchmarks.bench_server import isolated_config
+from benchmarks.fixtures import make_contact
+from src.jobs.backfill import Backfill, BackfillError, file_pages
+from src.utils.app_context import AppContext
+
+
+@pytest.fixture
+def export(tmp_path):
+    """Five paid contacts, read two per page."""
+    path = tmp_path / "export.jsonl"
+    path.write_text("".join(json.dumps({**make_contact(i), "tags": ["paid"]}) + "\n" for i in range(5)))
+    return str(path)
+
+
+@pytest.fixture
+def backfill(tmp_path):
+    """A dry-run backfill that records which contacts it synced."""
+    context = AppContext(isolated_config(str(tmp_path)))
+    backfill = Backfill(context, concurrency=2, dry_run=True, checkpoint_path=str(tmp_path / "checkpoint.json"))
+    backfill.synced = []
+    sync = backfill._sync
+
+    def recording_sync(contact):
+        backfill.synced.append(contact.id)
+        return sync(contact)
+
+    backfill._sync = recording_sync
+    return backfill
+
+
+def interrupted_after(pages, count):
+    """Page source that fails after `count` pages, as a lost connection would."""
+    def source(cursor):
+        for page_no, page in enumerate(file_pages(pages, 2, cursor)):
+            if page_no == count:
+                raise BackfillError("connection lost")
+            yield page
+    return source
+
+
+def test_interrupted_run_resumes_after_last_finished_page(export, backfill):
+    with pytest.raises(BackfillError):
+        backfill.run(interrupted_after(export, 2), "file:export")
+    with open(backfill.checkpoint_path) as f:
+        checkpoint = json.load(f)
+    assert checkpoint["cursor"] == {"offset": 4} and not checkpoint["done"]
+
+    backfill.synced.clear()
+    summary = backfill.run(lambda cursor: file_pages(export, 2, cursor), "file:export")
+
+    assert backfill.synced == ["contact-4"]
+    # Counts carry over from the interrupted run
+    assert summary["counts"]["mapped"] == 5
+
+
+def test_finished_run_is_not_repeated(export, backfill):
+    backfill.run(lambda cursor: file_pages(export, 2, cursor), "file:export")
+    backfill.synced.clear()
+
+    summary = backfill.run(lambda cursor: file_pages(export, 2, cursor), "file:export")
+
+    assert summary["resumed"] is True
+    assert backfill.synced == []
+
+
+def test_checkpoint_of_other_source_is_refused(export, backfill):
+    with pytest.raises(BackfillError):
+        backfill.run(interrupted_after(export, 1), "file:export")
+
+    with pytest.raises(BackfillError, match="use --restart"):
+        backfill.run(lambda cursor: file_pages(export, 2, cursor), "location:LOC123")
+
+
+def test_restart_ignores_the_checkpoint(export, backfill):
+    backfill.run(lambda cursor: file_pages(export, 2, cursor), "file:export")
+    backfill.synced.clear()
+
+    backfill.run(lambda cursor: file_pages(export, 2, cursor), "file:export", resume=False)
+
+    assert sorted(backfill.synced) == [f"contact-{i}" for i in range(5)]
@@ -0,0 +1,81 @@
+"""
+Tests that client and GLP-1 form digests are tracked apart in sync_contact,
+and that the SQLite digest store drops expired rows.
+"""
+
+import json
+import time
+
+import pytest
+
+from benchmarks.bench_server import isolated_config
+from src.handlers.webhook_handler import process_form_submission, sync_contact
+from src.utils import change_detector
+from src.utils.app_context import AppContext
+from src.utils.change_detector import SQLiteChangeDetector
+from src.utils.payload_normalizer import normalize_contact
+
+CONTACT = normalize_contact({
+    "id": "c1",
+    "firstName": "Ada",
+    "email": "ada@example.com",
+    "customFields": [{"key": "current_weight", "field_value": "180"}]
+})
+
+
+@pytest.fixture
+def context(stub, tmp_path):
+    """An application context syncing to the stub, without enrichment, retries or a form window."""
+    config_path = isolated_config(str(tmp_path))
+    with open(config_path) as f:
+        config = json.load(f)
+    config["contact_enrichment"]["enabled"] = False
+    config["retry"] = {"max_attempts": 1}
+    config["glp1_forms"]["window"] = 0
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+    return AppContext(config_path, settings={"intakeq_api_key": "test-key", "intakeq_base_url": stub.base_url})
+
+
+def claim_form(context):
+    """Take the queued form submission off the queue."""
+    job = context.form_queue.claim()
+    assert job is not None
+    context.form_queue.complete(job[0])
+    return job[1]
+
+
+def test_failed_form_is_queued_again_on_identical_redelivery(stub, context):
+    assert sync_contact(CONTACT, context)["status"] == "success"
+    payload = claim_form(context)
+
+    stub.state.error_rate = 1.0
+    assert process_form_submission(payload, context)["status"] == "error"
+    stub.state.error_rate = 0.0
+
+    # The client is unchanged, but the form never made it
+    assert sync_contact(CONTACT, context)["status"] == "unchanged"
+    assert process_form_submission(claim_form(context), context)["status"] == "success"
+    assert len(stub.state.intakes) == 1
+
+
+def test_submitted_form_is_not_queued_again(stub, context):
+    sync_contact(CONTACT, context)
+    assert process_form_submission(claim_form(context), context)["status"] == "success"
+
+    assert sync_contact(CONTACT, context)["status"] == "unchanged"
+    assert context.form_queue.claim() is None
+
+
+def test_expired_digests_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_detector, "PRUNE_EVERY", 3)
+    detector = SQLiteChangeDetector(str(tmp_path / "digests.sqlite3"), ttl=0.05)
+    detector.record("old", "d1", 1)
+    detector.record_form("old", "f1", 1)
+    time.sleep(0.1)
+
+    # The third write prunes the two that expired
+    detector.record("new", "d2", 2)
+
+    rows = detector._db.connection().execute("SELECT contact_id FROM contact_digests").fetchall()
+    assert rows == [("new",)]
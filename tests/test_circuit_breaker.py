@@ -0,0 +1,96 @@
+"""
+Tests for circuit breaker state transitions.
+"""
+
+import pytest
+
+from src.api.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def open_breaker(**kwargs):
+    breaker = CircuitBreaker("breaker.test", failure_threshold=2, recovery_timeout=60, **kwargs)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def recover(breaker):
+    """Move the breaker's clock past its recovery timeout."""
+    breaker.opened_at -= breaker.recovery_timeout
+
+
+def test_consecutive_failures_open_the_circuit():
+    breaker = CircuitBreaker("breaker.test", failure_threshold=2)
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("breaker.test", failure_threshold=2)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_open_circuit_rejects_requests():
+    breaker = open_breaker()
+
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_request()
+
+    assert 0 < raised.value.retry_after <= 60
+    assert breaker.rejected == 1
+
+
+def test_half_open_limits_trial_requests():
+    breaker = open_breaker()
+    recover(breaker)
+
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_trial_success_closes_the_circuit():
+    breaker = open_breaker()
+    recover(breaker)
+    breaker.before_request()
+
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    breaker.before_request()
+
+
+def test_trial_failure_opens_the_circuit_again():
+    breaker = open_breaker()
+    recover(breaker)
+    breaker.before_request()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_released_trial_slot_can_be_taken_again():
+    breaker = open_breaker()
+    recover(breaker)
+    breaker.before_request()
+
+    # e.g. the rate limiter rejected the request before it was sent
+    breaker.release()
+
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
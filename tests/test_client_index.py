@@ -0,0 +1,56 @@
+"""
+Tests for the precedence of ClientIndex matches.
+"""
+
+import pytest
+
+from src.utils.client_index import ClientIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ClientIndex(str(tmp_path / "index.sqlite3"))
+    index.rebuild([
+        {"ClientId": 1, "FirstName": "Ada", "LastName": "Lovelace", "Email": "ada@example.com",
+         "Phone": "555-010-0001", "DateOfBirth": "1990-04-02"},
+        {"ClientId": 2, "FirstName": "Ada", "LastName": "Byron", "Email": "byron@example.com",
+         "Phone": "555-010-0002", "DateOfBirth": "1990-04-02"},
+        # Twins sharing a household phone
+        {"ClientId": 3, "FirstName": "Tom", "LastName": "Twin", "Phone": "555-010-0003", "DateOfBirth": "2001-01-01"},
+        {"ClientId": 4, "FirstName": "Tim", "LastName": "Twin", "Phone": "555-010-0003", "DateOfBirth": "2001-01-01"}
+    ])
+    return index
+
+
+def test_email_wins_over_name_dob_and_phone(index):
+    client_id = index.match(
+        email="ADA@example.com", phone="555-010-0002", first_name="Ada", last_name="Byron", dob="1990-04-02"
+    )
+
+    assert client_id == 1
+
+
+def test_name_dob_wins_over_phone(index):
+    client_id = index.match(
+        email="unknown@example.com", phone="(555) 010-0001", first_name="ada", last_name="byron", dob="04/02/1990"
+    )
+
+    assert client_id == 2
+
+
+def test_phone_matches_only_with_same_last_name(index):
+    assert index.match(phone="+1 555 010 0001", last_name="Lovelace") == 1
+    assert index.match(phone="+1 555 010 0001", last_name="Smith") is None
+
+
+def test_ambiguous_matches_are_misses(index):
+    # Two clients share the phone, and no client has this name+DOB
+    assert index.match(phone="555-010-0003", first_name="Tam", last_name="Twin", dob="2001-01-01") is None
+    assert index.match(first_name="Tom", last_name="Twin", dob="2001-01-01") == 3
+    assert index.stats()["misses"] == 1
+
+
+def test_match_email_ignores_fuzzy_matches(index):
+    assert index.match_email("ada@example.com") == 1
+    assert index.match_email(None) is None
+    assert index.match(first_name="Ada", last_name="Byron", dob="1990-04-02") == 2
@@ -0,0 +1,74 @@
+"""
+Tests for contact cache invalidation shared between worker processes.
+"""
+
+import pytest
+
+from src.utils.contact_cache import ContactCache, SQLiteInvalidationLog
+
+
+class Upstream:
+    """Counts fetches and serves a version number that changes on update."""
+
+    def __init__(self):
+        self.fetches = 0
+        self.version = 1
+        self.on_fetch = None
+
+    def fetch(self, headers):
+        self.fetches += 1
+        contact = {"id": "c1", "version": self.version}
+        if self.on_fetch is not None:
+            self.on_fetch()
+        return contact, {"status_code": 200, "etag": None, "last_modified": None}
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two caches sharing one invalidation log, as two gunicorn workers would."""
+    path = str(tmp_path / "invalidations.sqlite3")
+    return (
+        ContactCache(invalidation_log=SQLiteInvalidationLog(path, retention=300)),
+        ContactCache(invalidation_log=SQLiteInvalidationLog(path, retention=300))
+    )
+
+
+def test_invalidation_reaches_other_worker(workers):
+    first, second = workers
+    upstream = Upstream()
+    first.get("c1", upstream.fetch)
+    second.get("c1", upstream.fetch)
+
+    upstream.version = 2
+    second.invalidate("c1")
+
+    assert first.get("c1", upstream.fetch)["version"] == 2
+    assert first.stats()["shared_invalidations"] == 1
+    # The refetched contact is cached again
+    assert first.get("c1", upstream.fetch)["version"] == 2
+    assert upstream.fetches == 3
+
+
+def test_fetch_in_flight_during_remote_invalidation_is_not_served_again(workers):
+    first, second = workers
+    upstream = Upstream()
+    # Another worker invalidates while this worker's fetch is on the wire
+    upstream.on_fetch = lambda: second.invalidate("c1")
+
+    assert first.get("c1", upstream.fetch)["version"] == 1
+    upstream.on_fetch = None
+    upstream.version = 2
+
+    assert first.get("c1", upstream.fetch)["version"] == 2
+    assert upstream.fetches == 2
+
+
+def test_without_log_invalidation_stays_local(tmp_path):
+    first, second = ContactCache(), ContactCache()
+    upstream = Upstream()
+    first.get("c1", upstream.fetch)
+
+    second.invalidate("c1")
+
+    assert first.get("c1", upstream.fetch)["version"] == 1
+    assert upstream.fetches == 1
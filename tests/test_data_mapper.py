@@ -0,0 +1,61 @@
+"""
+Tests for the legacy mapper helpers' choice of mapping plan.
+"""
+
+import json
+
+import pytest
+
+from src.utils.data_mapper import map_contact_to_client
+from src.utils.glp1_field_mapping import extract_glp1_custom_fields, map_glp1_fields_to_intakeq_form
+from src.utils.mapping_engine import MappingLoader
+
+MAPPINGS = {
+    "version": 1,
+    "client_fields": [{"key": "Goal?", "field_id": "custom_goal"}],
+    "glp1_form": {
+        "name": "Custom GLP-1 Form",
+        "fields": [{"key": "current_weight", "field_id": "q_weight", "type": "number"}]
+    }
+}
+
+CONTACT = {
+    "id": "c1",
+    "firstName": "Ada",
+    "email": "ada@example.com",
+    "customFields": [
+        {"key": "Goal?", "field_value": "Lose 10 lbs"},
+        {"key": "current_weight", "field_value": "180"},
+        {"key": "target_weight", "field_value": "160"}
+    ]
+}
+
+
+@pytest.fixture
+def custom_plan(tmp_path):
+    """The plan compiled from MAPPINGS."""
+    mappings_path = tmp_path / "mappings.json"
+    mappings_path.write_text(json.dumps(MAPPINGS))
+    return MappingLoader(str(mappings_path)).plan
+
+
+def test_helpers_default_to_the_default_mapping_file():
+    glp1_fields = extract_glp1_custom_fields(CONTACT)
+
+    assert glp1_fields == {"current_weight": "180", "target_weight": "160"}
+    assert map_glp1_fields_to_intakeq_form(glp1_fields)["formName"] == "GLP-1 Intake Questions Medical History"
+    assert "custom_goal" not in [field["FieldId"] for field in map_contact_to_client(CONTACT)["CustomFields"]]
+
+
+def test_map_contact_to_client_uses_given_plan(custom_plan):
+    client_data = map_contact_to_client(CONTACT, custom_plan)
+
+    assert client_data["CustomFields"] == [{"FieldId": "custom_goal", "Value": "Lose 10 lbs"}]
+
+
+def test_glp1_helpers_use_given_plan(custom_plan):
+    glp1_fields = extract_glp1_custom_fields(CONTACT, custom_plan)
+    form = map_glp1_fields_to_intakeq_form(glp1_fields, custom_plan)
+
+    assert glp1_fields == {"current_weight": "180"}
+    assert form == {"formName": "Custom GLP-1 Form", "fields": [{"id": "q_weight", "value": "180"}]}
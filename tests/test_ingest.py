@@ -0,0 +1,95 @@
+"""
+Tests that queued webhooks keep their delivery's X-Idempotency-Key.
+"""
+
+import json
+import sqlite3
+
+from benchmarks.bench_server import isolated_config
+from benchmarks.fixtures import make_webhook_payload
+from src.api.webhook_server import create_app
+from src.jobs.job_queue import SQLiteJobQueue
+
+KEY = {"X-Idempotency-Key": "delivery-1"}
+
+
+def delivery(attempt):
+    """The same delivery as GoHighLevel resends it: identical key, a new timestamp in the body."""
+    payload = make_webhook_payload(1)
+    del payload["webhookId"]
+    payload["timestamp"] = f"2026-10-18T00:00:0{attempt}Z"
+    return payload
+
+
+def make_app(stub, tmp_path, monkeypatch, ingest_mode):
+    config_path = isolated_config(str(tmp_path))
+    with open(config_path) as f:
+        config = json.load(f)
+    config["contact_enrichment"]["enabled"] = False
+    config["ghl_oauth"]["enabled"] = False
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+    monkeypatch.setenv("CONFIG_PATH", config_path)
+    monkeypatch.setenv("INGEST_MODE", ingest_mode)
+    monkeypatch.setenv("INTAKEQ_API_KEY", "test-key")
+    monkeypatch.setenv("INTAKEQ_BASE_URL", stub.base_url)
+    return create_app(start_workers=False)
+
+
+def drain(app):
+    """Run every queued webhook through the ingest worker pool."""
+    queue, pool = app.config["JOB_QUEUE"], app.config["WORKER_POOLS"][0]
+    job = queue.claim()
+    while job is not None:
+        pool._process(*job)
+        job = queue.claim()
+
+
+def test_async_ingest_records_result_under_header_key(stub, tmp_path, monkeypatch):
+    app = make_app(stub, tmp_path, monkeypatch, "async")
+    client = app.test_client()
+
+    assert client.post("/webhook/gohighlevel", json=delivery(1), headers=KEY).status_code == 202
+    drain(app)
+    redelivered = client.post("/webhook/gohighlevel", json=delivery(2), headers=KEY)
+
+    assert redelivered.status_code == 200
+    assert redelivered.get_json()["duplicate"] is True
+    assert app.config["JOB_QUEUE"].claim() is None
+    assert len(stub.state.clients) == 1
+
+
+def test_spilled_webhook_keeps_header_key(stub, tmp_path, monkeypatch):
+    app = make_app(stub, tmp_path, monkeypatch, "sync")
+    client = app.test_client()
+    stub.state.error_rate = 1.0
+    # Failures open the IntakeQ circuit; the next delivery is spilled to the retry store
+    for _ in range(10):
+        if client.post("/webhook/gohighlevel", json=delivery(1), headers=KEY).status_code == 202:
+            break
+    stub.state.error_rate = 0.0
+
+    # Held back until the circuit may have recovered, so read the row directly
+    rows = app.config["JOB_QUEUE"]._connection().execute("SELECT idempotency_key FROM jobs").fetchall()
+
+    assert rows == [("delivery-1",)]
+
+
+def test_queue_created_without_key_column_is_upgraded(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, enqueued_at REAL NOT NULL, available_at REAL NOT NULL, "
+            "claimed_at REAL, last_error TEXT)"
+        )
+        conn.execute(
+            "INSERT INTO jobs (payload, status, enqueued_at, available_at) VALUES ('{\"id\": 1}', 'pending', 0, 0)"
+        )
+
+    upgraded = SQLiteJobQueue(path)
+    upgraded.enqueue({"id": 2}, idempotency_key="delivery-2")
+
+    assert upgraded.claim()[1:] == ({"id": 1}, 1, None)
+    assert upgraded.claim()[1:] == ({"id": 2}, 1, "delivery-2")
+
@@ -0,0 +1,79 @@
+"""
+Tests for claiming, retrying and dead-lettering jobs in the SQLite job queue.
+"""
+
+from src.jobs.job_queue import SQLiteJobQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    return SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), **kwargs)
+
+
+def test_jobs_are_claimed_once_in_order(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.enqueue({"id": 1})
+    second = queue.enqueue({"id": 2})
+
+    assert queue.claim() == (first, {"id": 1}, 1, None)
+    assert queue.claim() == (second, {"id": 2}, 1, None)
+    assert queue.claim() is None
+
+    queue.complete(first)
+    queue.complete(second)
+    assert queue.depth() == {"pending": 0, "processing": 0, "failed": 0}
+
+
+def test_delayed_job_is_not_claimed_early(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue({"id": 1}, delay=60)
+
+    assert queue.claim() is None
+    assert queue.depth()["pending"] == 1
+
+
+def test_failed_job_is_retried_after_backoff(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=3, retry_delay=60)
+    job_id = queue.enqueue({"id": 1})
+    queue.fail(job_id, queue.claim()[2], "503")
+
+    # Held back for retry_delay
+    assert queue.claim() is None
+
+    queue._connection().execute("UPDATE jobs SET available_at = 0 WHERE id = ?", (job_id,))
+    assert queue.claim() == (job_id, {"id": 1}, 2, None)
+    assert queue.metrics.retried == 1
+
+
+def test_job_is_dead_lettered_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2, retry_delay=0)
+    job_id = queue.enqueue({"id": 1})
+
+    for _ in range(2):
+        _, _, attempts, _ = queue.claim()
+        queue.fail(job_id, attempts, "503")
+
+    assert queue.claim() is None
+    assert queue.depth() == {"pending": 0, "processing": 0, "failed": 1}
+    assert queue.stats()["failed_total"] == 1
+    row = queue._connection().execute("SELECT last_error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert row == ("503",)
+
+
+def test_deferred_job_keeps_its_attempt(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    job_id = queue.enqueue({"id": 1})
+    queue.claim()
+
+    queue.defer(job_id, 0, "circuit open")
+
+    # Still on its first attempt, so a failure now is the one that dead-letters it
+    assert queue.claim()[2] == 1
+
+
+def test_abandoned_claim_is_claimable_after_visibility_timeout(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0)
+    job_id = queue.enqueue({"id": 1})
+    queue.claim()
+
+    # The worker that claimed it never completed or failed it
+    assert queue.claim() == (job_id, {"id": 1}, 2, None)
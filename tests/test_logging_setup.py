@@ -0,0 +1,76 @@
+"""
+Tests for the startup log buffer and log files under pre-forked workers.
+"""
+
+import logging
+import logging.handlers
+
+import pytest
+
+from src.utils import logging_setup
+from src.utils.logging_setup import StartupBufferHandler, configure_logging, restart_logging, stop_logging
+
+
+def record(i):
+    return logging.LogRecord("test", logging.INFO, __file__, 0, "record %d", (i,), None)
+
+
+def test_startup_buffer_keeps_newest_records_without_target():
+    buffer = StartupBufferHandler(3)
+
+    for i in range(10):
+        buffer.handle(record(i))
+
+    assert [r.getMessage() for r in buffer.buffer] == ["record 7", "record 8", "record 9"]
+    assert buffer.dropped == 7
+
+
+def test_startup_buffer_is_handed_over(tmp_path):
+    path = tmp_path / "app.log"
+    root = logging.getLogger()
+    buffer = StartupBufferHandler(2)
+    root.addHandler(buffer)
+    for i in range(3):
+        root.warning("startup %d", i)
+
+    configure_logging({"path": str(path), "console": False, "format": "text"})
+    stop_logging()
+
+    lines = path.read_text().splitlines()
+    assert [line.rsplit(" - ", 1)[1] for line in lines] == [
+        "startup 1", "startup 2", "Dropped 1 startup log records over the buffer's capacity"
+    ]
+    assert buffer not in root.handlers
+
+
+@pytest.fixture
+def forked(monkeypatch):
+    """Leave logging as a fork does: the listener thread gone, the pid changed."""
+    def fork():
+        logging_setup._listener.stop()
+        monkeypatch.setattr(logging_setup, "_listener_pid", -1)
+    yield fork
+    stop_logging()
+
+
+def test_forked_worker_does_not_rotate_shared_file(tmp_path, forked):
+    path = tmp_path / "app.log"
+    configure_logging({"path": str(path), "console": False, "max_bytes": 100, "backup_count": 1})
+
+    forked()
+    restart_logging()
+    assert [type(h) for h in logging_setup._listener.handlers] == [logging.handlers.WatchedFileHandler]
+    for i in range(20):
+        logging.getLogger().info("worker line %d", i)
+    stop_logging()
+
+    assert not (tmp_path / "app.log.1").exists()
+    assert len(path.read_text().splitlines()) == 20
+
+
+def test_external_rotation_uses_watched_file(tmp_path):
+    listener = configure_logging({"path": str(tmp_path / "app.log"), "console": False, "rotation": "external"})
+    try:
+        assert [type(h) for h in listener.handlers] == [logging.handlers.WatchedFileHandler]
+    finally:
+        stop_logging()
@@ -0,0 +1,63 @@
+"""
+Tests for the compiled mapping plan's disk cache.
+"""
+
+import json
+import os
+import pickle
+
+from benchmarks.bench_server import ROOT
+from benchmarks.fixtures import make_contact
+from src.utils.mapping_engine import DEFAULT_MAPPINGS_PATH, compile_mapping_file
+
+MAPPINGS_PATH = os.path.join(ROOT, DEFAULT_MAPPINGS_PATH)
+
+
+def mapped(plan, contacts):
+    return [(m.client_data, m.glp1_fields, m.form_data, m.tags) for m in map(plan.map_contact, contacts)]
+
+
+def test_cached_plan_maps_like_compiled_plan(tmp_path):
+    cache_path = str(tmp_path / "mappings.compiled.json")
+    compiled = compile_mapping_file(MAPPINGS_PATH, cache_path)
+
+    cached = compile_mapping_file(MAPPINGS_PATH, cache_path)
+
+    contacts = [make_contact(i) for i in range(50)]
+    assert cached is not compiled
+    assert mapped(cached, contacts) == mapped(compiled, contacts)
+
+
+def test_stale_cache_is_recompiled(tmp_path):
+    cache_path = tmp_path / "mappings.compiled.json"
+    compile_mapping_file(MAPPINGS_PATH, str(cache_path))
+    cache = json.loads(cache_path.read_text())
+    cache["plan"]["glp1_form_name"] = "Stale"
+    cache["sha256"] = "0" * 64
+    cache_path.write_text(json.dumps(cache))
+
+    plan = compile_mapping_file(MAPPINGS_PATH, str(cache_path))
+
+    assert plan.glp1_form_name != "Stale"
+    assert json.loads(cache_path.read_text())["plan"]["glp1_form_name"] == plan.glp1_form_name
+
+
+class Exploit:
+    """Unpickling this would create the marker file."""
+
+    def __init__(self, marker):
+        self.marker = marker
+
+    def __reduce__(self):
+        return (open, (self.marker, "w"))
+
+
+def test_pickled_cache_is_never_unpickled(tmp_path):
+    cache_path = tmp_path / "mappings.compiled.json"
+    marker = tmp_path / "unpickled"
+    cache_path.write_bytes(pickle.dumps(Exploit(str(marker))))
+
+    plan = compile_mapping_file(MAPPINGS_PATH, str(cache_path))
+
+    assert plan.glp1_form_name
+    assert not marker.exists()
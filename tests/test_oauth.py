@@ -0,0 +1,253 @@
+"""
+Tests for the GoHighLevel token manager against the stub's OAuth endpoint.
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.api.oauth import ACQUIRED, OAuthError, OAuthToken, TokenManager, TokenStore
+
+LOCATION = "loc1"
+
+
+def make_manager(stub, path, **options):
+    """A manager without the background refresher, talking to the stub."""
+    options.setdefault("check_interval", 0)
+    return TokenManager(
+        "client-id", "client-secret", TokenStore(str(path)),
+        base_url=f"http://127.0.0.1:{stub.server_address[1]}", **options
+    )
+
+
+def authorize(stub, manager, ttl):
+    """Store a token for LOCATION that expires in ttl seconds."""
+    stub.state.token_ttl = ttl
+    token = manager.exchange_code(f"code-{LOCATION}")
+    stub.state.token_ttl = 3600
+    return token
+
+
+@pytest.fixture
+def token_path(tmp_path):
+    return tmp_path / "tokens.sqlite3"
+
+
+def run_concurrently(calls):
+    """Run each callable on its own thread, released together; returns their results."""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = calls[index]()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_exchange_code_stores_token(stub, token_path):
+    manager = make_manager(stub, token_path)
+
+    token = authorize(stub, manager, 3600)
+
+    assert token.location_id == LOCATION
+    assert manager.store.get(LOCATION).access_token == token.access_token
+    assert manager.get_token(LOCATION) == token.access_token
+    assert stub.state.token_refreshes == 0
+
+
+def test_unknown_location_raises(stub, token_path):
+    manager = make_manager(stub, token_path)
+
+    with pytest.raises(OAuthError) as raised:
+        manager.get_token("nowhere")
+    assert raised.value.status_code == 401
+
+
+def test_token_within_min_validity_is_refreshed(stub, token_path):
+    manager = make_manager(stub, token_path, min_validity=60)
+    token = authorize(stub, manager, 30)
+
+    refreshed = manager.get_token(LOCATION)
+
+    assert refreshed != token.access_token
+    assert stub.state.token_refreshes == 1
+    assert manager.store.get(LOCATION).access_token == refreshed
+
+
+def test_token_outside_min_validity_is_reused(stub, token_path):
+    manager = make_manager(stub, token_path, min_validity=60)
+    token = authorize(stub, manager, 90)
+
+    assert manager.get_token(LOCATION) == token.access_token
+    assert stub.state.token_refreshes == 0
+
+
+def test_refresh_due_renews_within_margin(stub, token_path):
+    manager = make_manager(stub, token_path, min_validity=60, refresh_margin=300)
+    token = authorize(stub, manager, 90)
+
+    assert manager.refresh_due() == 1
+
+    assert stub.state.token_refreshes == 1
+    assert manager.get_token(LOCATION) != token.access_token
+    # The renewed token is outside the margin, so the next check leaves it alone
+    assert manager.refresh_due() == 0
+
+
+def test_concurrent_refresh_is_single_flight(stub, token_path):
+    manager = make_manager(stub, token_path)
+    authorize(stub, manager, 30)
+    stub.state.request_latency = 0.1
+
+    results = run_concurrently([lambda: manager.get_token(LOCATION)] * 16)
+
+    assert stub.state.token_refreshes == 1
+    assert stub.state.invalid_grants == 0
+    assert len(set(results)) == 1
+
+
+def test_concurrent_renew_of_rejected_token_is_single_flight(stub, token_path):
+    manager = make_manager(stub, token_path)
+    token = authorize(stub, manager, 3600)
+    stub.state.request_latency = 0.1
+
+    results = run_concurrently([lambda: manager.renew(LOCATION, token.access_token)] * 8)
+
+    assert stub.state.token_refreshes == 1
+    assert len(set(results)) == 1
+    assert results[0] != token.access_token
+
+
+def test_managers_sharing_a_store_refresh_once(stub, token_path):
+    # Two managers on one file stand in for two worker processes
+    first = make_manager(stub, token_path)
+    second = make_manager(stub, token_path)
+    authorize(stub, first, 30)
+    stub.state.request_latency = 0.3
+
+    results = run_concurrently([lambda: first.get_token(LOCATION), lambda: second.get_token(LOCATION)])
+
+    assert stub.state.token_refreshes == 1
+    assert stub.state.invalid_grants == 0
+    assert len(set(results)) == 1
+    assert first.lease_waits + second.lease_waits > 0
+
+
+def test_waiter_adopts_token_saved_by_lease_holder(stub, token_path):
+    manager = make_manager(stub, token_path)
+    token = authorize(stub, manager, 30)
+    holder = TokenStore(str(token_path))
+    assert holder.acquire_lease(LOCATION, "other-process", 30, token.access_token)[0] == ACQUIRED
+
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(token=manager.get_token(LOCATION)))
+    waiter.start()
+    time.sleep(0.3)
+    assert waiter.is_alive()
+    holder.save(OAuthToken(LOCATION, "at-from-other-process", "rt-from-other-process", time.time() + 3600))
+    waiter.join(5)
+
+    assert result["token"] == "at-from-other-process"
+    assert manager.lease_waits > 0
+    assert stub.state.token_refreshes == 0
+
+
+def test_expired_lease_is_taken_over(stub, token_path):
+    manager = make_manager(stub, token_path, lease_timeout=0.5)
+    token = authorize(stub, manager, 30)
+    holder = TokenStore(str(token_path))
+    # A process that took the lease and died without saving or releasing it
+    holder.acquire_lease(LOCATION, "dead-process", 0.3, token.access_token)
+
+    refreshed = manager.get_token(LOCATION)
+
+    assert refreshed != token.access_token
+    assert manager.lease_waits > 0
+    assert stub.state.token_refreshes == 1
+
+
+def test_refresh_token_is_rotated(stub, token_path):
+    manager = make_manager(stub, token_path)
+    token = authorize(stub, manager, 3600)
+
+    manager.renew(LOCATION, token.access_token)
+    stored = manager.store.get(LOCATION)
+    manager.renew(LOCATION, stored.access_token)
+
+    assert stored.refresh_token != token.refresh_token
+    assert stub.state.token_refreshes == 2
+    assert stub.state.invalid_grants == 0
+
+
+def test_spent_refresh_token_raises_and_releases_lease(stub, token_path):
+    manager = make_manager(stub, token_path)
+    token = authorize(stub, manager, 30)
+    # Someone else already spent the refresh token
+    stub.state.refresh_tokens.clear()
+
+    with pytest.raises(OAuthError) as raised:
+        manager.get_token(LOCATION)
+
+    assert raised.value.status_code == 400
+    assert stub.state.invalid_grants == 1
+    assert manager.refresh_failures == 1
+    # The lease was released, so another process is not locked out
+    assert manager.store.acquire_lease(LOCATION, "other-process", 30, token.access_token)[0] == ACQUIRED
+
+
+def test_transient_refresh_failure_keeps_current_token(stub, token_path):
+    manager = make_manager(stub, token_path)
+    token = authorize(stub, manager, 30)
+    stub.state.error_rate = 1.0
+
+    assert manager.get_token(LOCATION) == token.access_token
+    assert manager.refresh_failures == 1
+    assert manager.store.acquire_lease(LOCATION, "other-process", 30, token.access_token)[0] == ACQUIRED
+
+
+class RemovedOnceStore(TokenStore):
+    """A store whose first read blocks, then finds the token gone (e.g. the app was uninstalled)."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.reading = threading.Event()
+        self.release = threading.Event()
+        self._first = True
+
+    def get(self, location_id):
+        if self._first:
+            self._first = False
+            self.reading.set()
+            self.release.wait(5)
+            return None
+        return super().get(location_id)
+
+
+def test_get_token_does_not_share_background_refresh(stub, token_path):
+    manager = make_manager(stub, token_path, min_validity=60)
+    authorize(stub, manager, 30)
+    manager.store = RemovedOnceStore(str(token_path))
+    result = {}
+
+    refresher = threading.Thread(target=manager.refresh_due)
+    refresher.start()
+    assert manager.store.reading.wait(5)
+    caller = threading.Thread(target=lambda: result.update(token=manager.get_token(LOCATION)))
+    caller.start()
+    caller.join(1)
+    manager.store.release.set()
+    refresher.join(5)
+    caller.join(5)
+
+    assert isinstance(result.get("token"), str)
+    assert stub.state.token_refreshes == 1
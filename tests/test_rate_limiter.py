@@ -0,0 +1,54 @@
+"""
+Tests for token-bucket refill in both rate limiter backends.
+"""
+
+import pytest
+
+from src.api.rate_limiter import InMemoryRateLimiter, SQLiteRateLimiter
+
+UPSTREAMS = {"api.test": {"default": {"rate": 10, "burst": 2}}}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteRateLimiter(str(tmp_path / "rate_limits.sqlite3"), UPSTREAMS, max_wait=0.05)
+    return InMemoryRateLimiter(UPSTREAMS, max_wait=0.05)
+
+
+def test_burst_then_wait_for_refill(limiter):
+    waits = [limiter._reserve("api.test:default", 10, 2, 100.0) for _ in range(4)]
+
+    # Two tokens of burst, then one slot every 1/rate seconds
+    assert waits == pytest.approx([0.0, 0.0, 0.1, 0.2])
+
+
+def test_tokens_refill_over_time(limiter):
+    for _ in range(3):
+        limiter._reserve("api.test:default", 10, 2, 100.0)
+
+    # 0.15s refills 1.5 tokens against the one borrowed
+    assert limiter._reserve("api.test:default", 10, 2, 100.15) == pytest.approx(0.05)
+
+
+def test_refill_is_capped_at_burst(limiter):
+    limiter._reserve("api.test:default", 10, 2, 100.0)
+
+    waits = [limiter._reserve("api.test:default", 10, 2, 200.0) for _ in range(3)]
+
+    assert waits == pytest.approx([0.0, 0.0, 0.1])
+
+
+def test_wait_beyond_max_wait_is_rejected_and_refunded(limiter):
+    assert limiter.reserve("http://api.test", "GET", "/clients") == 0.0
+    assert limiter.reserve("http://api.test", "GET", "/clients") == 0.0
+
+    assert limiter.reserve("http://api.test", "GET", "/clients") is None
+    assert limiter.rejected == 1
+    # The rejected reservation gave its token back: the next slot is still 1/rate away, not 2/rate
+    assert limiter._reserve("api.test:default", 10, 2, 0.0) == pytest.approx(0.1, abs=0.02)
+
+
+def test_unlisted_host_is_not_limited(limiter):
+    for _ in range(5):
+        assert limiter.reserve("http://other.test", "GET", "/clients") == 0.0
@@ -0,0 +1,86 @@
+"""
+Tests for reconciling GoHighLevel contacts against the IntakeQ client index.
+"""
+
+import json
+
+import pytest
+
+from benchmarks.bench_server import isolated_config
+from src.jobs import reconcile
+from src.utils.app_context import AppContext
+from src.utils.client_index import ClientIndex
+from src.utils.payload_normalizer import normalize_contact, normalize_payload
+
+# 1990-04-02 as IntakeQ returns it (Unix milliseconds)
+DOB_MILLIS = 639014400000
+
+CLIENT = {
+    "ClientId": 7,
+    "FirstName": "Ada",
+    "LastName": "Lovelace",
+    "Email": "ada@intakeq.example.com",
+    "DateOfBirth": DOB_MILLIS
+}
+
+# No email or phone in common with CLIENT: only name+DOB can match it
+CONTACT = {
+    "id": "c1",
+    "firstName": "Ada",
+    "lastName": "Lovelace",
+    "dateOfBirth": "1990-04-02",
+    "tags": ["paid"]
+}
+
+
+def test_contact_is_reconciled_by_name_and_dob(tmp_path):
+    index = ClientIndex(str(tmp_path / "index.sqlite3"))
+    index.rebuild([CLIENT])
+    pages = [([(normalize_contact(CONTACT), CONTACT["tags"])], None)]
+
+    report = reconcile.reconcile(index, pages)
+
+    assert report["counts"]["in_sync"] == 1
+    assert report["missing_in_intakeq"] == [] and report["intakeq_only"] == []
+
+
+def test_differing_dob_is_reported(tmp_path):
+    index = ClientIndex(str(tmp_path / "index.sqlite3"))
+    index.rebuild([{**CLIENT, "Email": "ada@example.com"}])
+    contact = {**CONTACT, "email": "ada@example.com", "dateOfBirth": "1990-04-03"}
+
+    report = reconcile.reconcile(index, [([(normalize_contact(contact), contact["tags"])], None)])
+
+    assert report["mismatched"] == [{"gohighlevel_contact_id": "c1", "intakeq_client_id": 7, "fields": ["dob"]}]
+
+
+def test_every_payload_format_carries_dob():
+    webhook = normalize_payload({"payload": {"contactId": "c1", "dateOfBirth": "1990-04-02"}})
+    direct = normalize_payload({"contact_id": "c1", "date_of_birth": "04/02/1990"})
+
+    assert webhook.dob == "1990-04-02"
+    assert direct.dob == "04/02/1990"
+    assert "date_of_birth" not in dict(direct.custom_fields)
+
+
+@pytest.fixture
+def context(stub, tmp_path, monkeypatch):
+    """The context reconcile.main builds, pointed at the stub with an isolated index."""
+    context = AppContext(
+        isolated_config(str(tmp_path)), settings={"intakeq_api_key": "test-key", "intakeq_base_url": stub.base_url}
+    )
+    monkeypatch.setattr(reconcile, "init_app_context", lambda config_path: context)
+    return context
+
+
+def test_refresh_index_indexes_dob(stub, context, tmp_path):
+    stub.state.clients[CLIENT["ClientId"]] = dict(CLIENT)
+    export = tmp_path / "export.jsonl"
+    export.write_text(json.dumps(CONTACT) + "\n")
+    report_path = tmp_path / "report.json"
+
+    status = reconcile.main(["--file", str(export), "--refresh-index", "--report", str(report_path)])
+
+    assert status == 0
+    assert context.client_index.get(CLIENT["ClientId"])["dob"] == "1990-04-02"
+    assert json.loads(report_path.read_text())["counts"]["in_sync"] == 1
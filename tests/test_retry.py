@@ -0,0 +1,185 @@
+"""
+Tests for the retry engine, driven through IntakeQClient against the stub
+and, for the authentication hook, through run_retry_loop directly.
+"""
+
+from src.api.circuit_breaker import CircuitBreaker
+from src.api.intakeq_client import IntakeQClient
+from src.api.retry import RetryPolicy, parse_retry_after, retry_loop, run_retry_loop
+from src.utils.metrics import UpstreamMetrics
+
+# Deterministic, fast backoff; a high breaker threshold keeps the circuit closed
+FAST_RETRY = {"base_delay": 0.01, "max_delay": 1, "jitter": False}
+NO_BREAKER = {"failure_threshold": 1000}
+
+
+def make_client(stub, **retry_config):
+    settings = dict(FAST_RETRY)
+    settings.update(retry_config)
+    return IntakeQClient(
+        api_key="test-key", base_url=stub.base_url, retry_config=settings, breaker_config=NO_BREAKER
+    )
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_after_is_honored(stub, sleeps):
+    stub.state.throttle_rate = 1.0
+    stub.state.retry_after = 1
+    client = make_client(stub, max_attempts=3)
+
+    result = client.search_clients("someone@example.com")
+
+    assert result == []
+    assert stub.state.requests == 3
+    # Retry-After (1s) outweighs the 0.01s/0.02s backoff
+    assert sleeps == [1.0, 1.0]
+
+
+def test_retry_after_beyond_max_delay_gives_up(stub, sleeps):
+    stub.state.throttle_rate = 1.0
+    stub.state.retry_after = 60
+    client = make_client(stub, max_attempts=3)
+
+    result = client._make_request("GET", "/clients/search?email=someone%40example.com")
+
+    assert result["status_code"] == 429
+    assert stub.state.requests == 1
+    assert sleeps == []
+
+
+def test_backoff_is_capped(stub, sleeps):
+    stub.state.error_rate = 1.0
+    client = make_client(stub, max_attempts=6, base_delay=0.1, backoff_factor=2, max_delay=0.5)
+
+    result = client._make_request("GET", "/clients")
+
+    assert result["status_code"] == 503
+    assert stub.state.requests == 6
+    assert sleeps == [0.1, 0.2, 0.4, 0.5, 0.5]
+
+
+def test_jittered_backoff_stays_under_cap():
+    policy = RetryPolicy("http://jitter.test", {"base_delay": 1, "backoff_factor": 2, "max_delay": 3, "jitter": True})
+
+    for attempt in range(1, 10):
+        assert 0 <= policy.backoff(attempt) <= 3
+
+
+def test_exhausted_budget_stops_retries(stub, sleeps):
+    stub.state.error_rate = 1.0
+    # No refill: only the initial 10 tokens can be spent on retries
+    client = make_client(stub, max_attempts=3, budget_ratio=0, budget_min_per_second=0)
+
+    for _ in range(8):
+        client._make_request("GET", "/clients")
+
+    # Five requests retry twice each, then the last three get one attempt
+    assert client.retry_policy.retries == 10
+    assert client.retry_policy.budget.exhausted == 3
+    assert stub.state.requests == 5 * 3 + 3
+    assert len(sleeps) == 10
+
+
+def test_post_is_not_retried_on_server_error(stub, sleeps):
+    stub.state.error_rate = 1.0
+    client = make_client(stub, max_attempts=3)
+
+    result = client._make_request("POST", "/clients", {"FirstName": "Once", "Email": "once@example.com"})
+
+    assert result["status_code"] == 503
+    assert stub.state.requests == 1
+    assert sleeps == []
+
+
+def test_post_is_retried_when_throttled(stub, sleeps):
+    # A 429 means the request was rejected unprocessed, so repeating it is safe
+    stub.state.throttle_rate = 1.0
+    client = make_client(stub, max_attempts=3)
+
+    client._make_request("POST", "/clients", {"FirstName": "Twice", "Email": "twice@example.com"})
+
+    assert stub.state.requests == 3
+    assert not stub.state.clients
+
+
+def test_idempotent_post_is_retried(stub, sleeps):
+    stub.state.error_rate = 1.0
+    client = make_client(stub, max_attempts=3)
+
+    client._make_request("POST", "/clients", {"FirstName": "Tag", "Email": "tag@example.com"}, idempotent=True)
+
+    assert stub.state.requests == 3
+
+
+def test_post_is_retried_after_connect_failure(stub, sleeps):
+    # Nothing was sent when the connection was refused
+    port = stub.server_address[1]
+    stub.shutdown()
+    stub.server_close()
+    client = IntakeQClient(
+        api_key="test-key", base_url=f"http://127.0.0.1:{port}/api/v1",
+        retry_config=dict(FAST_RETRY, max_attempts=3), breaker_config=NO_BREAKER
+    )
+
+    result = client._make_request("POST", "/clients", {"FirstName": "Down", "Email": "down@example.com"})
+
+    assert "error" in result
+    assert len(sleeps) == 2
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+def drive_unauthorized(statuses, on_unauthorized):
+    """Run retry_loop over canned responses; returns the result and the number of sends."""
+    statuses = list(statuses)
+    sent = []
+
+    def send():
+        sent.append(statuses[len(sent)])
+        return Response(sent[-1]), None
+
+    loop = retry_loop(
+        "GET", "http://auth.test/contacts", RetryPolicy("http://auth.test", dict(FAST_RETRY, max_attempts=1)),
+        CircuitBreaker("auth.test"), UpstreamMetrics("auth.test"), on_unauthorized=on_unauthorized
+    )
+    return run_retry_loop(loop, lambda: 0.0, send), len(sent)
+
+
+def test_unauthorized_is_renewed_and_resent_once(sleeps):
+    renewals = []
+
+    def renew():
+        renewals.append(True)
+        return True
+
+    result, sends = drive_unauthorized([401, 200], renew)
+
+    # The resend doesn't count against max_attempts=1
+    assert result.status_code == 200
+    assert sends == 2 and len(renewals) == 1
+    assert sleeps == []
+
+
+def test_unauthorized_after_renewal_is_returned(sleeps):
+    result, sends = drive_unauthorized([401, 401], lambda: True)
+
+    assert result.status_code == 401
+    assert sends == 2
+
+
+def test_declined_renewal_returns_unauthorized(sleeps):
+    result, sends = drive_unauthorized([401], lambda: False)
+
+    assert result.status_code == 401
+    assert sends == 1
@@ -0,0 +1,141 @@
+"""
+Tests that single-flight shares identical calls and serializes differing ones.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def start(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def wait_for_leader(flight):
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+
+
+def let_waiter_block():
+    """Give the second caller time to reach the in-flight call before the leader finishes."""
+    time.sleep(0.05)
+
+
+def test_same_fingerprint_shares_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    results = []
+
+    def leader():
+        release.wait()
+        return "created"
+
+    first = start(lambda: results.append(flight.do("ada@example.com", leader, fingerprint="v1")))
+    wait_for_leader(flight)
+    second = start(lambda: results.append(flight.do("ada@example.com", lambda: "again", fingerprint="v1")))
+    let_waiter_block()
+    release.set()
+    first.join()
+    second.join()
+
+    assert results == ["created", "created"]
+    assert flight.stats() == {"executed": 1, "shared": 1, "in_flight": 0}
+
+
+def test_different_fingerprint_runs_after_the_leader():
+    flight = SingleFlight()
+    release = threading.Event()
+    order = []
+
+    def leader():
+        release.wait()
+        order.append("v1")
+        return "v1"
+
+    def follower():
+        order.append("v2")
+        return "v2"
+
+    first = start(lambda: flight.do("ada@example.com", leader, fingerprint="v1"))
+    wait_for_leader(flight)
+    results = []
+    second = start(lambda: results.append(flight.do("ada@example.com", follower, fingerprint="v2")))
+    let_waiter_block()
+    release.set()
+    first.join()
+    second.join()
+
+    # Never run concurrently, and the follower got its own result
+    assert order == ["v1", "v2"]
+    assert results == ["v2"]
+    assert flight.stats() == {"executed": 2, "shared": 0, "in_flight": 0}
+
+
+def test_leader_error_is_shared():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def leader():
+        release.wait()
+        raise ValueError("upstream down")
+
+    def call():
+        try:
+            flight.do("ada@example.com", leader, fingerprint="v1")
+        except ValueError as e:
+            errors.append(e)
+
+    first = start(call)
+    wait_for_leader(flight)
+    second = start(call)
+    let_waiter_block()
+    release.set()
+    first.join()
+    second.join()
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flight.executed == 1
+
+
+def test_async_fingerprints_are_shared_or_serialized():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def create(version):
+        calls.append(version)
+        await asyncio.sleep(0.01)
+        return version
+
+    async def main():
+        return await asyncio.gather(
+            flight.do("ada@example.com", lambda: create("v1"), fingerprint="v1"),
+            flight.do("ada@example.com", lambda: create("v1"), fingerprint="v1"),
+            flight.do("ada@example.com", lambda: create("v2"), fingerprint="v2")
+        )
+
+    assert asyncio.run(main()) == ["v1", "v1", "v2"]
+    assert calls == ["v1", "v2"]
+    assert flight.stats() == {"executed": 2, "shared": 1, "in_flight": 0}
+
+
+def test_async_cancelled_leader_is_not_shared():
+    flight = AsyncSingleFlight()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(10), fingerprint="v1"))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(0, result="own"), fingerprint="v1"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == "own"